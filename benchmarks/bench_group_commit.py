@@ -0,0 +1,110 @@
+"""
+Benchmark of concurrent /add throughput with and without group commit.
+
+For every mode a fresh SQLite file is created and ``--writers`` concurrent tasks each record
+``--adds`` expenses with the writes of ``add_expense``: the expense, its category total and the
+budget of its category. Without group commit every expense is committed in its own transaction;
+with it the writes go through a :class:`GroupCommitWriter`, which commits the writes arriving
+within ``--window`` seconds together. The synchronous level of SQLite is taken from
+``SQLITE_SYNCHRONOUS``; use ``SQLITE_SYNCHRONOUS=FULL`` to measure fully durable commits.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--writers 32] [--adds 100] [--window 0.005] [--batch 64]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from financetracker_bot.models import category_totals
+from financetracker_bot.models.database import conflict_insert, make_async_engine, make_engine
+from financetracker_bot.models.finance_model import Base, Budget, Expense, User
+from financetracker_bot.models.group_commit import GroupCommitWriter
+
+CATEGORIES = ["Groceries", "Rent", "Dining", "Transportation"]
+
+
+def prepare(url, users):
+    """Create the schema and the users."""
+    engine = make_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{'uid': uid, 'name': f'user{uid}'} for uid in range(1, users + 1)])
+    engine.dispose()
+
+
+def make_write(uid, category):
+    """Return the writes of one /add."""
+    async def write(db):
+        db.add(Expense(uid=uid, name='bench', category=category, amount=1.0, date=datetime.datetime.now()))
+        await category_totals.apply_expense(db, uid, category, 1.0)
+        await db.execute(conflict_insert(db, Budget).values(uid=uid, category=category, amount=float('inf'))
+                         .on_conflict_do_nothing(index_elements=['uid', 'category']))
+    return write
+
+
+async def writer(factory, group_writer, uid, adds, latencies):
+    """Record ``adds`` expenses of one user, one after another."""
+    for i in range(adds):
+        write = make_write(uid, CATEGORIES[i % len(CATEGORIES)])
+        started = time.perf_counter()
+        if group_writer is not None:
+            await group_writer.submit(write)
+        else:
+            async with factory() as db:
+                await write(db)
+                await db.commit()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(url, grouped, args):
+    """Run the workload and return the adds per second, the latencies and the number of commits."""
+    engine = make_async_engine(url)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    group_writer = GroupCommitWriter(args.window, args.batch, session_factory=factory) if grouped else None
+    latencies = []
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(factory, group_writer, uid, args.adds, latencies)
+                           for uid in range(1, args.writers + 1)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    commits = group_writer.stats()['batches'] if grouped else len(latencies)
+    return len(latencies) / elapsed, latencies, commits
+
+
+def main():
+    """Run the benchmark with and without group commit and print a table."""
+    parser = argparse.ArgumentParser(description='Compare concurrent /add throughput with and without group commit.')
+    parser.add_argument('--writers', type=int, default=32)
+    parser.add_argument('--adds', type=int, default=100, help='Expenses added by every writer.')
+    parser.add_argument('--window', type=float, default=0.005, help='Seconds a group waits for more writes.')
+    parser.add_argument('--batch', type=int, default=64, help='Writes that close a group at once.')
+    args = parser.parse_args()
+
+    print(f"{'mode':<13} {'adds/s':>8} {'p50, ms':>8} {'p95, ms':>8} {'commits':>8}")
+    for grouped in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            url = 'sqlite:///' + os.path.join(directory, 'bench.db')
+            prepare(url, args.writers)
+            throughput, latencies, commits = asyncio.run(run(url, grouped, args))
+
+        p50 = statistics.median(latencies) * 1000
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000
+        mode = 'group commit' if grouped else 'per update'
+        print(f"{mode:<13} {throughput:>8.0f} {p50:>8.2f} {p95:>8.2f} {commits:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark of the hot expense and budget queries with and without the composite indexes.
+
+For every size a fresh SQLite database is filled with synthetic expenses, the queries issued by
+``add_expense``, ``show_budgets`` and ``financial_analysis`` are timed on the bare tables, then
+``upgrade_schema`` creates the indexes and the queries are timed again.
+
+Usage:
+    python benchmarks/bench_indexes.py [--sizes 10000 100000 1000000] [--repeat 50]
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import create_engine, func, insert, select, text
+
+from financetracker_bot.models.finance_model import Base, Budget, Expense, User, upgrade_schema
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Transportation", "Dining", "Entertainment",
+              "Health", "Education", "Clothing", "Other"]
+START = datetime.datetime(2022, 1, 1)
+
+
+def fill(engine, size):
+    """Create the tables without the indexes and insert ``size`` expenses."""
+    Base.metadata.create_all(engine)
+    users = max(10, size // 1000)
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(text(f'DROP INDEX {index.name}'))
+        connection.execute(insert(User), [{'uid': uid, 'name': f'user{uid}'} for uid in range(1, users + 1)])
+        connection.execute(insert(Budget), [{'uid': uid, 'category': category, 'amount': 1000.0}
+                                            for uid in range(1, users + 1) for category in CATEGORIES])
+        batch = []
+        for _ in range(size):
+            batch.append({
+                'uid': rng.randint(1, users),
+                'name': 'expense',
+                'category': rng.choice(CATEGORIES),
+                'amount': round(rng.uniform(1, 100), 2),
+                'date': START + datetime.timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60)),
+            })
+            if len(batch) == 50000:
+                connection.execute(insert(Expense), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(Expense), batch)
+
+
+QUERIES = {
+    'budget total (uid, category)': lambda: select(func.sum(Expense.amount)).filter_by(uid=1, category='Dining'),
+    'analysis range (uid, date)': lambda: select(Expense.category, Expense.amount).where(
+        Expense.uid == 1, Expense.date >= START, Expense.date <= START + datetime.timedelta(days=30)),
+    'budget lookup (uid, category)': lambda: select(Budget).filter_by(uid=1, category='Dining'),
+}
+
+
+def time_queries(engine, repeat):
+    """Return the median time of each query in milliseconds."""
+    results = {}
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.execute(query()).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    """Run the benchmark and print a table of median query times."""
+    parser = argparse.ArgumentParser(description='Time hot queries with and without indexes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'query':<31} {'no index, ms':>12} {'indexed, ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine('sqlite:///' + os.path.join(directory, 'bench.db'))
+            fill(engine, size)
+            before = time_queries(engine, args.repeat)
+            upgrade_schema(engine)
+            with engine.begin() as connection:
+                connection.execute(text('ANALYZE'))
+            after = time_queries(engine, args.repeat)
+            engine.dispose()
+
+        for name in QUERIES:
+            print(f"{size:>9}  {name:<31} {before[name]:>12.3f} {after[name]:>12.3f} {before[name] / after[name]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
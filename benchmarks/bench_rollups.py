@@ -0,0 +1,100 @@
+"""
+Benchmark of the financial analysis over long periods with and without the expense rollups.
+
+For every size a fresh SQLite database is filled with the synthetic expenses of one user spread
+over five years, and the rollups are built. The per-category statistics of periods from one month
+to five years are then computed from the raw expenses and with the rollup planner, and both
+results are checked to be equal.
+
+Usage:
+    python benchmarks/bench_rollups.py [--sizes 10000 100000 1000000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from financetracker_bot.models import rollups
+from financetracker_bot.models.analysis import get_category_summary, get_raw_category_summary
+from financetracker_bot.models.database import make_async_engine, make_engine
+from financetracker_bot.models.finance_model import Base, Expense, User
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Transportation", "Dining", "Entertainment",
+              "Health", "Education", "Clothing", "Other"]
+START = datetime.datetime(2020, 1, 1)
+PERIODS = {'1 month': 30, '1 year': 365, '5 years': 5 * 365}
+
+
+def fill(url, size):
+    """Insert ``size`` expenses of user 1 and build the rollups."""
+    engine = make_engine(url)
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    seconds = 5 * 365 * 24 * 3600
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{'uid': 1, 'name': 'user1'}])
+        for offset in range(0, size, 50000):
+            connection.execute(insert(Expense), [
+                {'uid': 1, 'name': 'bench', 'category': rng.choice(CATEGORIES), 'amount': round(rng.uniform(1, 100), 2),
+                 'date': START + datetime.timedelta(seconds=rng.randint(0, seconds))}
+                for _ in range(min(50000, size - offset))])
+        rollups.rebuild(connection)
+    engine.dispose()
+
+
+async def measure(url, repeat):
+    """Time both computations for every period and return the median milliseconds."""
+    engine = make_async_engine(url)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    results = {}
+    async with factory() as db:
+        for name, days in PERIODS.items():
+            start = START + datetime.timedelta(hours=7)
+            end = start + datetime.timedelta(days=days)
+            timings = {}
+            for label, compute in (('raw', get_raw_category_summary), ('rollups', get_category_summary)):
+                samples = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    summary = await compute(db, 1, start, end)
+                    samples.append(time.perf_counter() - started)
+                timings[label] = (statistics.median(samples) * 1000, summary)
+            raw, planned = timings['raw'][1], timings['rollups'][1]
+            equal = [(row.category, row.count) for row in raw] == [(row.category, row.count) for row in planned] and all(
+                abs(a.total - b.total) < 1e-6 for a, b in zip(raw, planned))
+            results[name] = (timings['raw'][0], timings['rollups'][0], equal)
+    await engine.dispose()
+    return results
+
+
+def main():
+    """Run the benchmark for every size and print a table."""
+    parser = argparse.ArgumentParser(description='Compare the analysis with and without rollups.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'expenses':>9} {'period':<8} {'raw, ms':>9} {'rollups, ms':>12} {'equal':>6}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            url = 'sqlite:///' + os.path.join(directory, 'bench.db')
+            fill(url, size)
+            results = asyncio.run(measure(url, args.repeat))
+        for name, (raw, planned, equal) in results.items():
+            print(f"{size:>9} {name:<8} {raw:>9.2f} {planned:>12.2f} {str(equal):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of concurrent /add throughput under the default and tuned SQLite profiles.
+
+For every profile a fresh SQLite file is created and ``--writers`` concurrent tasks perform the
+writes of ``add_expense`` (insert the expense, update the category total, commit) while
+``--readers`` tasks keep reading budget statuses like ``show_budgets``. Every task uses its own
+session from an asyncio engine created by ``make_async_engine``.
+
+Usage:
+    python benchmarks/bench_sqlite_profiles.py [--writers 8] [--readers 4] [--adds 200]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from financetracker_bot.models import category_totals
+from financetracker_bot.models.budget_status import get_budget_status
+from financetracker_bot.models.database import PROFILES, make_async_engine, make_engine
+from financetracker_bot.models.finance_model import Base, Budget, Expense, User
+
+CATEGORIES = ["Groceries", "Rent", "Dining", "Transportation"]
+
+
+def prepare(url, users):
+    """Create the schema, the users and their budgets."""
+    engine = make_engine(url, 'default')
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{'uid': uid, 'name': f'user{uid}'} for uid in range(1, users + 1)])
+        connection.execute(insert(Budget), [{'uid': uid, 'category': category, 'amount': 1000.0}
+                                            for uid in range(1, users + 1) for category in CATEGORIES])
+    engine.dispose()
+
+
+async def writer(factory, uid, adds, latencies, errors):
+    """Record ``adds`` expenses of one user the way ``add_expense`` does."""
+    for i in range(adds):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        started = time.perf_counter()
+        try:
+            async with factory() as db:
+                db.add(Expense(uid=uid, name='bench', category=category, amount=1.0, date=datetime.datetime.now()))
+                await category_totals.apply_expense(db, uid, category, 1.0)
+                await db.commit()
+        except OperationalError:
+            errors.append(uid)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def reader(factory, uid, stop, reads):
+    """Read budget statuses until the writers are done."""
+    while not stop.is_set():
+        async with factory() as db:
+            await get_budget_status(db, uid)
+        reads.append(uid)
+        await asyncio.sleep(0)
+
+
+async def run(url, profile, writers, readers, adds):
+    """Run the workload and return the adds per second, latencies, errors and reads."""
+    engine = make_async_engine(url, profile)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    latencies, errors, reads = [], [], []
+    stop = asyncio.Event()
+
+    started = time.perf_counter()
+    reader_tasks = [asyncio.create_task(reader(factory, uid, stop, reads)) for uid in range(1, readers + 1)]
+    await asyncio.gather(*(writer(factory, uid, adds, latencies, errors) for uid in range(1, writers + 1)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*reader_tasks)
+    await engine.dispose()
+    return len(latencies) / elapsed, latencies, errors, len(reads) / elapsed
+
+
+def main():
+    """Run the benchmark for both profiles and print a table."""
+    parser = argparse.ArgumentParser(description='Compare concurrent /add throughput of the SQLite profiles.')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--adds', type=int, default=200, help='Expenses added by every writer.')
+    args = parser.parse_args()
+
+    print(f"{'profile':<8} {'adds/s':>8} {'p50, ms':>8} {'p95, ms':>8} {'errors':>7} {'reads/s':>8}")
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            url = 'sqlite:///' + os.path.join(directory, 'bench.db')
+            prepare(url, max(args.writers, args.readers))
+            throughput, latencies, errors, reads = asyncio.run(run(url, profile, args.writers, args.readers, args.adds))
+
+        p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else float('nan')
+        print(f"{profile:<8} {throughput:>8.0f} {p50:>8.2f} {p95:>8.2f} {len(errors):>7} {reads:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark of the cold start of the bot.
+
+Two measurements are made, each in fresh Python processes:
+
+* the import time of ``financetracker_bot.main`` as reported by ``python -X importtime``, checked
+  against ``--budget``; importing must not load the modules in ``DEFERRED`` either, as they are
+  only needed by some commands;
+* the time from the start of the process to the first handled ``/start`` update: imports,
+  ``bootstrap()`` of a fresh SQLite database, building the application and handling the update
+  with the Telegram Bot API answered in-process.
+
+The script exits with status 1 if the import budget is exceeded or a deferred module is imported.
+
+Usage:
+    python benchmarks/bench_startup.py [--budget 1.5] [--runs 5]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFERRED = ('openai', 'plotly', 'kaleido', 'pandas', 'pyarrow')
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$')
+
+
+def import_times(env):
+    """Import the bot with ``-X importtime`` and return the cumulative microseconds per module."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import financetracker_bot.main'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def cold_start(env):
+    """Run a child process handling one update and return its seconds from process start."""
+    started = time.time()
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1]) - started
+
+
+def child():
+    """Bootstrap the bot, handle one /start update and print the time it was handled."""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # pylint: disable=import-outside-toplevel
+    import random
+    from telegram import Update
+    from financetracker_bot.app_context import bootstrap
+    from financetracker_bot.main import build_application
+    from load_test import make_stub_request, make_update
+
+    async def handle_first_update():
+        bootstrap()
+        application = build_application(token='1:STARTUP', request_class=make_stub_request())
+        await application.initialize()
+        update = Update.de_json(make_update(1, 1, '/start', random.Random(0)), application.bot)
+        await application.process_update(update)
+        print(time.time())
+        await application.shutdown()
+
+    asyncio.run(handle_first_update())
+
+
+def main():
+    """Measure the import time and the cold start and check the import budget."""
+    parser = argparse.ArgumentParser(description='Measure the cold start of the bot.')
+    parser.add_argument('--budget', type=float, default=1.5, help='Seconds importing the bot may take.')
+    parser.add_argument('--runs', type=int, default=5, help='Processes started per measurement.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'sk-startup'))
+        imports, starts = [], []
+        for run in range(args.runs):
+            times = import_times(env)
+            imports.append(times['financetracker_bot.main'] / 1e6)
+            env['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, f'startup{run}.db')
+            starts.append(cold_start(env))
+
+    deferred = sorted(module for module in times if module.split('.')[0] in DEFERRED)
+    import_seconds = statistics.median(imports)
+    print(f"import financetracker_bot.main: {import_seconds * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+    print(f"process start to first handled update: {statistics.median(starts) * 1000:.0f} ms")
+    print("slowest imports:")
+    for module, micros in sorted(times.items(), key=lambda item: -item[1])[1:11]:
+        print(f"  {micros / 1000:>8.1f} ms  {module}")
+
+    failed = False
+    if import_seconds > args.budget:
+        print("the import budget is exceeded")
+        failed = True
+    if deferred:
+        print("modules imported eagerly although they are deferred: " + ', '.join(deferred[:10]))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Load test of the bot handlers with synthetic Telegram updates.
+
+Simulated users send a mix of ``/start``, ``/add``, ``/show``, ``/show_budgets`` and ``/analysis``
+commands, one after another per user and concurrently across users. The updates go through the
+real application: its handlers, update processor and a temporary SQLite database filled with the
+requested number of expenses. Only the outside world is replaced: the Telegram Bot API is answered
+in-process, OpenAI by ``tests/fake_openai_server.py`` with a configurable latency, and the chart
+renderer by a stub with a configurable latency unless ``--render-charts`` is given. With
+``--openai-outage`` the fake API answers every request with HTTP 503, to check that /add stays fast
+while the circuit breaker is open.
+
+For every data size the throughput and the p50/p95/p99 latency of each command are reported.
+
+Usage:
+    python benchmarks/load_test.py [--sizes 1000 100000 1000000] [--users 50] [--ops 20]
+                                   [--openai-latency 0.2] [--chart-latency 0.3] [--render-charts]
+                                   [--openai-outage]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Transportation", "Dining", "Entertainment",
+              "Health", "Education", "Clothing", "Other"]
+KNOWN_DESCRIPTIONS = ["coffee", "taxi", "lunch", "groceries", "rent", "cinema", "pharmacy"]
+MIX = {'/start': 5, '/add': 40, '/show': 25, '/show_budgets': 20, '/analysis': 10}
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 20000
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Finance', 'username': 'finance_bot'}
+
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of the sorted values lies."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def make_stub_request():
+    """Create the request class answering the Telegram Bot API in-process."""
+    from telegram.request import BaseRequest  # pylint: disable=import-outside-toplevel
+
+    class StubRequest(BaseRequest):
+        """Answers every Bot API method with a plausible result without network access."""
+        message_id = 0
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        @property
+        def read_timeout(self):
+            return None
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None):
+            endpoint = url.rsplit('/', 1)[-1]
+            parameters = request_data.parameters if request_data else {}
+            if endpoint == 'getMe':
+                result = BOT_USER
+            elif endpoint in ('sendMessage', 'sendPhoto', 'sendDocument', 'editMessageText'):
+                StubRequest.message_id += 1
+                result = {'message_id': StubRequest.message_id, 'date': int(time.time()),
+                          'chat': {'id': parameters.get('chat_id', 0), 'type': 'private'},
+                          'from': BOT_USER, 'text': parameters.get('text', '')}
+                if endpoint == 'sendPhoto':
+                    result['photo'] = [{'file_id': f'photo{StubRequest.message_id}',
+                                        'file_unique_id': f'photo{StubRequest.message_id}', 'width': 800, 'height': 600}]
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    return StubRequest
+
+
+def fill(users, size, rng):
+    """Replace the database contents with ``users`` users and ``size`` expenses."""
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import delete, insert
+    from financetracker_bot.models import category_totals, rollups
+    from financetracker_bot.models.finance_model import Base, Budget, Expense, User, engine
+
+    now = datetime.datetime.now()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(delete(table))
+        connection.execute(insert(User), [{'uid': uid, 'name': f'user{uid}'} for uid in range(1, users + 1)])
+        connection.execute(insert(Budget), [{'uid': uid, 'category': category, 'amount': 1000.0}
+                                            for uid in range(1, users + 1) for category in CATEGORIES])
+        batch = []
+        for i in range(size):
+            batch.append({'uid': i % users + 1, 'name': rng.choice(KNOWN_DESCRIPTIONS), 'category': rng.choice(CATEGORIES),
+                          'amount': round(rng.uniform(1, 100), 2),
+                          'date': now - datetime.timedelta(minutes=rng.randint(1, 365 * 24 * 60))})
+            if len(batch) == 50000:
+                connection.execute(insert(Expense), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(Expense), batch)
+        category_totals.rebuild(connection)
+        rollups.rebuild(connection)
+
+
+def make_update(update_id, uid, command, rng):
+    """Build the JSON of a Telegram update sending a command."""
+    if command == '/add':
+        description = rng.choice(KNOWN_DESCRIPTIONS) if rng.random() < 0.7 else f'purchase {rng.randint(1, 10 ** 6)}'
+        text = f'/add {rng.randint(1, 100)} {description}'
+    elif command == '/analysis':
+        end = datetime.datetime.now()
+        start = end - datetime.timedelta(days=rng.choice([7, 30, 365]))
+        text = f"/analysis {start:%Y-%m-%d} 00:00:00 {end:%Y-%m-%d} 23:59:59"
+    else:
+        text = command
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': uid, 'type': 'private', 'first_name': f'user{uid}'},
+            'from': {'id': uid, 'is_bot': False, 'first_name': f'user{uid}'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+        },
+    }
+
+
+async def simulate_user(application, uid, ops, rng, latencies, counter):
+    """Send ``ops`` commands of one user, each after the previous one was handled."""
+    from telegram import Update  # pylint: disable=import-outside-toplevel
+
+    commands, weights = zip(*MIX.items())
+    for _ in range(ops):
+        command = rng.choices(commands, weights)[0]
+        counter[0] += 1
+        update = Update.de_json(make_update(counter[0], uid, command, rng), application.bot)
+        started = time.perf_counter()
+        await application.update_processor.process_update(update, application.process_update(update))
+        latencies[command].append(time.perf_counter() - started)
+
+
+async def run(args, size):
+    """Fill the database, run the simulated users and return the latencies and elapsed time."""
+    # pylint: disable=import-outside-toplevel
+    from financetracker_bot.handlers import budget_handler, expense_handler
+    from financetracker_bot.main import build_application
+    from financetracker_bot.utils.chart_cache import chart_cache
+
+    rng = random.Random(size)
+    fill(args.users, size, rng)
+    expense_handler.classification_cache.clear()
+    for uid in range(1, args.users + 1):
+        chart_cache.bump_version(uid)
+
+    if not args.render_charts:
+        async def render_pie(labels, values, title):  # pylint: disable=unused-argument
+            await asyncio.sleep(args.chart_latency)
+            return PNG
+        budget_handler.chart_renderer.render_pie = render_pie
+
+    application = build_application(token='1:LOADTEST', request_class=make_stub_request())
+    latencies = defaultdict(list)
+    counter = [0]
+    await application.initialize()
+    expense_handler.reclassification_worker.start(application.bot)
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(simulate_user(application, uid, args.ops, random.Random(uid), latencies, counter)
+                               for uid in range(1, args.users + 1)))
+        elapsed = time.perf_counter() - started
+        await expense_handler.reclassification_worker.drain(30)
+    finally:
+        await application.shutdown()
+        budget_handler.chart_renderer.shutdown()
+    return latencies, elapsed
+
+
+async def run_sizes(args):
+    """Run the load test for every data size and print a table per size."""
+    for size in args.sizes:
+        latencies, elapsed = await run(args, size)
+        total = sum(len(values) for values in latencies.values())
+        print(f"\n{size} expenses, {args.users} users: {total / elapsed:.0f} ops/s")
+        print(f"{'command':<14} {'count':>6} {'ops/s':>8} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}")
+        for command in MIX:
+            values = latencies[command]
+            if not values:
+                continue
+            print(f"{command:<14} {len(values):>6} {len(values) / elapsed:>8.1f} "
+                  f"{statistics.median(values) * 1000:>9.2f} {percentile(values, 0.95) * 1000:>9.2f} "
+                  f"{percentile(values, 0.99) * 1000:>9.2f}")
+
+
+def main():
+    """Parse the arguments and run the load test against a temporary database."""
+    parser = argparse.ArgumentParser(description='Load test the bot handlers with synthetic updates.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000], help='Expenses in the database.')
+    parser.add_argument('--users', type=int, default=50, help='Concurrently active users.')
+    parser.add_argument('--ops', type=int, default=20, help='Commands sent by every user.')
+    parser.add_argument('--openai-latency', type=float, default=0.2, help='Seconds the fake OpenAI API takes.')
+    parser.add_argument('--chart-latency', type=float, default=0.3, help='Seconds the stub chart renderer takes.')
+    parser.add_argument('--render-charts', action='store_true', help='Render the charts with kaleido.')
+    parser.add_argument('--openai-outage', action='store_true', help='Fail every request to the fake OpenAI API.')
+    args = parser.parse_args()
+
+    from tests.fake_openai_server import FakeOpenAIServer  # pylint: disable=import-outside-toplevel
+
+    with tempfile.TemporaryDirectory() as directory, FakeOpenAIServer(latency=args.openai_latency,
+                                                                         status=503 if args.openai_outage else 200) as server:
+        # The configuration is read when the handlers are imported.
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'load.db')
+        os.environ['OPENAI_BASE_URL'] = server.base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'sk-load-test')
+        os.environ['LOCAL_CLASSIFIER_PATH'] = os.path.join(directory, 'local_classifier.json')
+        logging.disable(logging.WARNING)
+
+        asyncio.run(run_sizes(args))
+
+if __name__ == '__main__':
+    main()
@@ -98,6 +98,20 @@ def task_coverage():
         'verbosity': 2,
     }
 
+def task_train_classifier():
+    """Train the local expense classifier on the categorized expenses in the database."""
+    return {
+        'actions': ['python3 -m financetracker_bot.utils.local_classifier train'],
+        'verbosity': 2,
+    }
+
+def task_verify_totals():
+    """Check the per-category spending totals against the expenses."""
+    return {
+        'actions': ['python3 -m financetracker_bot.models.category_totals verify'],
+        'verbosity': 2,
+    }
+
 def task_wheel():
     """Build a wheel package."""
     return {
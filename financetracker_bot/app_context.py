@@ -0,0 +1,35 @@
+"""
+This module prepares the application context of the bot.
+
+Importing the handlers creates nothing: the database engines, the schema, the OpenAI clients and
+the translations are set up when they are first used. :func:`bootstrap` sets up the ones every
+update needs before the bot starts, so that the first update does not pay for them, and is where
+the database of the bot is chosen.
+
+Functions:
+    bootstrap: Connects the bot to its database and prepares the schema, translations and user cache.
+"""
+from financetracker_bot.models.database import configure, get_async_engine, get_engine
+from financetracker_bot.models.finance_model import create_schema
+from financetracker_bot.utils.translation import get_translation
+from financetracker_bot.utils.user_cache import registered_users
+
+
+def bootstrap(database_url=None, profile=None):
+    """
+    Connects the bot to its database and prepares the schema, the translations and the cache of
+    registered users.
+
+    Args:
+        database_url (str, optional): The database URL, e.g. ``sqlite:////var/lib/bot/finance.db``;
+                                      defaults to ``DATABASE_URL``.
+        profile (str, optional): The database profile; defaults to ``DATABASE_PROFILE``.
+
+    Returns:
+        sqlalchemy.ext.asyncio.AsyncEngine: The engine the handlers use.
+    """
+    if database_url or profile:
+        configure(database_url, profile)
+    registered_users.warm(create_schema(get_engine()))
+    get_translation()
+    return get_async_engine()
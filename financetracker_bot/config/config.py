@@ -1,2 +1,106 @@
+import os
+
 TELEGRAM_BOT_TOKEN = ''
 OPENAI_API_KEY = ''
+# URL of an OpenAI-compatible API; None means the official one.
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///finance_tracker.db')
+
+# Seconds to wait for the OpenAI API before giving up on a request.
+OPENAI_REQUEST_TIMEOUT = float(os.environ.get('OPENAI_REQUEST_TIMEOUT', '30'))
+# Seconds /add waits for a category before saving the expense as "Other" and
+# finishing the classification in the background.
+CLASSIFICATION_TIMEOUT = float(os.environ.get('CLASSIFICATION_TIMEOUT', '2'))
+# Number of descriptions kept in the in-process classification cache and
+# the number of seconds an entry stays there.
+CLASSIFICATION_CACHE_SIZE = int(os.environ.get('CLASSIFICATION_CACHE_SIZE', '10000'))
+CLASSIFICATION_CACHE_TTL = float(os.environ.get('CLASSIFICATION_CACHE_TTL', '3600'))
+# File with the local classifier trained by
+# `python -m financetracker_bot.utils.local_classifier train`, and the
+# confidence it needs to answer without calling OpenAI, and the number of users whose own models
+# are kept in memory.
+LOCAL_CLASSIFIER_PATH = os.environ.get('LOCAL_CLASSIFIER_PATH', 'local_classifier.json')
+LOCAL_CLASSIFIER_THRESHOLD = float(os.environ.get('LOCAL_CLASSIFIER_THRESHOLD', '0.8'))
+LOCAL_CLASSIFIER_MAX_USERS = int(os.environ.get('LOCAL_CLASSIFIER_MAX_USERS', '10000'))
+# Descriptions arriving within this many seconds, up to the batch size, are
+# classified with a single OpenAI request.
+CLASSIFICATION_BATCH_WINDOW = float(os.environ.get('CLASSIFICATION_BATCH_WINDOW', '0.02'))
+CLASSIFICATION_BATCH_SIZE = int(os.environ.get('CLASSIFICATION_BATCH_SIZE', '16'))
+# Worker processes rendering analysis charts and the number of charts that
+# may wait for a worker before /analysis answers without a chart.
+CHART_WORKERS = int(os.environ.get('CHART_WORKERS', '2'))
+CHART_QUEUE_SIZE = int(os.environ.get('CHART_QUEUE_SIZE', '8'))
+# Number of rendered analysis charts kept in memory and their total size.
+CHART_CACHE_ENTRIES = int(os.environ.get('CHART_CACHE_ENTRIES', '256'))
+CHART_CACHE_BYTES = int(os.environ.get('CHART_CACHE_BYTES', str(32 * 1024 * 1024)))
+# Number of expenses shown per page of /show.
+SHOW_PAGE_SIZE = int(os.environ.get('SHOW_PAGE_SIZE', '20'))
+# Number of rows written per transaction by /import, the number of concurrent OpenAI requests
+# classifying them and the minimum number of seconds between progress messages.
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))
+IMPORT_CLASSIFICATION_CONCURRENCY = int(os.environ.get('IMPORT_CLASSIFICATION_CONCURRENCY', '4'))
+IMPORT_PROGRESS_INTERVAL = float(os.environ.get('IMPORT_PROGRESS_INTERVAL', '2'))
+# Number of expenses fetched from the database and written at a time by /export.
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '5000'))
+# How updates are received: "polling" or "webhook".
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+# Address, port and URL path the webhook server listens on, the public base URL registered with
+# Telegram (derived from the address if empty), the secret token Telegram sends with every update
+# and the number of simultaneous connections Telegram may open.
+WEBHOOK_LISTEN = os.environ.get('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', 'telegram')
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_SECRET_TOKEN = os.environ.get('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get('WEBHOOK_MAX_CONNECTIONS', '40'))
+# Number of updates of different users processed at the same time; the updates of one user are
+# always processed in order.
+CONCURRENT_UPDATES = int(os.environ.get('CONCURRENT_UPDATES', '32'))
+# Seconds to wait on shutdown for background classifications to finish.
+SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', '10'))
+# Connection settings: "tuned" applies the settings below, "default" leaves the driver defaults.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'tuned')
+# SQLite: journal mode, sync mode, milliseconds to wait for a lock, bytes of the file to memory-map
+# and page cache size (negative values are KiB).
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', '-65536'))
+# Server databases: connections kept in the pool, extra connections allowed under load, whether
+# connections are checked before use and seconds after which they are replaced.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', '5'))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', '10'))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1'
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', '1800'))
+# Port and address of the Prometheus metrics endpoint; 0 disables it.
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '0'))
+METRICS_ADDR = os.environ.get('METRICS_ADDR', '127.0.0.1')
+# Whether the query profiler starts enabled (it can be toggled at runtime with SIGUSR1) and the
+# number of seconds above which it logs a query as slow, with its parameters and query plan.
+QUERY_PROFILER = os.environ.get('QUERY_PROFILER', '0') == '1'
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', '0.1'))
+# Number of registered user IDs kept in memory, so that commands need not read the user first.
+REGISTERED_USER_CACHE_SIZE = int(os.environ.get('REGISTERED_USER_CACHE_SIZE', '100000'))
+# Whether /analysis also computes its statistics from the raw expenses and logs any difference from
+# the statistics read from the daily and monthly rollups.
+ROLLUP_VERIFY = os.environ.get('ROLLUP_VERIFY', '0') == '1'
+# Whether /add writes are committed in groups: the writes of concurrent updates arriving within the
+# window, in seconds, or up to the batch size share one transaction.
+WRITE_BUFFER = os.environ.get('WRITE_BUFFER', '0') == '1'
+WRITE_BUFFER_WINDOW = float(os.environ.get('WRITE_BUFFER_WINDOW', '0.005'))
+WRITE_BUFFER_SIZE = int(os.environ.get('WRITE_BUFFER_SIZE', '64'))
+# Circuit breaker of the OpenAI client: it opens when at least the given share of the recent
+# requests (out of the window, once it holds the minimum) failed, and lets one trial request through
+# every reset timeout, in seconds, until one succeeds.
+OPENAI_BREAKER_FAILURE_RATE = float(os.environ.get('OPENAI_BREAKER_FAILURE_RATE', '0.5'))
+OPENAI_BREAKER_WINDOW = int(os.environ.get('OPENAI_BREAKER_WINDOW', '20'))
+OPENAI_BREAKER_MIN_CALLS = int(os.environ.get('OPENAI_BREAKER_MIN_CALLS', '5'))
+OPENAI_BREAKER_RESET_TIMEOUT = float(os.environ.get('OPENAI_BREAKER_RESET_TIMEOUT', '30'))
+# Expenses saved as 'Other' are classified again in the background: at most this many at a time,
+# checking the queue every poll interval, and retrying failures after a delay in seconds that
+# doubles with every attempt up to the maximum.
+RECLASSIFICATION_CONCURRENCY = int(os.environ.get('RECLASSIFICATION_CONCURRENCY', '4'))
+RECLASSIFICATION_POLL_INTERVAL = float(os.environ.get('RECLASSIFICATION_POLL_INTERVAL', '5'))
+RECLASSIFICATION_RETRY_DELAY = float(os.environ.get('RECLASSIFICATION_RETRY_DELAY', '10'))
+RECLASSIFICATION_MAX_DELAY = float(os.environ.get('RECLASSIFICATION_MAX_DELAY', '600'))
@@ -12,24 +12,39 @@ Functions:
 """
 
 import datetime
+import logging
 
 from telegram import Update
 from telegram.ext import CallbackContext
-from sqlalchemy import func
-import plotly.graph_objects as go
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from financetracker_bot.config.config import CHART_WORKERS, CHART_QUEUE_SIZE
 
-from financetracker_bot.models.finance_model import Budget, session, User, Expense
+from financetracker_bot.models.analysis import get_category_summary
+from financetracker_bot.models.budget_status import get_budget_status
+from financetracker_bot.models.database import with_session
+from financetracker_bot.models.finance_model import Budget
+from financetracker_bot.utils.chart_cache import chart_cache
+from financetracker_bot.utils.chart_renderer import ChartRenderer, ChartQueueFull
 from financetracker_bot.utils.translation import _
+from financetracker_bot.utils.user_cache import registered_only, registered_users
 
+logger = logging.getLogger(__name__)
 
-async def set_budget(update: Update, context: CallbackContext) -> None:
+chart_renderer = ChartRenderer(workers=CHART_WORKERS, max_queue=CHART_QUEUE_SIZE)
+
+
+@with_session
+@registered_only
+async def set_budget(update: Update, context: CallbackContext, db: AsyncSession) -> None:
     """
     Sets a budget for a specific category for the registered user.
 
     Args:
         update (telegram.Update): Incoming update from the user.
         context (telegram.ext.CallbackContext): Context object passed from the handler.
+        db (AsyncSession): The database session of the current update.
 
     Usage:
         /set_budget <category> <amount>
@@ -39,32 +54,29 @@ async def set_budget(update: Update, context: CallbackContext) -> None:
         category = args[0]
         amount = float(args[1])
         user_id = update.effective_user.id  # Get user ID
-        user = session.query(User).filter(User.uid == user_id).first()
-
-        if not user:
-            await update.message.reply_text(_('Please register first using the /start command.'))
-            return
 
-        budget = session.query(Budget).filter_by(uid=user.uid, category=category).first()
+        budget = await db.scalar(select(Budget).filter_by(uid=user_id, category=category))
         if budget:
             budget.amount = amount
         else:
-            budget = Budget(uid=user.uid, category=category, amount=amount)
-            session.add(budget)
+            budget = Budget(uid=user_id, category=category, amount=amount)
+            db.add(budget)
 
-        session.commit()
+        await db.commit()
         await update.message.reply_text(_('Budget set: {} for category {}').format(amount, category))
     except (IndexError, ValueError):
         await update.message.reply_text(_('Usage: /set_budget <category> <amount>'))
 
 
-async def delete_budget(update: Update, context: CallbackContext) -> None:
+@with_session
+async def delete_budget(update: Update, context: CallbackContext, db: AsyncSession) -> None:
     """
     Deletes a budget for a specific category for the registered user.
 
     Args:
         update (telegram.Update): Incoming update from the user.
         context (telegram.ext.CallbackContext): Context object passed from the handler.
+        db (AsyncSession): The database session of the current update.
 
     Usage:
         /delete_budget <category>
@@ -78,25 +90,27 @@ async def delete_budget(update: Update, context: CallbackContext) -> None:
         category = args[0]
         user_id = update.effective_user.id
 
-        budget = session.query(Budget).filter_by(uid=user_id, category=category).first()
+        budget = await db.scalar(select(Budget).filter_by(uid=user_id, category=category))
         if budget:
-            session.delete(budget)
-            session.commit()
+            await db.delete(budget)
+            await db.commit()
             await update.message.reply_text(_('Budget for category {} deleted! Budget set to infinity.').format(category))
         else:
             await update.message.reply_text(_('Budget for category {} not found.').format(category))
-    except Exception as e:  # pylint: disable=broad-except,invalid-name
-        print(e)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
         await update.message.reply_text(_('An error occurred while deleting the budget.'))
 
 
-async def show_budgets(update: Update, context: CallbackContext) -> None:
+@with_session
+async def show_budgets(update: Update, context: CallbackContext, db: AsyncSession) -> None:
     """
     Shows all budgets set by the registered user along with the spending status for each budget.
 
     Args:
         update (telegram.Update): Incoming update from the user.
         context (telegram.ext.CallbackContext): Context object passed from the handler.
+        db (AsyncSession): The database session of the current update.
 
     Usage:
         /show_budgets
@@ -104,34 +118,37 @@ async def show_budgets(update: Update, context: CallbackContext) -> None:
     try:
         user_id = update.effective_user.id
 
-        user = session.query(User).filter(User.uid == user_id).first()
-        if not user:
-            await update.message.reply_text(_('Please register first using the /start command.'))
-            return
-
-        budgets = session.query(Budget).filter_by(uid=user_id).all()
-        if not budgets:
-            await update.message.reply_text(_('You have no set budgets.'))
+        statuses = await get_budget_status(db, user_id)
+        if not statuses:
+            if not await registered_users.is_registered(db, user_id):
+                await update.message.reply_text(_('Please register first using the /start command.'))
+            else:
+                await update.message.reply_text(_('You have no set budgets.'))
             return
 
         response = "Your set budgets:\n"
-        for budget in budgets:
-            total_spent = session.query(func.sum(Expense.amount)).filter_by(uid=user_id, category=budget.category).scalar() or 0
-            response += _("Category: *{}* - Budget: *{}.* Spent: *{:.2f}% * ({} / {})\n").format(_(budget.category), budget.amount, total_spent / budget.amount * 100, total_spent, budget.amount)
+        for status in statuses:
+            response += _("Category: *{}* - Budget: *{}.* Spent: *{:.2f}% * ({} / {})\n").format(_(status.category), status.budget, status.percent, status.spent, status.budget)
 
         await update.message.reply_text(response, parse_mode='Markdown')
-    except Exception as e:  # pylint: disable=broad-except,invalid-name
-        print(e)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
         await update.message.reply_text(_('An error occurred while retrieving budgets.'))
 
 
-async def financial_analysis(update: Update, context: CallbackContext) -> None:
+@with_session
+async def financial_analysis(update: Update, context: CallbackContext, db: AsyncSession) -> None:
     """
     Provides financial analysis for a specified period for the registered user.
 
+    The pie chart is rendered by the chart rendering pool; when the pool is overloaded the analysis
+    is sent as text only. Charts of periods the user requested before are resent from the chart
+    cache as long as the user's expenses did not change.
+
     Args:
         update (telegram.Update): Incoming update from the user.
         context (telegram.ext.CallbackContext): Context object passed from the handler.
+        db (AsyncSession): The database session of the current update.
 
     Usage:
         /financial_analysis <start_date> <start_time> <end_date> <end_time>
@@ -151,19 +168,10 @@ async def financial_analysis(update: Update, context: CallbackContext) -> None:
 
         user_id = update.effective_user.id
 
-        expenses = session.query(Expense).filter(
-            Expense.uid == user_id,
-            Expense.date >= start_datetime,
-            Expense.date <= end_datetime
-        ).all()
-
-        total_expenses = sum(expense.amount for expense in expenses)
-
-        categories = set(expense.category for expense in expenses)
-        category_expenses = {
-            category: sum(expense.amount for expense in expenses if expense.category == category)
-            for category in categories
-        }
+        # Read before the summary, so that a chart rendered from data changed meanwhile is not cached.
+        version = chart_cache.version(user_id)
+        summary = await get_category_summary(db, user_id, start_datetime, end_datetime)
+        total_expenses = sum(row.total for row in summary)
 
         if total_expenses == 0:
             await context.bot.send_message(chat_id=update.effective_chat.id, text=_("There are no expenses for the current period"))
@@ -171,28 +179,31 @@ async def financial_analysis(update: Update, context: CallbackContext) -> None:
         response = _("Financial analysis from *{} {}* to *{} {}*:\n").format(start_date_str, start_time_str, end_date_str, end_time_str)
         response += _("*Total expenses*: {}\n\n").format(total_expenses)
         response += _("Expenses by category:\n")
-        for category, amount in category_expenses.items():
-            response += f"*{_(category)}*: {amount}\n"
-
-        labels = list(category_expenses.keys())
-        sizes = list(category_expenses.values())
-
-        fig = go.Figure(data=[go.Pie(labels=labels, values=sizes, textinfo='label+percent',
-                                    texttemplate='%{label} (%{percent:.2%})', insidetextorientation='radial', hole=.3)])
-
-        fig.update_layout(title_text=_('Expenses by category'))
-        pie_chart_path = 'pie_chart.png'
-        fig.write_image(pie_chart_path, scale=1.5)
-
-
-        await context.bot.send_photo(chat_id=update.effective_chat.id,
-                                     photo=open(pie_chart_path,'rb'),  # pylint: disable=consider-using-with
-                                     caption=response, parse_mode='Markdown')
+        for row in summary:
+            response += _("*{}*: {} ({} expenses, average {:.2f}, min {}, max {})\n").format(
+                _(row.category), row.total, row.count, row.average, row.minimum, row.maximum)
+
+        labels = [row.category for row in summary]
+        sizes = [row.total for row in summary]
+
+        chart = chart_cache.get(user_id, start_datetime, end_datetime, version)
+        if chart is None:
+            try:
+                png = await chart_renderer.render_pie(labels, sizes, _('Expenses by category'))
+            except ChartQueueFull:
+                await context.bot.send_message(chat_id=update.effective_chat.id, text=response, parse_mode='Markdown')
+                return
+            chart = chart_cache.put(user_id, start_datetime, end_datetime, png, version)
+
+        message = await context.bot.send_photo(chat_id=update.effective_chat.id, photo=chart.file_id or chart.png,
+                                               caption=response, parse_mode='Markdown')
+        if chart.file_id is None and message.photo:
+            chart.file_id = message.photo[-1].file_id
 
     except IndexError:
         await context.bot.send_message(chat_id=update.effective_chat.id,
                                        text=_('Please use the format: /financial_analysis <start_date> <start_time> <end_date> <end_time>. Date and time format: YYYY-MM-DD HH:MM:SS'))
-    except Exception as e:  # pylint: disable=broad-except,invalid-name
-        print(e)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
         await context.bot.send_message(chat_id=update.effective_chat.id,
                                        text=_('An error occurred during the analysis.'))
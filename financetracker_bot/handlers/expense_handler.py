@@ -1,37 +1,185 @@
 """
 This module provides functionalities to manage and record expenses for users in a Telegram bot.
-It supports adding, showing, and deleting expenses. Every handler in this module requires already
+It supports adding, showing, importing, exporting and deleting expenses. Every handler in this module requires already
 registered user.
 
 Functions:
     add_expense: Adds a new expense entry for a registered user.
-    show_expenses: Displays all expenses recorded for a registered user.
+    show_expenses: Displays the most recent expenses recorded for a registered user.
+    show_expenses_page: Displays an older or newer page of a registered user's expenses.
     delete_expense: Deletes a specific expense entry for a registered user.
+    recategorize_expense: Moves an expense of a registered user to another category.
+    import_expenses: Imports the expense history of a registered user from a CSV file.
+    export_expenses: Sends the expenses of a registered user as a CSV or Parquet file.
 """
+import asyncio
 import datetime
-
-from sqlalchemy import func
-from telegram import Update
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import CallbackContext
 
-from financetracker_bot.models.finance_model import Expense, User, session, Budget
-from financetracker_bot.utils.openai_util import OpenAI
+from financetracker_bot.config.config import (CLASSIFICATION_TIMEOUT, CLASSIFICATION_CACHE_SIZE,
+                                               CLASSIFICATION_CACHE_TTL, LOCAL_CLASSIFIER_PATH,
+                                               LOCAL_CLASSIFIER_THRESHOLD, LOCAL_CLASSIFIER_MAX_USERS,
+                                               CLASSIFICATION_BATCH_WINDOW,
+                                               CLASSIFICATION_BATCH_SIZE, SHOW_PAGE_SIZE, IMPORT_CHUNK_SIZE,
+                                               IMPORT_CLASSIFICATION_CONCURRENCY, IMPORT_PROGRESS_INTERVAL,
+                                               EXPORT_CHUNK_SIZE, WRITE_BUFFER, WRITE_BUFFER_WINDOW, WRITE_BUFFER_SIZE,
+                                               OPENAI_BREAKER_FAILURE_RATE, OPENAI_BREAKER_WINDOW,
+                                               OPENAI_BREAKER_MIN_CALLS, OPENAI_BREAKER_RESET_TIMEOUT,
+                                               RECLASSIFICATION_CONCURRENCY, RECLASSIFICATION_POLL_INTERVAL,
+                                               RECLASSIFICATION_RETRY_DELAY, RECLASSIFICATION_MAX_DELAY)
+from financetracker_bot.models import category_totals, expense_export, expense_import
+from financetracker_bot.models.budget_status import get_budget_status
+from financetracker_bot.models.database import conflict_insert, with_session
+from financetracker_bot.models.expense_pages import NEWER, OLDER, decode_cursor, encode_cursor, get_expense_page
+from financetracker_bot.models.finance_model import Expense, Budget
+from financetracker_bot.models.group_commit import GroupCommitWriter
+from financetracker_bot.utils.batch_classifier import BatchClassifier
+from financetracker_bot.utils.chart_cache import chart_cache
+from financetracker_bot.utils.circuit_breaker import CLOSED, CircuitBreaker
+from financetracker_bot.utils.classification_cache import ClassificationCache
+from financetracker_bot.utils.local_classifier import LocalClassifier
+from financetracker_bot.utils.openai_util import ClassificationUnavailable, OpenAI, get_expense_categories
+from financetracker_bot.utils.reclassification_worker import ReclassificationWorker, enqueue as enqueue_reclassification
 from financetracker_bot.utils.translation import _
+from financetracker_bot.utils.user_cache import registered_only, registered_users
+
+logger = logging.getLogger(__name__)
+
+openai_breaker = CircuitBreaker(failure_rate=OPENAI_BREAKER_FAILURE_RATE, window=OPENAI_BREAKER_WINDOW,
+                                min_calls=OPENAI_BREAKER_MIN_CALLS, reset_timeout=OPENAI_BREAKER_RESET_TIMEOUT)
+openai_client = OpenAI(breaker=openai_breaker)
+batch_classifier = BatchClassifier(openai_client, window=CLASSIFICATION_BATCH_WINDOW, max_batch=CLASSIFICATION_BATCH_SIZE)
+classification_cache = ClassificationCache(max_size=CLASSIFICATION_CACHE_SIZE, ttl=CLASSIFICATION_CACHE_TTL)
+local_classifier = LocalClassifier.load(LOCAL_CLASSIFIER_PATH, threshold=LOCAL_CLASSIFIER_THRESHOLD,
+                                        max_users=LOCAL_CLASSIFIER_MAX_USERS)
+expense_writer = GroupCommitWriter(window=WRITE_BUFFER_WINDOW, max_batch=WRITE_BUFFER_SIZE) if WRITE_BUFFER else None
+
+# Callback data prefix of the /show navigation buttons.
+SHOW_CALLBACK_PREFIX = 'show:'
+
+
+async def _ensure_budget(db, uid, category):
+    """
+    Creates an unlimited budget for a category if the user has none.
+
+    Concurrent updates may create the same budget at once; the unique ``(uid, category)`` index
+    lets only one of them insert it.
 
-openai_client = OpenAI()
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        category (str): The category of the budget.
+    """
+    stmt = conflict_insert(db, Budget)
+    if stmt is None:
+        if not await db.scalar(select(Budget.bid).filter_by(uid=uid, category=category)):
+            db.add(Budget(uid=uid, category=category, amount=float('inf')))
+        return
+
+    await db.execute(stmt.values(uid=uid, category=category, amount=float('inf'))
+                     .on_conflict_do_nothing(index_elements=['uid', 'category']))
 
-async def add_expense(update: Update, context: CallbackContext) -> None:
+
+async def _classify_with_deadline(description):
+    """
+    Classifies an expense description, waiting at most ``CLASSIFICATION_TIMEOUT`` seconds.
+
+    Concurrent descriptions are classified together by the batch classifier. Unless the circuit
+    breaker of the model is closed, the model is not asked at all: the trial requests that close it
+    again are left to the reclassification worker, so that /add never waits for them.
+
+    Args:
+        description (str): The description of the expense.
+
+    Returns:
+        tuple: The category, whether the expense must be classified again later, and, if the
+               deadline was missed, the still running classification (None otherwise). If the
+               deadline was missed or the model is unavailable, the category is 'Other'.
+    """
+    if openai_breaker.state != CLOSED:
+        return _("Other"), True, None
+    classification = asyncio.ensure_future(batch_classifier.classify(description))
+    try:
+        return await asyncio.wait_for(asyncio.shield(classification), CLASSIFICATION_TIMEOUT), False, None
+    except asyncio.TimeoutError:
+        return _("Other"), True, classification
+    except ClassificationUnavailable:
+        return _("Other"), True, None
+
+
+async def _move_reclassified(db, expense, category):
+    """
+    Moves an expense saved as 'Other' to the category the model found for it later.
+
+    The amount is moved between the category totals, and an unlimited budget is created for the
+    category if the user has none yet. The changes are committed by the reclassification worker.
+
+    Args:
+        db (AsyncSession): The session of the worker.
+        expense (Expense): The expense saved as 'Other'.
+        category (str): The category found by the model.
+    """
+    await category_totals.move_expense(db, expense.uid, expense.category, category, expense.amount)
+    expense.category = category
+    await classification_cache.put(db, expense.name, category)
+    local_classifier.learn(expense.uid, expense.name, category)
+    await _ensure_budget(db, expense.uid, category)
+
+
+async def _notify_reclassified(bot, entry, category):
+    """
+    Invalidates the charts of the user of a reclassified expense and tells the user about the move.
+
+    Args:
+        bot (telegram.Bot): The bot of the application, or None if the worker runs without one.
+        entry (ReclassificationEntry): The processed queue entry.
+        category (str): The new category of the expense.
+    """
+    chart_cache.bump_version(entry.uid)
+    if bot is not None and entry.chat_id is not None:
+        await bot.send_message(entry.chat_id, _("Expense with ID {} moved to category *{}*").format(entry.eid, category),
+                               parse_mode='Markdown', reply_to_message_id=entry.message_id)
+
+
+reclassification_worker = ReclassificationWorker(
+    batch_classifier.classify, _move_reclassified, _notify_reclassified,
+    concurrency=RECLASSIFICATION_CONCURRENCY, poll_interval=RECLASSIFICATION_POLL_INTERVAL,
+    retry_delay=RECLASSIFICATION_RETRY_DELAY, max_delay=RECLASSIFICATION_MAX_DELAY, breaker=openai_breaker,
+)
+
+
+@with_session
+@registered_only
+async def add_expense(update: Update, context: CallbackContext, db: AsyncSession) -> None:
     """
     Adds a new expense entry for a registered user based on their input.
 
     This function handles the creation of a new expense record. It automatically categorizes the
-    expense based on the description provided by the user using an AI classification model.
+    expense based on the description provided by the user using an AI classification model; known
+    descriptions are answered from the classification cache and common ones by the local
+    classifier, both without calling the model. If the
+    model does not answer within ``CLASSIFICATION_TIMEOUT`` seconds or is unavailable, the expense
+    is saved as 'Other' right away and queued, in the same transaction, to be moved to its real
+    category by the reclassification worker.
+
+    The expense, the category total and a missing budget are written in one transaction. With
+    ``WRITE_BUFFER`` that transaction is shared with the /add writes of other updates, and the user is
+    answered once it is committed.
 
     Args:
         update (Update): The update received from Telegram, containing the user's message and chat
                          details.
         context (CallbackContext): The context object provided by the Telegram bot framework which
                                    carries data and settings related to the command being processed.
+        db (AsyncSession): The database session of the current update.
 
     Raises:
         ValueError: If the amount is not a valid number or if the necessary arguments are not
@@ -52,47 +200,102 @@ async def add_expense(update: Update, context: CallbackContext) -> None:
         user_id = update.effective_user.id
         amount = float(args[0])
         description = ' '.join(args[1:])
-        category = openai_client.classify_expense(description)
         date = datetime.datetime.now()
 
-        user = session.query(User).filter(User.uid == user_id).first()
-        if not user:
-            await update.message.reply_text(_('Please register first using the /start command.'))
-            return
-
-        new_expense = Expense(uid=user.uid, date=date, category=category, amount=amount)
-        session.add(new_expense)
-        session.commit()
+        category = await classification_cache.get(db, user_id, description)
+        if category is None:
+            category = local_classifier.classify(user_id, description)
+        queued, pending_classification = False, None
+        remember = False
+        if category is None:
+            category, queued, pending_classification = await _classify_with_deadline(description)
+            remember = not queued and category != _("Other")
+            if remember:
+                local_classifier.learn(user_id, description, category)
+
+        submitted = None
+
+        async def write(session):
+            nonlocal submitted
+            expense = Expense(uid=user_id, name=description, date=date, category=category, amount=amount)
+            session.add(expense)
+            await category_totals.apply_expense(session, user_id, category, amount)
+            await _ensure_budget(session, user_id, category)
+            if remember:
+                await classification_cache.put(session, description, category)
+            if queued:
+                await enqueue_reclassification(session, expense, update.effective_chat.id, update.message.message_id)
+                # The running classification is handed over before the commit, so that the worker
+                # does not ask the model again for an entry it finds first. A retried write
+                # replaces the submission of the rolled back one.
+                if submitted is not None:
+                    reclassification_worker.discard(submitted)
+                submitted = expense.eid
+                reclassification_worker.submit(expense.eid, pending_classification)
+            return expense
+
+        try:
+            if expense_writer is not None:
+                new_expense = await expense_writer.submit(write)
+            else:
+                new_expense = await write(db)
+                await db.commit()
+        except Exception:
+            if submitted is not None:
+                reclassification_worker.discard(submitted)
+            raise
+        chart_cache.bump_version(user_id)
+
+        if queued:
+            reclassification_worker.submit(new_expense.eid)
 
         # Budget check
-        budget = session.query(Budget).filter_by(uid=user.uid, category=category).first()
-        if not budget:
-            budget = Budget(uid=user.uid, category=category, amount=float('inf'))
-            session.add(budget)
-            session.commit()
+        status = (await get_budget_status(db, user_id, category))[0]
+        if status.spent > status.budget:
+            await update.message.reply_text(_("Attention! Budget for category *{}* exceeded! Set budget: *{}*, current budget: *{}*").format(category, status.budget, status.spent), parse_mode='Markdown')
 
-        total_spent = session.query(func.sum(Expense.amount)).filter_by(uid=user.uid, category=category).scalar() or 0
-        if total_spent > budget.amount:
-            await update.message.reply_text(_("Attention! Budget for category *{}* exceeded! Set budget: *{}*, current budget: *{}*").format(category, budget.amount, total_spent), parse_mode='Markdown')
+        await update.message.reply_text(_("Expense added: {} for {} in category *{}* \nYou have spent *{:.2f}% ({}/{})* of the budget allocated for category *{}*").format(amount, description, category, status.percent, status.spent, status.budget, category), parse_mode='Markdown')
 
-        await update.message.reply_text(_("Expense added: {} for {} in category *{}* \nYou have spent *{:.2f}% ({}/{})* of the budget allocated for category *{}*").format(amount, description, category, (total_spent / budget.amount) * 100, total_spent, budget.amount, category), parse_mode='Markdown')
-
-    except Exception as e:  # pylint: disable=broad-except,invalid-name
-        print(e)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
         await update.message.reply_text(_("Please use the format: /add <amount> <description>"))
 
 
-async def show_expenses(update: Update, context: CallbackContext) -> None:
+def _format_expense_page(page):
     """
-    Displays all the expenses recorded for the registered user, formatted in a readable list.
+    Formats a page of expenses and its navigation buttons.
 
-    This function fetches all the expenses associated with the user and formats them into a message
-    that lists each expense with its details such as date, amount, category, and ID.
+    Args:
+        page (ExpensePage): The page to format.
+
+    Returns:
+        tuple: The Markdown text of the page and its inline keyboard, or None if there is no other
+               page to navigate to.
+    """
+    msg = "\n".join([_("Date: *{}*, expense: *{}*, category: *{}*, ID: *{}*").format(row.date.strftime('%Y-%m-%d %H:%M:%S'), row.amount, row.category, row.eid) for row in page.rows])  # pylint: disable=used-before-assignment
+    buttons = []
+    if page.has_older:
+        buttons.append(InlineKeyboardButton(_('« Older'), callback_data=f"{SHOW_CALLBACK_PREFIX}{OLDER}:{encode_cursor(page.rows[0])}"))
+    if page.has_newer:
+        buttons.append(InlineKeyboardButton(_('Newer »'), callback_data=f"{SHOW_CALLBACK_PREFIX}{NEWER}:{encode_cursor(page.rows[-1])}"))
+    return _('Your expenses:\n{}').format(msg), InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+@with_session
+@registered_only
+async def show_expenses(update: Update, context: CallbackContext, db: AsyncSession) -> None:
+    """
+    Displays the most recent expenses of the registered user, formatted in a readable list.
+
+    The expenses are shown one page at a time, oldest first, with each expense's date, amount,
+    category and ID. Inline buttons lead to the older and newer pages, which are handled by
+    :func:`show_expenses_page`.
 
     Args:
         update (Update): The update received from Telegram, containing the user's message and chat
                          details.
         context (CallbackContext): The context object provided by the Telegram bot framework.
+        db (AsyncSession): The database session of the current update.
 
     Raises:
         Exception: General exceptions that may occur during data retrieval or message handling.
@@ -101,23 +304,51 @@ async def show_expenses(update: Update, context: CallbackContext) -> None:
         User types: /show_expenses
     """
     try:
-        user_id = update.effective_user.id
-        user = session.query(User).filter(User.uid == user_id).first()
-        if not user:
-            await update.message.reply_text(_('Please register first using the /start command.'))
-            return
-
-        expenses = session.query(Expense).filter(Expense.uid == user.uid).all()
-        if not expenses:
+        page = await get_expense_page(db, update.effective_user.id, limit=SHOW_PAGE_SIZE)
+        if not page.rows:
             await update.message.reply_text(_('You have no expenses yet.'))
         else:
-            msg = "\n".join([_("Date: *{}*, expense: *{}*, category: *{}*, ID: *{}*").format(e.date.strftime('%Y-%m-%d %H:%M:%S'), e.amount, e.category, e.eid) for e in expenses])  # pylint: disable=used-before-assignment
-            await update.message.reply_text(_('Your expenses:\n{}').format(msg), parse_mode='Markdown')
-    except Exception as e:  # pylint: disable=broad-except,invalid-name
-        print(e)
+            text, keyboard = _format_expense_page(page)
+            if keyboard:
+                await update.message.reply_text(text, parse_mode='Markdown', reply_markup=keyboard)
+            else:
+                await update.message.reply_text(text, parse_mode='Markdown')
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
         await update.message.reply_text(_('An error occurred while displaying expenses.'))
 
-async def delete_expense(update: Update, context: CallbackContext):
+
+@with_session
+async def show_expenses_page(update: Update, context: CallbackContext, db: AsyncSession) -> None:
+    """
+    Replaces a list of expenses with its older or newer page when a navigation button is pressed.
+
+    The callback data of the button holds the direction and the ``(date, ID)`` cursor of the
+    first or last expense shown, so the page is read with a keyset query.
+
+    Args:
+        update (Update): The update received from Telegram, containing the callback query.
+        context (CallbackContext): The context object provided by the Telegram bot framework.
+        db (AsyncSession): The database session of the current update.
+    """
+    query = update.callback_query
+    await query.answer()
+    try:
+        direction, cursor = query.data[len(SHOW_CALLBACK_PREFIX):].split(':', 1)
+        page = await get_expense_page(db, update.effective_user.id, decode_cursor(cursor), direction,
+                                      limit=SHOW_PAGE_SIZE)
+        if not page.rows:
+            await query.edit_message_text(_('You have no expenses yet.'))
+        else:
+            text, keyboard = _format_expense_page(page)
+            await query.edit_message_text(text, parse_mode='Markdown', reply_markup=keyboard)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
+        await query.edit_message_text(_('An error occurred while displaying expenses.'))
+
+
+@with_session
+async def delete_expense(update: Update, context: CallbackContext, db: AsyncSession):
     """
     Deletes a specific expense entry based on the ID provided by the user.
 
@@ -128,6 +359,7 @@ async def delete_expense(update: Update, context: CallbackContext):
         update (Update): The update received from Telegram, containing the user's message and chat
                          details.
         context (CallbackContext): The context object provided by the Telegram bot framework.
+        db (AsyncSession): The database session of the current update.
 
     Raises:
         ValueError: If the expense ID is not provided or is not an integer.
@@ -149,16 +381,233 @@ async def delete_expense(update: Update, context: CallbackContext):
         await update.message.reply_text(_("Please enter a valid expense ID."))
         return
 
-    user = session.query(User).filter_by(uid=chat_id).first()
-    if not user:
+    if not await registered_users.is_registered(db, chat_id):
         await update.message.reply_text(_("User not found."))
         return
 
-    expense = session.query(Expense).filter_by(eid=expense_id, uid=user.uid).first()
+    expense = await db.scalar(select(Expense).filter_by(eid=expense_id, uid=chat_id))
     if not expense:
         await update.message.reply_text(_("Expense not found."))
         return
 
-    session.delete(expense)
-    session.commit()
+    await db.delete(expense)
+    await category_totals.apply_expense(db, expense.uid, expense.category, -expense.amount, count=-1)
+    await db.commit()
+    chart_cache.bump_version(chat_id)
     await update.message.reply_text(_("Expense with ID {} successfully deleted!").format(expense_id))
+
+
+@with_session
+async def recategorize_expense(update: Update, context: CallbackContext, db: AsyncSession) -> None:
+    """
+    Moves an expense to another category chosen by the user.
+
+    The choice is remembered as the user's personal category for the expense description, so
+    later expenses with the same description are filed into it without asking the AI model. Only
+    the predefined categories are accepted, in any letter case.
+
+    Args:
+        update (Update): The update received from Telegram, containing the user's message and chat
+                         details.
+        context (CallbackContext): The context object provided by the Telegram bot framework.
+        db (AsyncSession): The database session of the current update.
+
+    Usage:
+        User types: /category <expense_id> <category>
+    """
+    try:
+        expense_id = int(context.args[0])
+        category = context.args[1]
+    except (IndexError, ValueError):
+        await update.message.reply_text(_("Please use the format: /category <expense ID> <category>"))
+        return
+
+    categories = {name.lower(): name for name in get_expense_categories()}
+    category = categories.get(category.lower())
+    if category is None:
+        await update.message.reply_text(_("Unknown category. Please choose one of: {}").format(', '.join(categories.values())))
+        return
+
+    user_id = update.effective_user.id
+    expense = await db.scalar(select(Expense).filter_by(eid=expense_id, uid=user_id))
+    if not expense:
+        await update.message.reply_text(_("Expense not found."))
+        return
+
+    await category_totals.move_expense(db, user_id, expense.category, category, expense.amount)
+    expense.category = category
+    if expense.name:
+        await classification_cache.put(db, expense.name, category, uid=user_id)
+        local_classifier.learn(user_id, expense.name, category)
+
+    await _ensure_budget(db, user_id, category)
+    await db.commit()
+    chart_cache.bump_version(user_id)
+
+    await update.message.reply_text(_("Expense with ID {} moved to category *{}*").format(expense_id, category), parse_mode='Markdown')
+
+
+async def _classify_import(db, uid, descriptions):
+    """
+    Classifies the descriptions of an imported chunk.
+
+    Each distinct description is looked up once: first in the classification cache, then by the
+    local classifier. Only the rest is sent to the AI model, in batches of
+    ``CLASSIFICATION_BATCH_SIZE`` with at most ``IMPORT_CLASSIFICATION_CONCURRENCY`` requests at a
+    time. Descriptions the model failed to classify are filed as 'Other'; those of batches the model
+    was unavailable for are returned as None, so they are queued for reclassification.
+
+    Args:
+        db (AsyncSession): The database session of the import.
+        uid (int): The ID of the importing user.
+        descriptions (list): The descriptions of the chunk.
+
+    Returns:
+        list: The category of every description, or None if the model was unavailable.
+    """
+    unique = list(dict.fromkeys(descriptions))
+    categories = await classification_cache.get_many(db, uid, unique)
+    remaining = []
+    for description in unique:
+        if description not in categories:
+            category = local_classifier.classify(uid, description)
+            if category is None:
+                remaining.append(description)
+            else:
+                categories[description] = category
+
+    semaphore = asyncio.Semaphore(IMPORT_CLASSIFICATION_CONCURRENCY)
+
+    async def classify_batch(batch):
+        async with semaphore:
+            try:
+                return await openai_client.aclassify_expenses(batch)
+            except ClassificationUnavailable:
+                return [None] * len(batch)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to classify a batch of imported expenses")
+                return [_("Other")] * len(batch)
+
+    batches = [remaining[i:i + CLASSIFICATION_BATCH_SIZE] for i in range(0, len(remaining), CLASSIFICATION_BATCH_SIZE)]
+    for batch, answers in zip(batches, await asyncio.gather(*map(classify_batch, batches))):
+        for description, category in zip(batch, answers):
+            categories[description] = category
+            if category is not None and category != _("Other"):
+                await classification_cache.put(db, description, category)
+                local_classifier.learn(uid, description, category)
+
+    return [categories[description] for description in descriptions]
+
+
+@with_session
+@registered_only
+async def import_expenses(update: Update, context: CallbackContext, db: AsyncSession) -> None:
+    """
+    Imports the expense history of a registered user from an uploaded CSV file.
+
+    The file is downloaded to a temporary directory and imported in chunks of
+    ``IMPORT_CHUNK_SIZE`` rows, each classified and inserted in one transaction. A progress message
+    is updated as the chunks are committed, at most every ``IMPORT_PROGRESS_INTERVAL`` seconds.
+    Unlimited budgets are created for the new categories with the chunks that add them. Expenses the model was
+    unavailable for are saved as 'Other' and classified again by the reclassification worker.
+
+    Args:
+        update (Update): The update received from Telegram, containing the document and chat
+                         details.
+        context (CallbackContext): The context object provided by the Telegram bot framework.
+        db (AsyncSession): The database session of the current update.
+
+    Usage:
+        User sends a CSV file with the caption /import. The file has the columns date, amount,
+        description and, optionally, category.
+    """
+    document = update.message.document
+    if document is None:
+        await update.message.reply_text(_("Please send a CSV file with the columns date, amount, description and, optionally, category, and add /import as its caption."))
+        return
+
+    user_id = update.effective_user.id
+    status = await update.message.reply_text(_("Importing expenses..."))
+    last_progress = time.monotonic()
+    imported = 0
+
+    async def report_progress(count, skipped):
+        nonlocal imported, last_progress
+        imported = count
+        if time.monotonic() - last_progress >= IMPORT_PROGRESS_INTERVAL:
+            last_progress = time.monotonic()
+            await status.edit_text(_("Importing expenses... {} imported, {} skipped").format(count, skipped))
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'expenses.csv')
+            await (await context.bot.get_file(document.file_id)).download_to_drive(path)
+            with open(path, newline='', encoding='utf-8-sig') as file:
+                result = await expense_import.import_expenses(
+                    db, user_id, expense_import.read_expenses(file, get_expense_categories()),
+                    lambda descriptions: _classify_import(db, user_id, descriptions),
+                    chunk_size=IMPORT_CHUNK_SIZE, progress=report_progress, fallback=_("Other"),
+                    ensure_budget=_ensure_budget)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
+        chart_cache.bump_version(user_id)
+        await status.edit_text(_("The import failed. {} expenses were imported before the error.").format(imported))
+        return
+
+    chart_cache.bump_version(user_id)
+    message = _("Imported {} expenses, skipped {} invalid rows.").format(result.imported, result.skipped)
+    if result.queued:
+        message += '\n' + _("{} expenses are saved as 'Other' until the classification model is available again.").format(result.queued)
+    await status.edit_text(message)
+
+
+@with_session
+@registered_only
+async def export_expenses(update: Update, context: CallbackContext, db: AsyncSession) -> None:
+    """
+    Sends the expenses of the registered user as a compressed CSV or Parquet document.
+
+    The expenses are streamed into a file in a temporary directory, ``EXPORT_CHUNK_SIZE`` rows at a
+    time, and the file is uploaded once it is complete.
+
+    Args:
+        update (Update): The update received from Telegram, containing the user's message and chat
+                         details.
+        context (CallbackContext): The context object provided by the Telegram bot framework.
+        db (AsyncSession): The database session of the current update.
+
+    Usage:
+        User types: /export [from] [to] [csv|parquet]. Date format: YYYY-MM-DD; both dates are
+        included.
+    """
+    try:
+        file_format = 'csv'
+        dates = []
+        for arg in context.args:
+            if arg.lower() in expense_export.FORMATS:
+                file_format = arg.lower()
+            else:
+                dates.append(datetime.datetime.strptime(arg, '%Y-%m-%d'))
+        if len(dates) > 2:
+            raise ValueError('Too many dates')
+    except ValueError:
+        await update.message.reply_text(_("Please use the format: /export [from] [to] [csv|parquet]. Date format: YYYY-MM-DD"))
+        return
+    start = dates[0] if dates else None
+    end = dates[1] + datetime.timedelta(days=1) if len(dates) > 1 else None
+
+    user_id = update.effective_user.id
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, expense_export.FILE_NAMES[file_format])
+            exported = await expense_export.export_expenses(db, user_id, path, file_format, start, end,
+                                                            chunk_size=EXPORT_CHUNK_SIZE)
+            if not exported:
+                await update.message.reply_text(_('You have no expenses yet.'))
+                return
+            with open(path, 'rb') as file:
+                await update.message.reply_document(file, filename=expense_export.FILE_NAMES[file_format],
+                                                    caption=_("Exported {} expenses").format(exported))
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to handle %s", update.update_id)
+        await update.message.reply_text(_('An error occurred while exporting expenses.'))
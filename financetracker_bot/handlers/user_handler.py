@@ -4,33 +4,48 @@ functionalities to register new users, display help messages with command detail
 through using the bot.
 
 Functions:
+    help_text: Returns the translated list of the bot commands.
     start: Registers a new user or notifies them if they are already registered.
     show_help: Displays help information detailing available bot commands.
 """
+from sqlalchemy.ext.asyncio import AsyncSession
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from financetracker_bot.models.finance_model import User, session
+from financetracker_bot.models.database import with_session
+from financetracker_bot.models.finance_model import User
 
 from financetracker_bot.utils.translation import _
+from financetracker_bot.utils.user_cache import registered_users
 
 
-HELP_TEXT = _(
-    "Available commands:\n"
-    "/start - Register\n"
-    "/add <amount> <description> - Add an expense\n"
-    "/set_budget <category> <amount> - Set a budget for a category\n"
-    "/delete_budget <category> - Delete the set budget for a category\n"
-    "/show_budgets - Show all set budgets\n"
-    "/show - Show all added expenses\n"
-    "/delete <id> - Delete an expense by ID\n"
-    "/analysis <start_date> <start_time> <end_date> <end_time>. "
-    "Date and time format: YYYY-MM-DD HH:MM:SS\n"
-    "/help - Show this message\n"
-)
-
+def help_text():
+    """
+    Returns the list of the bot commands, translated when it is first needed rather than on import.
 
-async def start(update: Update, context: CallbackContext) -> None:
+    Returns:
+        str: The help text.
+    """
+    return _(
+        "Available commands:\n"
+        "/start - Register\n"
+        "/add <amount> <description> - Add an expense\n"
+        "/set_budget <category> <amount> - Set a budget for a category\n"
+        "/delete_budget <category> - Delete the set budget for a category\n"
+        "/show_budgets - Show all set budgets\n"
+        "/show - Show all added expenses\n"
+        "/delete <id> - Delete an expense by ID\n"
+        "/category <id> <category> - Move an expense to another category\n"
+        "/import - Import expenses from a CSV file sent with this caption\n"
+        "/export [from] [to] [csv|parquet] - Export expenses. Date format: YYYY-MM-DD\n"
+        "/analysis <start_date> <start_time> <end_date> <end_time>. "
+        "Date and time format: YYYY-MM-DD HH:MM:SS\n"
+        "/help - Show this message\n"
+    )
+
+
+@with_session
+async def start(update: Update, context: CallbackContext, db: AsyncSession) -> None:
     """
     Registers a new user in the system if they are not already registered, or welcomes them back if
     they are.
@@ -44,6 +59,7 @@ async def start(update: Update, context: CallbackContext) -> None:
                          chat details.
         context (CallbackContext): The context object provided by the Telegram bot framework which
                                    carries data and settings related to the command being processed.
+        db (AsyncSession): The database session of the current update.
 
     Usage:
         User types: /start
@@ -51,19 +67,20 @@ async def start(update: Update, context: CallbackContext) -> None:
     user_id = update.effective_user.id
     user_name = update.effective_user.first_name
 
-    existing_user = session.query(User).filter(User.uid == user_id).first()
+    existing_user = user_id in registered_users or await db.get(User, user_id)
 
     if not existing_user:
         new_user = User(uid=user_id, name=user_name)
-        session.add(new_user)
-        session.commit()
+        db.add(new_user)
+        await db.commit()
         welcome_message = (
             _("Hello! I am a finance management bot. You have successfully registered.\n")
         )
     else:
         welcome_message = _("Hello! You are already registered.\n")
+    registered_users.add(user_id)
 
-    welcome_message += HELP_TEXT
+    welcome_message += help_text()
     await update.message.reply_text(welcome_message)
 
 
@@ -82,4 +99,4 @@ async def show_help(update: Update, context: CallbackContext) -> None:
     Usage:
         User types: /help
     """
-    await update.message.reply_text(HELP_TEXT)
+    await update.message.reply_text(help_text())
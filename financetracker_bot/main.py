@@ -6,12 +6,25 @@ setting and deleting budgets, and providing financial analysis.
 Handlers for these commands are imported from separate modules.
 """
 import logging
-from telegram.ext import Application, CommandHandler
+import signal
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+from financetracker_bot.app_context import bootstrap
 from financetracker_bot.handlers.user_handler import start, show_help
-from financetracker_bot.handlers.expense_handler import add_expense, show_expenses, delete_expense
-from financetracker_bot.handlers.budget_handler import set_budget, delete_budget, show_budgets, financial_analysis
+from financetracker_bot.handlers.expense_handler import (add_expense, show_expenses, show_expenses_page, delete_expense,
+                                                         recategorize_expense, import_expenses, export_expenses,
+                                                         batch_classifier, classification_cache, expense_writer, openai_breaker,
+                                                         reclassification_worker, SHOW_CALLBACK_PREFIX)
+from financetracker_bot.handlers.budget_handler import set_budget, delete_budget, show_budgets, financial_analysis, chart_renderer
+from financetracker_bot.models.database import get_async_engine
+from financetracker_bot.utils.chart_cache import chart_cache
+from financetracker_bot.utils.metrics import instrument_engine, instrument_handlers, register_stats, start_metrics_server
+from financetracker_bot.utils.query_profiler import query_profiler
+from financetracker_bot.utils.update_processor import PerUserUpdateProcessor
+from financetracker_bot.utils.user_cache import registered_users
 
-from config.config import TELEGRAM_BOT_TOKEN
+from financetracker_bot.config.config import (TELEGRAM_BOT_TOKEN, BOT_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+                                               WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS,
+                                               CONCURRENT_UPDATES, SHUTDOWN_DRAIN_TIMEOUT, METRICS_PORT, METRICS_ADDR)
 
 
 logging.basicConfig(
@@ -22,33 +35,153 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main():
+async def start_background_work(application: Application) -> None:
     """
-    Sets up the Telegram bot application with command handlers and starts polling for updates.
+    Starts the work done outside of updates once the application is initialized.
+
+    The reclassification worker moves the expenses that were saved as 'Other', including the ones
+    queued before the last shutdown, to their real categories.
+
+    Args:
+        application (Application): The starting application.
+    """
+    reclassification_worker.start(application.bot)
+
+
+async def drain(application: Application) -> None:
+    """
+    Lets the work started by the processed updates finish once no new updates are accepted.
+
+    The application itself finishes the updates it already received before stopping; this commits
+    the grouped writes still pending, stops the reclassification worker and waits up to
+    ``SHUTDOWN_DRAIN_TIMEOUT`` seconds for the classifications that missed the /add deadline. The
+    expenses still queued are classified after the next start.
+
+    Args:
+        application (Application): The stopping application.
+    """
+    if expense_writer is not None:
+        await expense_writer.drain()
+    pending = await reclassification_worker.drain(SHUTDOWN_DRAIN_TIMEOUT)
+    if pending:
+        logger.warning("%d background classifications did not finish before shutdown", pending)
+
+
+async def shutdown(application: Application) -> None:
+    """
+    Releases the resources of the handlers when the application stops.
+
+    Args:
+        application (Application): The stopping application.
+    """
+    chart_renderer.shutdown()
+
+
+def build_application(token=TELEGRAM_BOT_TOKEN, request_class=None):
+    """
+    Creates the Telegram bot application and registers the command handlers.
+
+    Up to ``CONCURRENT_UPDATES`` updates of different users are processed at the same time; the
+    updates of one user are processed one after another, in the order they arrived. All handlers
+    are instrumented for the metrics endpoint.
 
     Command Handlers:
         /start: Starts the bot and shows a welcome message.
         /add: Adds an expense.
-        /show: Shows a list of expenses.
+        /show: Shows a list of expenses, paged with inline buttons.
         /set_budget: Sets a budget.
         /delete: Deletes an expense.
+        /category: Moves an expense to another category.
+        /import: Imports expenses from a CSV file sent with this caption.
+        /export: Sends the expenses as a CSV or Parquet file.
         /delete_budget: Deletes a budget.
         /show_budgets: Shows a list of budgets.
         /analysis: Provides financial analysis.
         /help: Shows the help message with command descriptions.
+
+    Args:
+        token (str, optional): The token of the bot.
+        request_class (type, optional): A ``telegram.request.BaseRequest`` subclass the bot sends
+                                        its API requests with instead of HTTP, e.g. for load tests.
+
+    Returns:
+        Application: The application, ready to be run.
     """
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    builder = (Application.builder().token(token).concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+               .post_init(start_background_work).post_stop(drain).post_shutdown(shutdown))
+    if request_class is not None:
+        builder = builder.request(request_class()).get_updates_request(request_class())
+    application = builder.build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("add", add_expense))
     application.add_handler(CommandHandler("show", show_expenses))
+    application.add_handler(CallbackQueryHandler(show_expenses_page, pattern=f"^{SHOW_CALLBACK_PREFIX}"))
     application.add_handler(CommandHandler("set_budget", set_budget))
     application.add_handler(CommandHandler("delete", delete_expense))
+    application.add_handler(CommandHandler("category", recategorize_expense))
+    application.add_handler(CommandHandler("import", import_expenses))
+    application.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r'^/import\b'), import_expenses))
+    application.add_handler(CommandHandler("export", export_expenses))
     application.add_handler(CommandHandler("delete_budget", delete_budget))
     application.add_handler(CommandHandler("show_budgets", show_budgets))
     application.add_handler(CommandHandler("analysis", financial_analysis))
     application.add_handler(CommandHandler("help", show_help))
-    application.run_polling()
+
+    instrument_handlers(application)
+    engine = get_async_engine().sync_engine
+    instrument_engine(engine)
+    query_profiler.attach(engine)
+    register_stats('update_processor', application.update_processor.stats)
+    register_stats('chart_renderer', chart_renderer.stats)
+    register_stats('chart_cache', chart_cache.stats)
+    register_stats('classification_cache', classification_cache.stats)
+    register_stats('batch_classifier', batch_classifier.stats)
+    register_stats('registered_users', registered_users.stats)
+    register_stats('openai_breaker', openai_breaker.stats)
+    register_stats('reclassification_worker', reclassification_worker.stats)
+    if expense_writer is not None:
+        register_stats('expense_writer', expense_writer.stats)
+    return application
+
+
+def webhook_options():
+    """
+    Collects the webhook server settings from the configuration.
+
+    Returns:
+        dict: The keyword arguments of ``Updater.start_webhook`` and ``Application.run_webhook``.
+    """
+    return {
+        'listen': WEBHOOK_LISTEN,
+        'port': WEBHOOK_PORT,
+        'url_path': WEBHOOK_PATH,
+        'webhook_url': f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}" if WEBHOOK_URL else None,
+        'secret_token': WEBHOOK_SECRET_TOKEN or None,
+        'max_connections': WEBHOOK_MAX_CONNECTIONS,
+    }
+
+
+def main():
+    """
+    Starts the Telegram bot, receiving updates by long polling or, if ``BOT_MODE`` is ``webhook``,
+    with a local webhook server.
+
+    If ``METRICS_PORT`` is set, the metrics are served in the Prometheus text format on that port.
+    On SIGINT or SIGTERM the bot stops accepting updates, finishes the ones already received and
+    drains the background work before exiting. The database and the schema are prepared before
+    the first update is received. SIGUSR1 switches the query profiler on or off.
+    """
+    bootstrap()
+    application = build_application()
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: query_profiler.toggle())
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT, METRICS_ADDR)
+    if BOT_MODE == 'webhook':
+        application.run_webhook(**webhook_options())
+    else:
+        application.run_polling()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+"""
+This module computes the spending statistics shown by the financial analysis.
+
+The period is split by :func:`financetracker_bot.models.rollups.plan`: whole calendar months are
+read from the monthly rollups, the remaining whole days from the daily rollups and only the partial
+days at the edges from the ``(uid, date)`` index range of the expenses. The segments are combined
+with ``UNION ALL`` and aggregated by category in one query, so a multi-year analysis reads about
+one row per month and category instead of every expense.
+
+With ``verify`` the statistics are also computed from the raw expenses; a mismatch is logged and
+the raw statistics are returned.
+
+Functions:
+    get_category_summary: Returns per-category spending statistics of a user over a period.
+    get_raw_category_summary: Computes the same statistics from the raw expenses only.
+"""
+import logging
+import math
+from collections import namedtuple
+
+from sqlalchemy import func, select, union_all
+
+from financetracker_bot.config.config import ROLLUP_VERIFY
+from financetracker_bot.models import rollups
+from financetracker_bot.models.finance_model import Expense
+
+logger = logging.getLogger(__name__)
+
+CategorySummary = namedtuple('CategorySummary', ['category', 'total', 'count', 'minimum', 'maximum', 'average'])
+
+
+async def get_category_summary(db, uid, start, end, verify=ROLLUP_VERIFY):
+    """
+    Returns per-category spending statistics of a user over a period.
+
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        start (datetime.datetime): The beginning of the period, inclusive.
+        end (datetime.datetime): The end of the period, inclusive.
+        verify (bool, optional): Whether to check the result against the raw expenses.
+
+    Returns:
+        list: A :class:`CategorySummary` for every category with expenses in the period, the
+              largest total first.
+    """
+    segments = union_all(*(rollups.segment_query(uid, segment) for segment in rollups.plan(start, end))).subquery()
+    total = func.sum(segments.c.total)
+    stmt = (
+        select(segments.c.category, total, func.sum(segments.c.count), func.min(segments.c.minimum),
+               func.max(segments.c.maximum))
+        .group_by(segments.c.category)
+        .order_by(total.desc())
+    )
+    summary = [CategorySummary(category, total, count, minimum, maximum, total / count)
+               for category, total, count, minimum, maximum in await db.execute(stmt)]
+    if verify:
+        raw = await get_raw_category_summary(db, uid, start, end)
+        if not _same(summary, raw):
+            logger.error("Rollup analysis of user %s from %s to %s differs from the expenses: %s != %s",
+                         uid, start, end, summary, raw)
+            return raw
+    return summary
+
+
+async def get_raw_category_summary(db, uid, start, end):
+    """
+    Computes per-category spending statistics of a user over a period from the raw expenses.
+
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        start (datetime.datetime): The beginning of the period, inclusive.
+        end (datetime.datetime): The end of the period, inclusive.
+
+    Returns:
+        list: A :class:`CategorySummary` for every category with expenses in the period, the
+              largest total first.
+    """
+    total = func.sum(Expense.amount)
+    stmt = (
+        select(Expense.category, total, func.count(), func.min(Expense.amount),
+               func.max(Expense.amount), func.avg(Expense.amount))
+        .where(Expense.uid == uid, Expense.date >= start, Expense.date <= end, Expense.amount.is_not(None))
+        .group_by(Expense.category)
+        .order_by(total.desc())
+    )
+    return [CategorySummary(*row) for row in await db.execute(stmt)]
+
+
+def _same(summary, raw, tolerance=1e-6):
+    """
+    Compares two summaries by category, allowing for the rounding of float sums.
+    """
+    rows = {row.category: row for row in raw}
+    if len(rows) != len(summary):
+        return False
+    for row in summary:
+        other = rows.get(row.category)
+        if other is None or row.count != other.count:
+            return False
+        for field in ('total', 'minimum', 'maximum', 'average'):
+            if not math.isclose(getattr(row, field), getattr(other, field), rel_tol=1e-9, abs_tol=tolerance):
+                return False
+    return True
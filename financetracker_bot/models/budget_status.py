@@ -0,0 +1,49 @@
+"""
+This module reports how much of their budgets users have spent.
+
+The status of every budget of a user is read with a single query joining the budgets with the
+maintained category totals, instead of one aggregate query per budget.
+
+Functions:
+    get_budget_status: Returns the budget, amount spent and spent percentage of a user's categories.
+"""
+from collections import namedtuple
+
+from sqlalchemy import and_, func, select
+
+from financetracker_bot.models.finance_model import Budget, CategoryTotal
+
+BudgetStatus = namedtuple('BudgetStatus', ['category', 'budget', 'spent', 'percent'])
+
+
+async def get_budget_status(db, uid, category=None):
+    """
+    Returns the budget, amount spent and spent percentage of a user's categories.
+
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        category (str, optional): Only report this category.
+
+    Returns:
+        list: A :class:`BudgetStatus` for every budget of the user, in the order the budgets were
+              created.
+    """
+    stmt = (
+        select(Budget.category, Budget.amount, func.coalesce(CategoryTotal.total, 0))
+        .outerjoin(CategoryTotal, and_(CategoryTotal.uid == Budget.uid,
+                                       CategoryTotal.category == Budget.category))
+        .where(Budget.uid == uid)
+        .order_by(Budget.bid)
+    )
+    if category is not None:
+        stmt = stmt.where(Budget.category == category)
+
+    statuses = []
+    for budget_category, amount, spent in await db.execute(stmt):
+        if amount:
+            percent = spent / amount * 100
+        else:
+            percent = float('inf') if spent else 0.0
+        statuses.append(BudgetStatus(budget_category, amount, spent, percent))
+    return statuses
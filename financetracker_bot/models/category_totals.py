@@ -0,0 +1,172 @@
+"""
+This module maintains the per-category spending totals stored in the ``category_totals`` table.
+A total covers the user's whole history, which is what budgets are checked against; spending over
+shorter periods is read from the rollups of :mod:`financetracker_bot.models.rollups`.
+
+Every change to an expense must be mirrored here in the same transaction, so that budget checks
+read one row instead of summing the user's entire history. The rebuild and verify commands
+recompute the totals from the ``expenses`` table::
+
+    python -m financetracker_bot.models.category_totals verify
+    python -m financetracker_bot.models.category_totals rebuild
+
+Functions:
+    apply_expense: Adds an expense amount to (or removes it from) a category total.
+    move_expense: Moves an expense amount from one category total to another.
+    get_total: Returns the amount spent by a user in a category.
+    rebuild: Recomputes the totals from the expenses.
+    verify: Reports totals that drifted from the expenses.
+"""
+import argparse
+
+from sqlalchemy import delete, func, insert, select, update
+
+from financetracker_bot.models.database import conflict_insert
+from financetracker_bot.models.finance_model import CategoryTotal, Expense
+
+async def apply_expense(db, uid, category, amount, count=1):
+    """
+    Adds an expense amount to a category total.
+
+    Pass a negative amount and ``count=-1`` to remove a deleted expense.
+
+    Args:
+        db (AsyncSession): The database session changing the expense.
+        uid (int): The ID of the user.
+        category (str): The category of the expense.
+        amount (float): The amount to add.
+        count (int, optional): The change of the number of expenses.
+    """
+    stmt = conflict_insert(db, CategoryTotal)
+    if stmt is not None:
+        stmt = stmt.values(uid=uid, category=category, total=amount, count=count)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=['uid', 'category'],
+            set_={'total': CategoryTotal.total + stmt.excluded.total,
+                  'count': CategoryTotal.count + stmt.excluded.count},
+        ))
+        return
+
+    result = await db.execute(
+        update(CategoryTotal)
+        .filter_by(uid=uid, category=category)
+        .values(total=CategoryTotal.total + amount, count=CategoryTotal.count + count)
+    )
+    if result.rowcount == 0:
+        db.add(CategoryTotal(uid=uid, category=category, total=amount, count=count))
+
+
+async def move_expense(db, uid, old_category, new_category, amount):
+    """
+    Moves an expense amount from one category total to another.
+
+    Args:
+        db (AsyncSession): The database session changing the expense.
+        uid (int): The ID of the user.
+        old_category (str): The previous category of the expense.
+        new_category (str): The new category of the expense.
+        amount (float): The amount of the expense.
+    """
+    if old_category == new_category:
+        return
+    await apply_expense(db, uid, old_category, -amount, count=-1)
+    await apply_expense(db, uid, new_category, amount)
+
+
+async def get_total(db, uid, category):
+    """
+    Returns the amount spent by a user in a category.
+
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        category (str): The category.
+
+    Returns:
+        float: The total of the category, 0 if the user has no expenses in it.
+    """
+    total = await db.scalar(select(CategoryTotal.total).filter_by(uid=uid, category=category))
+    return total or 0
+
+
+def _expense_totals(uid=None):
+    stmt = (select(Expense.uid, Expense.category, func.sum(Expense.amount), func.count())
+            .group_by(Expense.uid, Expense.category))
+    if uid is not None:
+        stmt = stmt.where(Expense.uid == uid)
+    return stmt
+
+
+def rebuild(connection, uid=None):
+    """
+    Recomputes the totals from the expenses.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to run the statements on; the
+                                                   caller controls the transaction.
+        uid (int, optional): Only rebuild the totals of this user.
+    """
+    stmt = delete(CategoryTotal)
+    if uid is not None:
+        stmt = stmt.where(CategoryTotal.uid == uid)
+    connection.execute(stmt)
+    connection.execute(insert(CategoryTotal).from_select(
+        ['uid', 'category', 'total', 'count'], _expense_totals(uid)))
+
+
+def verify(connection, uid=None, tolerance=1e-6):
+    """
+    Reports totals that differ from the sums of the expenses.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to read from.
+        uid (int, optional): Only verify the totals of this user.
+        tolerance (float, optional): The largest rounding difference that is not drift.
+
+    Returns:
+        list: A dict with ``uid``, ``category``, ``stored`` and ``actual`` total and count for
+              every drifted total.
+    """
+    actual = {(row[0], row[1]): (row[2], row[3]) for row in connection.execute(_expense_totals(uid))}
+    stmt = select(CategoryTotal.uid, CategoryTotal.category, CategoryTotal.total, CategoryTotal.count)
+    if uid is not None:
+        stmt = stmt.where(CategoryTotal.uid == uid)
+    stored = {(row[0], row[1]): (row[2], row[3]) for row in connection.execute(stmt)}
+
+    drift = []
+    for key in sorted(actual.keys() | stored.keys(), key=str):
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        actual_total, actual_count = actual.get(key, (0.0, 0))
+        if abs(stored_total - actual_total) > tolerance or stored_count != actual_count:
+            drift.append({'uid': key[0], 'category': key[1], 'stored': (stored_total, stored_count),
+                          'actual': (actual_total, actual_count)})
+    return drift
+
+
+def main(argv=None):
+    """
+    Verifies or rebuilds the category totals of the configured database.
+
+    Args:
+        argv (list, optional): Command line arguments.
+    """
+    from financetracker_bot.models.finance_model import engine  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description='Verify or rebuild the per-category spending totals.')
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('--uid', type=int, help='Only process this user.')
+    args = parser.parse_args(argv)
+
+    with engine.begin() as connection:
+        drift = verify(connection, args.uid)
+        for row in drift:
+            print(f"uid {row['uid']}, category {row['category']}: stored {row['stored']}, actual {row['actual']}")
+        print(f"{len(drift)} drifted totals")
+        if args.command == 'rebuild':
+            rebuild(connection, args.uid)
+            print("Totals rebuilt")
+    return 1 if drift and args.command == 'verify' else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
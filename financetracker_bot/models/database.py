@@ -0,0 +1,280 @@
+"""
+This module provides asynchronous database access for the Telegram handlers.
+
+Handlers run on the python-telegram-bot event loop, so they must not block it with synchronous
+SQLAlchemy calls or share one session between concurrent updates. Instead every update gets its
+own :class:`~sqlalchemy.ext.asyncio.AsyncSession` created from an asyncio engine. The engine URL is
+taken from ``DATABASE_URL`` in the configuration; SQLite uses the aiosqlite driver and other
+backends may use any asyncio driver supported by SQLAlchemy.
+
+All engines are created by :func:`make_engine` and :func:`make_async_engine`, which apply the
+``DATABASE_PROFILE`` of the configuration. With the ``tuned`` profile every SQLite connection uses
+write-ahead logging, so readers no longer wait for the writer, and server databases get a sized,
+pre-pinged connection pool.
+
+The engines of the bot are created on first use, so importing the handlers neither opens nor
+creates the database. :func:`configure` points them at another database before that, e.g. a
+temporary file in tests and benchmarks.
+
+Functions:
+    to_async_url: Converts a database URL to the URL of its asyncio driver.
+    engine_options: Returns the ``create_engine`` arguments of a database profile.
+    make_engine: Creates a synchronous engine with a database profile.
+    make_async_engine: Creates an asyncio engine with a database profile.
+    conflict_insert: Builds an INSERT supporting ``ON CONFLICT`` clauses for the session's backend.
+    configure: Sets the database the engines of the bot connect to.
+    get_engine: Returns the synchronous engine of the bot, creating it on first use.
+    get_async_engine: Returns the asyncio engine of the bot, creating it on first use.
+    get_session_factory: Returns the factory of the sessions handlers run in.
+    with_session: Decorator that opens a session per update and passes it to the handler.
+"""
+import functools
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from financetracker_bot.config.config import (DATABASE_URL, DATABASE_PROFILE, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS,
+                                               SQLITE_BUSY_TIMEOUT, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE,
+                                               DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_PRE_PING,
+                                               DATABASE_POOL_RECYCLE)
+
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'asyncpg',
+    'mysql': 'aiomysql',
+}
+
+
+def to_async_url(url):
+    """
+    Converts a database URL to the URL of its asyncio driver.
+
+    URLs that already name a driver explicitly (e.g. ``postgresql+psycopg://``) are returned
+    unchanged, so any asyncio driver supported by SQLAlchemy can be configured directly.
+
+    Args:
+        url (str): The database URL, e.g. ``sqlite:///finance_tracker.db``.
+
+    Returns:
+        sqlalchemy.engine.URL: The URL using an asyncio driver.
+    """
+    url = make_url(url)
+    if '+' in url.drivername:
+        return url
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f'No asyncio driver is known for database URL {url!r}')
+    return url.set(drivername=f'{url.get_backend_name()}+{driver}')
+
+
+CONFLICT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def conflict_insert(db, entity):
+    """
+    Builds an INSERT statement supporting ``ON CONFLICT`` clauses for the session's backend.
+
+    Args:
+        db (AsyncSession): The database session the statement will be executed in.
+        entity: The mapped class or table to insert into.
+
+    Returns:
+        sqlalchemy.sql.Insert: The dialect specific INSERT, or None if the backend has no
+                               ``ON CONFLICT`` support.
+    """
+    insert = CONFLICT_INSERTS.get(db.bind.dialect.name)
+    return insert(entity) if insert else None
+
+
+PROFILES = ('default', 'tuned')
+
+
+def sqlite_pragmas():
+    """
+    Returns the PRAGMA statements the tuned profile runs on every new SQLite connection.
+
+    Returns:
+        list: The statements, in the order they are executed.
+    """
+    return [
+        f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}',
+        f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}',
+        f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}',
+        f'PRAGMA cache_size={SQLITE_CACHE_SIZE}',
+    ]
+
+
+def engine_options(url, profile=DATABASE_PROFILE):
+    """
+    Returns the ``create_engine`` arguments of a database profile.
+
+    SQLite pools are left to SQLAlchemy, which picks the right pool for files and in-memory
+    databases; server databases get the configured pool size, overflow, pre-ping and recycling.
+
+    Args:
+        url (str): The database URL.
+        profile (str, optional): ``tuned`` or ``default``.
+
+    Returns:
+        dict: The keyword arguments for ``create_engine`` or ``create_async_engine``.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown database profile {profile!r}')
+    if profile == 'default' or make_url(url).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': DATABASE_POOL_SIZE,
+        'max_overflow': DATABASE_MAX_OVERFLOW,
+        'pool_pre_ping': DATABASE_POOL_PRE_PING,
+        'pool_recycle': DATABASE_POOL_RECYCLE,
+    }
+
+
+def _tune(engine, profile):
+    if profile != 'tuned' or engine.dialect.name != 'sqlite':
+        return engine
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):  # pylint: disable=unused-argument
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def make_engine(url=DATABASE_URL, profile=DATABASE_PROFILE):
+    """
+    Creates a synchronous engine with a database profile.
+
+    Args:
+        url (str, optional): The database URL.
+        profile (str, optional): ``tuned`` or ``default``.
+
+    Returns:
+        sqlalchemy.engine.Engine: The engine.
+    """
+    return _tune(create_engine(url, **engine_options(url, profile)), profile)
+
+
+def make_async_engine(url=DATABASE_URL, profile=DATABASE_PROFILE):
+    """
+    Creates an asyncio engine with a database profile.
+
+    Args:
+        url (str, optional): The database URL; it is converted with :func:`to_async_url`.
+        profile (str, optional): ``tuned`` or ``default``.
+
+    Returns:
+        sqlalchemy.ext.asyncio.AsyncEngine: The engine.
+    """
+    engine = create_async_engine(to_async_url(url), **engine_options(url, profile))
+    _tune(engine.sync_engine, profile)
+    return engine
+
+
+# The database of the bot and its engines, created on first use.
+_settings = {'url': DATABASE_URL, 'profile': DATABASE_PROFILE}
+_engines = {}
+
+
+def configure(url=None, profile=None):
+    """
+    Sets the database the engines of the bot connect to.
+
+    Args:
+        url (str, optional): The database URL, e.g. ``sqlite:////tmp/bot.db``; defaults to
+                             ``DATABASE_URL``.
+        profile (str, optional): ``tuned`` or ``default``; defaults to ``DATABASE_PROFILE``.
+
+    Raises:
+        RuntimeError: If an engine has already been created for the previous database.
+    """
+    if _engines:
+        raise RuntimeError('The database cannot be changed after its engines were created')
+    _settings['url'] = url or DATABASE_URL
+    _settings['profile'] = profile or DATABASE_PROFILE
+
+
+def database_url():
+    """
+    Returns the URL of the database of the bot.
+
+    Returns:
+        str: The URL set by :func:`configure` or ``DATABASE_URL``.
+    """
+    return _settings['url']
+
+
+def get_engine():
+    """
+    Returns the synchronous engine of the bot, creating it on first use.
+
+    Returns:
+        sqlalchemy.engine.Engine: The engine.
+    """
+    if 'sync' not in _engines:
+        _engines['sync'] = make_engine(_settings['url'], _settings['profile'])
+    return _engines['sync']
+
+
+def get_async_engine():
+    """
+    Returns the asyncio engine of the bot, creating it on first use.
+
+    Returns:
+        sqlalchemy.ext.asyncio.AsyncEngine: The engine.
+    """
+    if 'async' not in _engines:
+        _engines['async'] = make_async_engine(_settings['url'], _settings['profile'])
+    return _engines['async']
+
+
+def get_session_factory():
+    """
+    Returns the factory of the sessions handlers run in, bound to :func:`get_async_engine`.
+
+    Returns:
+        sqlalchemy.ext.asyncio.async_sessionmaker: The session factory.
+    """
+    if 'sessions' not in _engines:
+        _engines['sessions'] = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+    return _engines['sessions']
+
+
+def __getattr__(name):
+    # ``async_engine`` and ``async_session_factory`` were module attributes before the engines
+    # were created lazily.
+    if name == 'async_engine':
+        return get_async_engine()
+    if name == 'async_session_factory':
+        return get_session_factory()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def with_session(handler):
+    """
+    Decorates a handler so that it receives its own database session for the current update.
+
+    The wrapped handler keeps the ``(update, context)`` signature expected by python-telegram-bot
+    and is called as ``handler(update, context, db)``. The session is closed when the handler
+    returns, and uncommitted changes are rolled back.
+
+    Args:
+        handler (Callable): The coroutine function handling an update.
+
+    Returns:
+        Callable: The wrapped coroutine function.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update, context, *args, **kwargs):
+        async with get_session_factory()() as db:
+            return await handler(update, context, db, *args, **kwargs)
+    return wrapper
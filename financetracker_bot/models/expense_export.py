@@ -0,0 +1,86 @@
+"""
+This module exports the expense history of a user to a compressed CSV or Parquet file.
+
+The expenses are streamed from the database with a server-side cursor (``yield_per``) and only
+the exported columns are selected, so no ORM objects are created and at most one chunk of rows is
+held in memory. Every chunk is appended to the file as it arrives: CSV rows are gzip compressed,
+and Parquet gets one zstd compressed row group per chunk.
+
+Functions:
+    export_expenses: Streams a user's expenses over a period into a file.
+"""
+import csv
+import gzip
+
+from sqlalchemy import select
+
+from financetracker_bot.models.finance_model import Expense
+
+FORMATS = ('csv', 'parquet')
+FILE_NAMES = {'csv': 'expenses.csv.gz', 'parquet': 'expenses.parquet'}
+COLUMNS = ('id', 'date', 'amount', 'category', 'description')
+
+
+def _parquet_writer(path):
+    # pylint: disable=import-outside-toplevel
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([('id', pa.int64()), ('date', pa.timestamp('us')), ('amount', pa.float64()),
+                        ('category', pa.string()), ('description', pa.string())])
+    writer = pq.ParquetWriter(path, schema, compression='zstd')
+
+    def write(rows):
+        writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type) for column, field
+                                                 in zip(zip(*rows), schema)], schema=schema))
+    return write, writer.close
+
+
+def _csv_writer(path):
+    file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+    writer = csv.writer(file)
+    writer.writerow(COLUMNS)
+    return writer.writerows, file.close
+
+
+async def export_expenses(db, uid, path, file_format='csv', start=None, end=None, chunk_size=1000):
+    """
+    Streams a user's expenses over a period into a file, oldest first.
+
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        path (str): The path of the file to write.
+        file_format (str, optional): ``csv`` for a gzip compressed CSV file or ``parquet``.
+        start (datetime.datetime, optional): The beginning of the period, inclusive.
+        end (datetime.datetime, optional): The end of the period, exclusive.
+        chunk_size (int, optional): The number of rows fetched and written at a time.
+
+    Returns:
+        int: The number of exported expenses.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown export format: {file_format!r}')
+
+    stmt = (select(Expense.eid, Expense.date, Expense.amount, Expense.category, Expense.name)
+            .where(Expense.uid == uid)
+            .order_by(Expense.date, Expense.eid)
+            .execution_options(yield_per=chunk_size))
+    if start is not None:
+        stmt = stmt.where(Expense.date >= start)
+    if end is not None:
+        stmt = stmt.where(Expense.date < end)
+
+    write, close = _parquet_writer(path) if file_format == 'parquet' else _csv_writer(path)
+    exported = 0
+    try:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            write(rows)
+            exported += len(rows)
+    finally:
+        close()
+    return exported
@@ -0,0 +1,212 @@
+"""
+This module imports the expense history of a user from a CSV file or bank statement.
+
+The file is read row by row and written in chunks: every chunk is classified as a whole, inserted
+with one bulk ``INSERT`` and committed, so memory stays flat however long the history is. Expenses
+the classification model was unavailable for are queued for reclassification in the transaction of
+their chunk. The category totals and the daily and monthly rollups are recomputed once for the user when the import
+ends instead of being updated per expense.
+
+The first row of the file names the columns. ``date``, ``amount`` and ``description`` are required
+and ``category`` is optional; Russian column names are accepted as well. Comma, semicolon and tab
+separated files are recognized. Categories are matched against the predefined ones, and rows with
+any other category are classified like rows without one. Bank statements list spendings as negative
+amounts: if the file has any, its positive rows are credits and refunds and are not imported.
+
+Functions:
+    read_expenses: Parses the rows of an expense CSV file.
+    import_expenses: Writes parsed expenses in chunks and rebuilds the user's totals.
+"""
+import csv
+import datetime
+import itertools
+from collections import namedtuple
+
+from sqlalchemy import insert
+
+from financetracker_bot.models import category_totals, rollups
+from financetracker_bot.models.finance_model import Expense, ReclassificationEntry
+
+ImportResult = namedtuple('ImportResult', ['imported', 'skipped', 'categories', 'queued'])
+
+COLUMNS = {
+    'date': ('date', 'дата'),
+    'amount': ('amount', 'sum', 'сумма'),
+    'description': ('description', 'name', 'описание'),
+    'category': ('category', 'категория'),
+}
+
+DATE_FORMATS = ('%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y')
+
+
+def _parse_date(value):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f'Unknown date format: {value!r}')
+
+
+def _parse_amount(value):
+    # Bank statements may group digits with spaces.
+    return float(value.replace('\xa0', '').replace(' ', '').replace(',', '.'))
+
+
+def _has_negative_amounts(file, dialect, position):
+    start = file.tell()
+    try:
+        for row in csv.reader(file, dialect):
+            try:
+                if _parse_amount(row[position]) < 0:
+                    return True
+            except (IndexError, ValueError):
+                continue
+        return False
+    finally:
+        file.seek(start)
+
+
+def read_expenses(file, categories=()):
+    """
+    Parses the rows of an expense CSV file.
+
+    The file is read twice: first to find out whether its spendings are negative amounts.
+
+    Args:
+        file: The seekable text file to read, opened with ``newline=''``.
+        categories (Iterable, optional): The predefined categories. A category cell is mapped onto
+                                         the one it matches ignoring case; cells matching none of
+                                         them are ignored.
+
+    Yields:
+        dict: The ``date``, ``amount``, ``name`` and ``category`` (None if the file has no category
+              column or the cell holds no predefined category) of every spending, or None for rows
+              that cannot be parsed.
+
+    Raises:
+        ValueError: If the header lacks a required column.
+    """
+    header = file.readline()
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    names = [name.strip().lower() for name in next(csv.reader([header], dialect), [])]
+
+    positions = {}
+    for column, aliases in COLUMNS.items():
+        for position, name in enumerate(names):
+            if name in aliases:
+                positions[column] = position
+                break
+    missing = [column for column in ('date', 'amount', 'description') if column not in positions]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    known = {category.lower(): category for category in categories}
+    signed = _has_negative_amounts(file, dialect, positions['amount'])
+    for row in csv.reader(file, dialect):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            amount = _parse_amount(row[positions['amount']])
+            if signed and amount >= 0:
+                continue
+            category = row[positions['category']].strip() if 'category' in positions else ''
+            yield {
+                'date': _parse_date(row[positions['date']].strip()),
+                'amount': abs(amount),
+                'name': row[positions['description']].strip(),
+                'category': known.get(category.lower()),
+            }
+        except (IndexError, ValueError):
+            yield None
+
+
+def _rebuild_aggregates(connection, uid):
+    category_totals.rebuild(connection, uid)
+    rollups.rebuild(connection, uid)
+
+
+async def _insert_chunk(db, uid, expenses, queued):
+    # ``queued`` holds the positions of the expenses to queue for reclassification.
+    values = [dict(expense, uid=uid) for expense in expenses]
+    if not queued:
+        await db.execute(insert(Expense), values)
+        return
+    eids = (await db.scalars(insert(Expense).returning(Expense.eid, sort_by_parameter_order=True), values)).all()
+    now = datetime.datetime.now()
+    await db.execute(insert(ReclassificationEntry), [
+        {'eid': eid, 'uid': uid, 'attempts': 0, 'next_attempt': now}
+        for position, eid in enumerate(eids) if position in queued
+    ])
+
+
+async def import_expenses(db, uid, rows, classify, chunk_size=1000, progress=None, fallback='Other',  # pylint: disable=too-many-arguments
+                          ensure_budget=None):
+    """
+    Writes parsed expenses in chunks and rebuilds the user's category totals and rollups.
+
+    Every chunk is committed on its own, together with the budgets of the categories it adds. The
+    totals and rollups are rebuilt even if the import fails part way, so that they match the chunks
+    that were committed.
+
+    Args:
+        db (AsyncSession): The database session of the import.
+        uid (int): The ID of the importing user.
+        rows (Iterable): The rows produced by :func:`read_expenses`.
+        classify (Callable): A coroutine function mapping a list of descriptions to their
+                             categories, called once per chunk for the rows without a category. The
+                             category is None for a description that could not be classified now.
+        chunk_size (int, optional): The number of rows inserted per transaction.
+        progress (Callable, optional): A coroutine function called with the number of imported
+                                       and skipped rows after every chunk.
+        fallback (str, optional): The category of the expenses ``classify`` returned None for;
+                                  they are queued for reclassification.
+        ensure_budget (Callable, optional): A coroutine function ``ensure_budget(db, uid, category)``
+                                            staging the budget of a category new to the import.
+
+    Returns:
+        ImportResult: The number of imported and skipped rows, the categories imported into and the
+                      number of expenses queued for reclassification.
+    """
+    imported = skipped = queued = 0
+    categories = set()
+    rows = iter(rows)
+    try:
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            expenses = [row for row in chunk if row is not None]
+            skipped += len(chunk) - len(expenses)
+
+            unclassified = [position for position, expense in enumerate(expenses) if expense['category'] is None]
+            unavailable = set()
+            if unclassified:
+                answers = await classify([expenses[position]['name'] for position in unclassified])
+                for position, category in zip(unclassified, answers):
+                    if category is None:
+                        unavailable.add(position)
+                        category = fallback
+                    expenses[position]['category'] = category
+
+            if expenses:
+                await _insert_chunk(db, uid, expenses, unavailable)
+                new_categories = {expense['category'] for expense in expenses} - categories
+                if ensure_budget is not None:
+                    for category in sorted(new_categories):
+                        await ensure_budget(db, uid, category)
+                await db.commit()
+                categories.update(new_categories)
+            imported += len(expenses)
+            queued += len(unavailable)
+            if progress is not None:
+                await progress(imported, skipped)
+    finally:
+        await db.rollback()
+        await db.run_sync(lambda session: _rebuild_aggregates(session.connection(), uid))
+        await db.commit()
+    return ImportResult(imported, skipped, categories, queued)
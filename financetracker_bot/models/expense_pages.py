@@ -0,0 +1,105 @@
+"""
+This module reads the expense history of a user one page at a time.
+
+Pages are addressed by a keyset cursor on ``(date, eid)`` instead of an offset, so every page is
+a single range scan of the ``(uid, date)`` index limited to one page of rows, no matter how long
+the history is. Only the columns shown to the user are selected; no ORM objects are loaded.
+
+Functions:
+    get_expense_page: Returns one page of a user's expenses around a cursor.
+    encode_cursor: Encodes a ``(date, eid)`` cursor for an inline keyboard button.
+    decode_cursor: Decodes a cursor encoded by :func:`encode_cursor`.
+"""
+import datetime
+from collections import namedtuple
+
+from sqlalchemy import exists, select, tuple_
+
+from financetracker_bot.models.finance_model import Expense
+
+ExpenseRow = namedtuple('ExpenseRow', ['eid', 'date', 'amount', 'category'])
+ExpensePage = namedtuple('ExpensePage', ['rows', 'has_older', 'has_newer'])
+
+OLDER = 'older'
+NEWER = 'newer'
+
+CURSOR_DATE_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+def encode_cursor(row):
+    """
+    Encodes a ``(date, eid)`` cursor compactly enough for Telegram's 64 byte callback data.
+
+    Args:
+        row (ExpenseRow): The expense the cursor points at.
+
+    Returns:
+        str: The encoded cursor.
+    """
+    return f"{row.date.strftime(CURSOR_DATE_FORMAT)}.{row.eid}"
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor encoded by :func:`encode_cursor`.
+
+    Args:
+        cursor (str): The encoded cursor.
+
+    Returns:
+        tuple: The ``(date, eid)`` of the expense the cursor points at.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    date, eid = cursor.split('.')
+    return datetime.datetime.strptime(date, CURSOR_DATE_FORMAT), int(eid)
+
+
+async def get_expense_page(db, uid, cursor=None, direction=OLDER, limit=20):
+    """
+    Returns one page of a user's expenses around a cursor, oldest first.
+
+    Without a cursor the page holds the most recent expenses. Otherwise it holds the expenses
+    directly before (``OLDER``) or after (``NEWER``) the cursor, excluding the cursor itself.
+
+    Args:
+        db (AsyncSession): The database session of the current update.
+        uid (int): The ID of the user.
+        cursor (tuple, optional): The ``(date, eid)`` to page from.
+        direction (str, optional): ``OLDER`` or ``NEWER``.
+        limit (int, optional): The number of expenses per page.
+
+    Returns:
+        ExpensePage: The rows of the page and whether there are older and newer expenses.
+    """
+    key = tuple_(Expense.date, Expense.eid)
+    stmt = select(Expense.eid, Expense.date, Expense.amount, Expense.category).where(Expense.uid == uid)
+    if direction == NEWER:
+        stmt = stmt.order_by(Expense.date, Expense.eid)
+        if cursor is not None:
+            stmt = stmt.where(key > tuple(cursor))
+    else:
+        stmt = stmt.order_by(Expense.date.desc(), Expense.eid.desc())
+        if cursor is not None:
+            stmt = stmt.where(key < tuple(cursor))
+
+    # One extra row tells whether there is another page in the paging direction.
+    rows = [ExpenseRow(*row) for row in await db.execute(stmt.limit(limit + 1))]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction != NEWER:
+        rows.reverse()
+
+    if not rows:
+        return ExpensePage([], False, False)
+
+    if direction == NEWER:
+        has_newer = more
+        has_older = await db.scalar(select(exists().where(
+            Expense.uid == uid, key < (rows[0].date, rows[0].eid))))
+    else:
+        has_older = more
+        has_newer = await db.scalar(select(exists().where(
+            Expense.uid == uid, key > (rows[-1].date, rows[-1].eid))))
+    return ExpensePage(rows, has_older, has_newer)
@@ -5,14 +5,18 @@ Users represent individual accounts, Expenses record financial transactions of t
 and Budgets set spending limits for categorized expenses. One user may have any number of
 expenses and budgets.
 
-The module sets up a SQLite database engine, creates all necessary tables based on the model
-definitions, and establishes a session for interacting with the database.
+On first use of its ``engine`` or ``session`` the module sets up a database engine for the configured
+``DATABASE_URL`` (SQLite by default) and ``DATABASE_PROFILE``, creates all necessary tables and indexes based on
+the model definitions, and establishes a synchronous session for scripts and tests. Telegram handlers use the asynchronous sessions from
+:mod:`financetracker_bot.models.database` instead.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import inspect, text, Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
+from financetracker_bot.models.database import get_engine
+
 Base = declarative_base()
 
 class User(Base):
@@ -41,6 +45,11 @@ class Expense(Base):
 
     user = relationship("User", back_populates="expenses")
 
+    __table_args__ = (
+        Index('ix_expenses_uid_category', 'uid', 'category'),
+        Index('ix_expenses_uid_date', 'uid', 'date'),
+    )
+
 
 class Budget(Base):
     """
@@ -54,8 +63,151 @@ class Budget(Base):
 
     user = relationship("User", back_populates="budgets")
 
-engine = create_engine('sqlite:///finance_tracker.db')
-Base.metadata.create_all(engine)
+    __table_args__ = (
+        Index('uq_budgets_uid_category', 'uid', 'category', unique=True),
+    )
+
+class CategoryTotal(Base):
+    """
+    Represents the running total of a user's expenses in a category over their whole history.
+
+    The totals are maintained in the same transaction as the expenses they summarize, so budget
+    checks read one row instead of summing the whole expense history. Totals over shorter periods
+    are read from the :class:`ExpenseRollup` rows.
+    """
+    __tablename__ = 'category_totals'
+    uid = Column(Integer, ForeignKey('users.uid'), primary_key=True, doc="The user whose expenses are summed.")
+    category = Column(String, primary_key=True, doc="The category of the summed expenses.")
+    total = Column(Float, nullable=False, default=0.0, doc="The sum of the expense amounts.")
+    count = Column(Integer, nullable=False, default=0, doc="The number of expenses.")
+
+
+class ExpenseRollup(Base):
+    """
+    Represents the expenses of a user in a category over one day or one calendar month.
+
+    The rollups are kept current by :mod:`financetracker_bot.models.rollups` whenever expenses are
+    inserted, updated or deleted, so the analysis of long periods reads one row per month instead
+    of every expense.
+    """
+    __tablename__ = 'expense_rollups'
+    uid = Column(Integer, ForeignKey('users.uid'), primary_key=True, doc="The user whose expenses are summed.")
+    grain = Column(String, primary_key=True, doc="'day' or 'month'.")
+    period_start = Column(DateTime, primary_key=True, doc="The midnight the day or the month begins at.")
+    category = Column(String, primary_key=True, doc="The category of the summed expenses.")
+    total = Column(Float, nullable=False, default=0.0, doc="The sum of the expense amounts.")
+    count = Column(Integer, nullable=False, default=0, doc="The number of expenses.")
+    minimum = Column(Float, doc="The smallest expense amount.")
+    maximum = Column(Float, doc="The largest expense amount.")
+
+
+class ClassificationCacheEntry(Base):
+    """
+    Represents a remembered category for a normalized expense description.
+
+    Entries with ``uid`` 0 are shared by all users and come from the classification model; entries
+    with a user ID are overrides made when that user re-categorized an expense.
+    """
+    __tablename__ = 'classification_cache'
+    description = Column(String, primary_key=True, doc="The normalized expense description.")
+    uid = Column(Integer, primary_key=True, default=0, doc="The user who overrode the category, or 0 for the shared entry.")
+    category = Column(String, nullable=False, doc="The category of expenses with this description.")
+    updated_at = Column(DateTime, doc="The date and time when the entry was last written.")
+
+
+class ReclassificationEntry(Base):
+    """
+    Represents an expense saved as 'Other' because the classification model did not answer in time
+    or was unavailable.
+
+    The entries are processed by :class:`~financetracker_bot.utils.reclassification_worker.ReclassificationWorker`,
+    which moves the expense to its real category and deletes the entry.
+    """
+    __tablename__ = 'reclassification_queue'
+    eid = Column(Integer, primary_key=True, doc="The ID of the expense to classify again.")
+    uid = Column(Integer, ForeignKey('users.uid'), doc="The user who added the expense.")
+    chat_id = Column(Integer, doc="The chat the user is notified in once the expense is moved.")
+    message_id = Column(Integer, doc="The /add message the notification replies to.")
+    attempts = Column(Integer, nullable=False, default=0, doc="The number of failed classification attempts.")
+    next_attempt = Column(DateTime, nullable=False, doc="The date and time before which the entry is not processed.")
+
+    __table_args__ = (
+        Index('ix_reclassification_queue_next_attempt', 'next_attempt'),
+    )
+
+
+def upgrade_schema(bind):
+    """
+    Brings an existing database up to date with the model definitions.
+
+    ``create_all`` only creates missing tables, so indexes added to existing tables are created
+    here. Duplicate budgets, which the unique index on ``(uid, category)`` forbids, are merged by
+    keeping the most recently created one. The category totals table of older versions, keyed by a
+    period that was always the whole history, is recreated without it. Category totals and rollups
+    are computed for databases that have expenses but none of them yet. Running the upgrade again
+    has no effect.
+
+    Args:
+        bind (sqlalchemy.engine.Engine): The engine of the database to upgrade.
+    """
+    with bind.begin() as connection:
+        connection.execute(text(
+            'DELETE FROM budgets WHERE bid NOT IN (SELECT MAX(bid) FROM budgets GROUP BY uid, category)'
+        ))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        if 'period' in {column['name'] for column in inspect(connection).get_columns('category_totals')}:
+            CategoryTotal.__table__.drop(connection)
+            CategoryTotal.__table__.create(connection)
+
+        has_totals = connection.execute(text('SELECT 1 FROM category_totals LIMIT 1')).first()
+        has_rollups = connection.execute(text('SELECT 1 FROM expense_rollups LIMIT 1')).first()
+        has_expenses = connection.execute(text('SELECT 1 FROM expenses LIMIT 1')).first()
+        if has_expenses and not has_totals:
+            from financetracker_bot.models.category_totals import rebuild  # pylint: disable=import-outside-toplevel,cyclic-import
+            rebuild(connection)
+        if has_expenses and not has_rollups:
+            rollups.rebuild(connection)
+
+
+# The engines whose schema is up to date.
+_upgraded = set()
+
+
+def create_schema(bind=None):
+    """
+    Creates the missing tables and indexes and upgrades the schema of a database once per process.
+
+    Args:
+        bind (sqlalchemy.engine.Engine, optional): The engine of the database; defaults to the
+                                                   synchronous engine of the bot.
+
+    Returns:
+        sqlalchemy.engine.Engine: The engine.
+    """
+    bind = bind if bind is not None else get_engine()
+    if bind not in _upgraded:
+        Base.metadata.create_all(bind)
+        upgrade_schema(bind)
+        _upgraded.add(bind)
+    return bind
+
+
+# The rollups listen to the changes of expenses made through any session.
+from financetracker_bot.models import rollups  # pylint: disable=wrong-import-position,cyclic-import
+
 
-Session = sessionmaker(bind=engine)
-session = Session()
+def __getattr__(name):
+    # The engine and the session of scripts and tests are created, and the schema brought up to
+    # date, when they are first used instead of on import.
+    if name == 'engine':
+        value = create_schema()
+    elif name == 'Session':
+        value = sessionmaker(bind=create_schema())
+    elif name == 'session':
+        value = __getattr__('Session')()
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value
+    return value
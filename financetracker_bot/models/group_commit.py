@@ -0,0 +1,123 @@
+"""
+This module provides group commit of the writes of concurrent updates.
+
+On SQLite every commit syncs the database file under the single write lock, so the number of
+commits per second, not the work of each /add, caps the throughput of concurrent writers. The
+:class:`GroupCommitWriter` collects the writes submitted within a short window (or until a batch is
+full) and runs them in one transaction with one commit. Each caller's awaitable is resolved only
+after the commit of its batch returned, so a confirmed write is as durable as with its own commit.
+
+A write is a coroutine function taking the session of the batch. If a batch fails, its writes are
+retried one transaction each, so only the write that caused the failure reports it.
+"""
+import asyncio
+
+from financetracker_bot.models.database import get_session_factory
+
+
+class GroupCommitWriter:
+    """
+    Runs concurrent writes in shared transactions.
+    """
+
+    def __init__(self, window=0.005, max_batch=64, session_factory=None):
+        """
+        Initialize the writer.
+
+        Args:
+            window (float): The number of seconds to wait for more writes after the first one of a
+                            batch arrives.
+            max_batch (int): The number of writes that triggers a commit immediately.
+            session_factory (Callable, optional): Creates the session of a batch; defaults to the
+                                                  session factory of the bot.
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self.batches = 0
+        self.writes = 0
+        self.retried = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, write):
+        """
+        Run a write as part of the next batch and wait until the batch is committed.
+
+        Args:
+            write (Callable): A coroutine function taking the session of the batch. It must only
+                              stage changes, as it runs again if its batch is retried; the writer
+                              commits.
+
+        Returns:
+            The result of ``write``.
+
+        Raises:
+            Exception: The exception raised by ``write`` or by the commit of its transaction.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((write, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._commit_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        factory = self.session_factory or get_session_factory()
+        async with factory() as db:
+            results = [await write(db) for write, _ in batch]
+            await db.commit()
+        return results
+
+    async def _commit_batch(self, batch):
+        try:
+            results = await self._run(batch)
+        except Exception as e:  # pylint: disable=broad-except,invalid-name
+            if len(batch) > 1:
+                self.retried += len(batch)
+                for item in batch:
+                    await self._commit_batch([item])
+            elif not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self):
+        """
+        Commit the pending writes now and wait for the batches in progress.
+        """
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        """
+        Report how well writes were grouped.
+
+        Returns:
+            dict: The number of commits, committed writes, writes retried on their own after their
+                  batch failed and the mean batch size.
+        """
+        return {
+            'batches': self.batches,
+            'writes': self.writes,
+            'retried': self.retried,
+            'mean_batch_size': self.writes / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,337 @@
+"""
+This module maintains the daily and monthly expense rollups stored in the ``expense_rollups`` table.
+
+For every user, category and day (and calendar month) a rollup holds the total, count, minimum
+and maximum of the expenses; expenses without a date or an amount are left out. The rollups are kept current by ORM events: an inserted expense is
+merged into its day and month, and deleting or changing an expense recomputes the two rollups it
+left from the expenses of that day and month. Bulk DELETE and UPDATE statements on expenses
+rebuild the rollups of the users whose expenses they match; bulk INSERTs, such as /import, must
+call :func:`rebuild` for the user.
+
+:func:`plan` splits a period into the whole months, whole days and partial edge days it covers,
+so the analysis reads a handful of rollups and scans raw expenses only at the edges. The rebuild
+and verify commands recompute the rollups from the ``expenses`` table::
+
+    python -m financetracker_bot.models.rollups verify
+    python -m financetracker_bot.models.rollups rebuild
+
+Functions:
+    plan: Splits a period into raw-row, daily and monthly segments.
+    rebuild: Recomputes the rollups from the expenses.
+    verify: Reports rollups that drifted from the expenses.
+"""
+import argparse
+import datetime
+from collections import namedtuple
+
+from sqlalchemy import DateTime, delete, event, func, insert, inspect, literal, select, type_coerce
+from sqlalchemy.orm import Session
+
+from financetracker_bot.models.database import CONFLICT_INSERTS
+from financetracker_bot.models.finance_model import Expense, ExpenseRollup
+
+RAW = 'raw'
+DAY = 'day'
+MONTH = 'month'
+GRAINS = (DAY, MONTH)
+
+# A part of an analysed period: expenses from ``start`` up to ``end``, which is included only if
+# ``include_end`` is set, read from the raw expenses or from the daily or monthly rollups.
+Segment = namedtuple('Segment', ['source', 'start', 'end', 'include_end'])
+
+
+def period_start(date, grain):
+    """
+    Returns the midnight a day or a calendar month begins at.
+
+    Args:
+        date (datetime.datetime): A moment of the day or month.
+        grain (str): ``day`` or ``month``.
+
+    Returns:
+        datetime.datetime: The beginning of the day or month.
+    """
+    start = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.replace(day=1) if grain == MONTH else start
+
+
+def _next_period(start, grain):
+    if grain == DAY:
+        return start + datetime.timedelta(days=1)
+    return (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _ceil(date, grain):
+    start = period_start(date, grain)
+    return start if start == date else _next_period(start, grain)
+
+
+def plan(start, end):
+    """
+    Splits a period into the raw-row, daily and monthly segments that cover it exactly.
+
+    Partial days at the edges are read from the raw expenses, whole days from the daily rollups
+    and whole calendar months from the monthly rollups.
+
+    Args:
+        start (datetime.datetime): The beginning of the period, inclusive.
+        end (datetime.datetime): The end of the period, inclusive.
+
+    Returns:
+        list: The :class:`Segment` objects, in chronological order.
+    """
+    first_day, last_day = _ceil(start, DAY), period_start(end, DAY)
+    if first_day >= last_day:
+        return [Segment(RAW, start, end, True)]
+
+    segments = []
+    if start < first_day:
+        segments.append(Segment(RAW, start, first_day, False))
+    first_month, last_month = _ceil(first_day, MONTH), period_start(last_day, MONTH)
+    if first_month < last_month:
+        if first_day < first_month:
+            segments.append(Segment(DAY, first_day, first_month, False))
+        segments.append(Segment(MONTH, first_month, last_month, False))
+        if last_month < last_day:
+            segments.append(Segment(DAY, last_month, last_day, False))
+    else:
+        segments.append(Segment(DAY, first_day, last_day, False))
+    segments.append(Segment(RAW, last_day, end, True))
+    return segments
+
+
+def segment_query(uid, segment):
+    """
+    Builds the per-category total, count, minimum and maximum of a user's expenses in a segment.
+
+    Args:
+        uid (int): The ID of the user.
+        segment (Segment): The segment.
+
+    Returns:
+        sqlalchemy.sql.Select: The query selecting ``category, total, count, minimum, maximum``.
+    """
+    if segment.source == RAW:
+        until = Expense.date <= segment.end if segment.include_end else Expense.date < segment.end
+        return (select(Expense.category, func.sum(Expense.amount).label('total'), func.count().label('count'),
+                       func.min(Expense.amount).label('minimum'), func.max(Expense.amount).label('maximum'))
+                .where(Expense.uid == uid, Expense.date >= segment.start, until, Expense.amount.is_not(None))
+                .group_by(Expense.category))
+    return (select(ExpenseRollup.category, func.sum(ExpenseRollup.total).label('total'),
+                   func.sum(ExpenseRollup.count).label('count'), func.min(ExpenseRollup.minimum).label('minimum'),
+                   func.max(ExpenseRollup.maximum).label('maximum'))
+            .where(ExpenseRollup.uid == uid, ExpenseRollup.grain == segment.source,
+                   ExpenseRollup.period_start >= segment.start, ExpenseRollup.period_start < segment.end)
+            .group_by(ExpenseRollup.category))
+
+
+def _bucket(connection, grain):
+    if connection.dialect.name == 'sqlite':
+        pattern = '%Y-%m-%d 00:00:00.000000' if grain == DAY else '%Y-%m-01 00:00:00.000000'
+        bucket = func.strftime(pattern, Expense.date)
+    else:
+        bucket = func.date_trunc(grain, Expense.date)
+    return type_coerce(bucket, DateTime)
+
+
+def _expense_rollups(connection, grain, uid=None, category=None, start=None):
+    bucket = _bucket(connection, grain)
+    stmt = (select(Expense.uid, literal(grain), bucket, Expense.category, func.sum(Expense.amount), func.count(),
+                   func.min(Expense.amount), func.max(Expense.amount))
+            .where(Expense.uid.is_not(None), Expense.date.is_not(None), Expense.amount.is_not(None))
+            .group_by(Expense.uid, bucket, Expense.category))
+    if uid is not None:
+        stmt = stmt.where(Expense.uid == uid)
+    if category is not None:
+        stmt = stmt.where(Expense.category == category)
+    if start is not None:
+        stmt = stmt.where(Expense.date >= start, Expense.date < _next_period(start, grain))
+    return stmt
+
+
+COLUMNS = ['uid', 'grain', 'period_start', 'category', 'total', 'count', 'minimum', 'maximum']
+
+
+def rebuild(connection, uid=None):
+    """
+    Recomputes the rollups from the expenses.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to run the statements on; the
+                                                   caller controls the transaction.
+        uid (int, optional): Only rebuild the rollups of this user.
+    """
+    stmt = delete(ExpenseRollup)
+    if uid is not None:
+        stmt = stmt.where(ExpenseRollup.uid == uid)
+    connection.execute(stmt)
+    for grain in GRAINS:
+        connection.execute(insert(ExpenseRollup).from_select(COLUMNS, _expense_rollups(connection, grain, uid)))
+
+
+def _refresh(connection, uid, category, date):
+    """
+    Recomputes the day and month rollups of an expense that was deleted or changed.
+    """
+    if uid is None or date is None:
+        return
+    for grain in GRAINS:
+        start = period_start(date, grain)
+        connection.execute(delete(ExpenseRollup).filter_by(uid=uid, grain=grain, period_start=start, category=category))
+        connection.execute(insert(ExpenseRollup).from_select(
+            COLUMNS, _expense_rollups(connection, grain, uid, category, start)))
+
+
+def _merge(connection, uid, category, date, amount):
+    """
+    Adds a new expense to its day and month rollups.
+    """
+    if uid is None or date is None or amount is None:
+        return
+    conflict_insert = CONFLICT_INSERTS.get(connection.dialect.name)
+    if conflict_insert is None:
+        _refresh(connection, uid, category, date)
+        return
+    lower, upper = (func.min, func.max) if connection.dialect.name == 'sqlite' else (func.least, func.greatest)
+    for grain in GRAINS:
+        stmt = conflict_insert(ExpenseRollup).values(uid=uid, grain=grain, period_start=period_start(date, grain),
+                                                     category=category, total=amount, count=1, minimum=amount,
+                                                     maximum=amount)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['uid', 'grain', 'period_start', 'category'],
+            set_={'total': ExpenseRollup.total + stmt.excluded.total,
+                  'count': ExpenseRollup.count + stmt.excluded.count,
+                  'minimum': lower(ExpenseRollup.minimum, stmt.excluded.minimum),
+                  'maximum': upper(ExpenseRollup.maximum, stmt.excluded.maximum)},
+        ))
+
+
+@event.listens_for(Expense, 'after_insert')
+def _expense_inserted(mapper, connection, target):  # pylint: disable=unused-argument
+    _merge(connection, target.uid, target.category, target.date, target.amount)
+
+
+@event.listens_for(Expense, 'after_delete')
+def _expense_deleted(mapper, connection, target):  # pylint: disable=unused-argument
+    _refresh(connection, target.uid, target.category, target.date)
+
+
+@event.listens_for(Expense, 'after_update')
+def _expense_updated(mapper, connection, target):  # pylint: disable=unused-argument
+    state = inspect(target)
+    old = {}
+    for key in ('uid', 'category', 'date', 'amount'):
+        history = state.attrs[key].history
+        old[key] = history.deleted[0] if history.deleted else getattr(target, key)
+    if all(old[key] == getattr(target, key) for key in old):
+        return
+    _refresh(connection, old['uid'], old['category'], old['date'])
+    if (old['uid'], old['category'], old['date']) != (target.uid, target.category, target.date):
+        _refresh(connection, target.uid, target.category, target.date)
+
+
+def _matched_rows(connection, orm_execute_state, query):
+    """
+    Selects the expenses a bulk DELETE or UPDATE is about to change.
+    """
+    query = query.where(Expense.uid.is_not(None))
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, (list, tuple)):
+        # A bulk UPDATE by primary key names its rows in the parameter sets.
+        return connection.execute(query.where(Expense.eid.in_([params['eid'] for params in parameters]))).all()
+    if orm_execute_state.statement.whereclause is not None:
+        query = query.where(orm_execute_state.statement.whereclause)
+    return connection.execute(query, parameters or {}).all()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _expenses_changed_in_bulk(orm_execute_state):
+    # The rows a bulk DELETE or UPDATE matches are selected before it runs, and the rollups of
+    # their users are rebuilt after it.
+    if (orm_execute_state.is_delete or orm_execute_state.is_update) and orm_execute_state.bind_mapper is not None \
+            and orm_execute_state.bind_mapper.class_ is Expense:
+        connection = orm_execute_state.session.connection()
+        if orm_execute_state.is_delete:
+            uids = {uid for uid, in _matched_rows(connection, orm_execute_state, select(Expense.uid).distinct())}
+            result = orm_execute_state.invoke_statement()
+        else:
+            rows = _matched_rows(connection, orm_execute_state, select(Expense.eid, Expense.uid))
+            result = orm_execute_state.invoke_statement()
+            uids = {uid for _, uid in rows}
+            if rows:
+                # The UPDATE may have moved expenses to other users.
+                uids.update(connection.execute(select(Expense.uid).distinct().where(
+                    Expense.eid.in_([eid for eid, _ in rows]), Expense.uid.is_not(None))).scalars())
+        for uid in sorted(uids):
+            rebuild(connection, uid)
+        return result
+    return None
+
+
+def _differs(stored, actual, tolerance):
+    if stored is None or actual is None:
+        return stored is not actual
+    return abs(stored - actual) > tolerance
+
+
+def verify(connection, uid=None, tolerance=1e-6):
+    """
+    Reports rollups that differ from the aggregates of the expenses.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): The connection to read from.
+        uid (int, optional): Only verify the rollups of this user.
+        tolerance (float, optional): The largest rounding difference that is not drift.
+
+    Returns:
+        list: A dict with ``uid``, ``grain``, ``period_start``, ``category`` and the ``stored`` and
+              ``actual`` total, count, minimum and maximum for every drifted rollup.
+    """
+    actual = {}
+    for grain in GRAINS:
+        for row in connection.execute(_expense_rollups(connection, grain, uid)):
+            actual[tuple(row[:4])] = tuple(row[4:])
+    stmt = select(*(getattr(ExpenseRollup, column) for column in COLUMNS))
+    if uid is not None:
+        stmt = stmt.where(ExpenseRollup.uid == uid)
+    stored = {tuple(row[:4]): tuple(row[4:]) for row in connection.execute(stmt)}
+
+    drift = []
+    empty = (0.0, 0, None, None)
+    for key in sorted(actual.keys() | stored.keys(), key=str):
+        stored_values, actual_values = stored.get(key, empty), actual.get(key, empty)
+        if stored_values[1] != actual_values[1] or any(_differs(stored_values[i], actual_values[i], tolerance)
+                                                       for i in (0, 2, 3)):
+            drift.append({'uid': key[0], 'grain': key[1], 'period_start': key[2], 'category': key[3],
+                          'stored': stored_values, 'actual': actual_values})
+    return drift
+
+
+def main(argv=None):
+    """
+    Verifies or rebuilds the expense rollups of the configured database.
+
+    Args:
+        argv (list, optional): Command line arguments.
+    """
+    from financetracker_bot.models.finance_model import engine  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description='Verify or rebuild the daily and monthly expense rollups.')
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('--uid', type=int, help='Only process this user.')
+    args = parser.parse_args(argv)
+
+    with engine.begin() as connection:
+        drift = verify(connection, args.uid)
+        for row in drift:
+            print(f"uid {row['uid']}, {row['grain']} {row['period_start']:%Y-%m-%d}, category {row['category']}: "
+                  f"stored {row['stored']}, actual {row['actual']}")
+        print(f"{len(drift)} drifted rollups")
+        if args.command == 'rebuild':
+            rebuild(connection, args.uid)
+            print("Rollups rebuilt")
+    return 1 if drift and args.command == 'verify' else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
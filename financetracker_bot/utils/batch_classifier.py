@@ -0,0 +1,90 @@
+"""
+This module provides micro-batching of concurrent expense classifications.
+
+When many users send /add at once, every description would cost its own OpenAI request. The
+:class:`BatchClassifier` instead collects the descriptions arriving within a short window (or until
+a batch is full) and classifies them with a single request, resolving each caller's awaitable with
+its own category. The extra latency of a classification is bounded by the window.
+"""
+import asyncio
+
+
+class BatchClassifier:
+    """
+    Collects concurrent classification requests into batched OpenAI calls.
+    """
+
+    def __init__(self, openai_client, window=0.02, max_batch=16):
+        """
+        Initialize the batcher.
+
+        Args:
+            openai_client (OpenAI): The client whose ``aclassify_expenses`` classifies a batch.
+            window (float): The number of seconds to wait for more descriptions after the first
+                            one of a batch arrives.
+            max_batch (int): The number of descriptions that triggers a request immediately.
+        """
+        self.openai_client = openai_client
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def classify(self, description):
+        """
+        Classify an expense description as part of the next batch.
+
+        Args:
+            description (str): The description of the expense to classify.
+
+        Returns:
+            str: The category of the expense, 'Other' if the model's answer for it was unusable.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((description, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._classify_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _classify_batch(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            categories = await self.openai_client.aclassify_expenses([description for description, _ in batch])
+        except Exception as e:  # pylint: disable=broad-except,invalid-name
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), category in zip(batch, categories):
+            if not future.done():
+                future.set_result(category)
+
+    def stats(self):
+        """
+        Report how well descriptions were batched.
+
+        Returns:
+            dict: The number of requests sent, descriptions classified and the mean batch size.
+        """
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+        }
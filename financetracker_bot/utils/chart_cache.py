@@ -0,0 +1,149 @@
+"""
+This module caches the rendered charts of the financial analysis.
+
+Users repeat the same analysis period many times a day. A chart is keyed by the user, the period
+and the user's data version, which is bumped whenever the user's expenses change, so a cached
+chart is never stale. Besides the PNG bytes the cache keeps the ``file_id`` Telegram returned for
+the uploaded photo, so repeated requests resend it without rendering or uploading it again.
+
+Expenses may change while a chart is rendered, e.g. by a background reclassification. Callers
+therefore read :meth:`ChartCache.version` before reading the data of the chart and pass it to
+:meth:`ChartCache.put`, which does not cache a chart whose data was outdated by then.
+"""
+from collections import OrderedDict
+
+from financetracker_bot.config.config import CHART_CACHE_ENTRIES, CHART_CACHE_BYTES
+
+
+class CachedChart:
+    """
+    A rendered chart and, once it was sent, its Telegram file ID.
+    """
+
+    def __init__(self, png, file_id=None):
+        self.png = png
+        self.file_id = file_id
+
+
+class ChartCache:
+    """
+    An LRU cache of rendered charts bounded by the number of entries and their total size.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, max_versions=None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): The maximum number of charts.
+            max_bytes (int): The maximum total size of the PNG images.
+            max_versions (int, optional): The number of users whose data version is remembered;
+                                          defaults to four times ``max_entries``.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_versions = max_versions or 4 * max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Versions are taken from one counter. Users whose version was forgotten share the floor,
+        # the highest forgotten version, so a version read earlier never comes back.
+        self._counter = 0
+        self._floor = 0
+        self._versions = OrderedDict()
+        self._entries = OrderedDict()
+
+    def version(self, uid):
+        """
+        Return the current data version of a user.
+
+        Args:
+            uid (int): The ID of the user.
+
+        Returns:
+            int: The version, which changes whenever the user's expenses change.
+        """
+        return self._versions.get(uid, self._floor)
+
+    def _drop_user(self, uid):
+        for key in [key for key in self._entries if key[0] == uid]:
+            self.size -= len(self._entries.pop(key).png)
+
+    def bump_version(self, uid):
+        """
+        Invalidate the charts of a user after their expenses changed.
+
+        Args:
+            uid (int): The ID of the user.
+        """
+        self._counter += 1
+        self._versions[uid] = self._counter
+        self._versions.move_to_end(uid)
+        self._drop_user(uid)
+        while len(self._versions) > self.max_versions:
+            forgotten, version = self._versions.popitem(last=False)
+            self._floor = max(self._floor, version)
+            self._drop_user(forgotten)
+
+    def get(self, uid, start, end, version=None):
+        """
+        Look up the chart of an analysis period.
+
+        Args:
+            uid (int): The ID of the user.
+            start (datetime.datetime): The beginning of the period.
+            end (datetime.datetime): The end of the period.
+            version (int, optional): The data version the chart must have; defaults to the current one.
+
+        Returns:
+            CachedChart: The chart, or None if it has to be rendered.
+        """
+        key = (uid, start, end, self.version(uid) if version is None else version)
+        chart = self._entries.get(key)
+        if chart is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return chart
+
+    def put(self, uid, start, end, png, version=None):
+        """
+        Store the rendered chart of an analysis period.
+
+        Args:
+            uid (int): The ID of the user.
+            start (datetime.datetime): The beginning of the period.
+            end (datetime.datetime): The end of the period.
+            png (bytes): The PNG image.
+            version (int, optional): The data version read before the data of the chart; defaults
+                                     to the current one. If the version changed since, the chart
+                                     is not stored.
+
+        Returns:
+            CachedChart: The chart, stored unless it was outdated.
+        """
+        current = self.version(uid)
+        if version is not None and version != current:
+            return CachedChart(png)
+        key = (uid, start, end, current)
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key).png)
+        chart = CachedChart(png)
+        self._entries[key] = chart
+        self.size += len(png)
+        while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+            self.size -= len(self._entries.popitem(last=False)[1].png)
+        return chart
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+            dict: The number of hits, misses, cached charts and their total size in bytes.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self.size}
+
+
+chart_cache = ChartCache(max_entries=CHART_CACHE_ENTRIES, max_bytes=CHART_CACHE_BYTES)
@@ -0,0 +1,148 @@
+"""
+This module renders the charts of the financial analysis off the event loop.
+
+Rasterizing a plotly figure with kaleido takes hundreds of milliseconds, so the charts are
+rendered in a bounded pool of worker processes. Every worker starts its kaleido server once and
+reuses it for all charts. The PNG image is returned as bytes; nothing is written to shared files.
+When more charts are requested than the pool and its queue can hold, :class:`ChartQueueFull` is
+raised so that the caller can answer without a chart.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from financetracker_bot.utils.metrics import observe_chart_render
+
+
+class ChartQueueFull(Exception):
+    """
+    Raised when the renderer already has as many charts pending as its queue allows.
+    """
+
+
+def warm_up():
+    """
+    Import plotly in a worker process and start its kaleido server, so that the charts rendered by
+    the worker reuse one browser instead of starting it for every chart.
+
+    The server is only started after a test render succeeded: a server without a usable browser
+    would make every later render hang instead of failing.
+    """
+    # pylint: disable=import-outside-toplevel
+    import kaleido
+    import plotly.graph_objects as go
+
+    try:
+        go.Figure(data=[go.Pie(labels=['warm-up'], values=[1])]).to_image(format='png', width=10, height=10)
+    except Exception:  # pylint: disable=broad-except
+        return
+    if hasattr(kaleido, 'start_sync_server'):
+        kaleido.start_sync_server(silence_warnings=True)
+
+
+def render_pie_chart(labels, values, title, scale=1.5):
+    """
+    Render a pie chart to PNG.
+
+    Args:
+        labels (list): The labels of the sectors.
+        values (list): The values of the sectors.
+        title (str): The title of the chart.
+        scale (float, optional): The scale factor of the image.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    import plotly.graph_objects as go  # pylint: disable=import-outside-toplevel
+
+    fig = go.Figure(data=[go.Pie(labels=labels, values=values, textinfo='label+percent',
+                                 texttemplate='%{label} (%{percent:.2%})', insidetextorientation='radial', hole=.3)])
+    fig.update_layout(title_text=title)
+    return fig.to_image(format='png', scale=scale)
+
+
+class ChartRenderer:
+    """
+    Renders charts in a bounded pool of warm worker processes.
+    """
+
+    def __init__(self, workers=2, max_queue=8, executor=None):
+        """
+        Initialize the renderer. The worker processes are started on the first render.
+
+        Args:
+            workers (int): The number of worker processes.
+            max_queue (int): The number of charts that may wait for a free worker.
+            executor (concurrent.futures.Executor, optional): The executor to render in instead of
+                                                              a process pool.
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.renders = 0
+        self.rejected = 0
+        self.render_seconds_total = 0.0
+        self.last_render_seconds = 0.0
+        self._executor = executor
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def render_pie(self, labels, values, title):
+        """
+        Render a pie chart to PNG without blocking the event loop.
+
+        Args:
+            labels (list): The labels of the sectors.
+            values (list): The values of the sectors.
+            title (str): The title of the chart.
+
+        Returns:
+            bytes: The PNG image.
+
+        Raises:
+            ChartQueueFull: If all workers are busy and the queue is full.
+        """
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise ChartQueueFull()
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), render_pie_chart, labels, values, title)
+        finally:
+            self.in_flight -= 1
+            self.last_render_seconds = time.perf_counter() - started
+            self.render_seconds_total += self.last_render_seconds
+            self.renders += 1
+            observe_chart_render(self.last_render_seconds)
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        """
+        Report the renderer gauges and counters.
+
+        Returns:
+            dict: The number of charts in flight, rendered and rejected, and the render times in
+                  seconds (including the time spent waiting for a worker).
+        """
+        return {
+            'in_flight': self.in_flight,
+            'renders': self.renders,
+            'rejected': self.rejected,
+            'render_seconds_total': self.render_seconds_total,
+            'last_render_seconds': self.last_render_seconds,
+        }
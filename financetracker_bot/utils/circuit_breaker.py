@@ -0,0 +1,116 @@
+"""
+This module provides a circuit breaker for calls to an unreliable upstream service.
+
+While the service works, the breaker is closed and remembers the outcome of the recent calls. Once
+the share of failures among them reaches the threshold, the breaker opens: callers are refused at
+once instead of waiting for requests that are likely to fail. Every ``reset_timeout`` seconds one
+trial call is let through (the breaker is half-open); its success closes the breaker again, its
+failure keeps it open for another ``reset_timeout``.
+"""
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while the error rate of an upstream service is too high.
+    """
+
+    def __init__(self, failure_rate=0.5, window=20, min_calls=5, reset_timeout=30.0, clock=time.monotonic):  # pylint: disable=too-many-arguments
+        """
+        Initialize the breaker, closed.
+
+        Args:
+            failure_rate (float): The share of failed calls among the recent ones that opens the breaker.
+            window (int): The number of recent calls the failure rate is computed over.
+            min_calls (int): The number of recent calls needed before the breaker may open.
+            reset_timeout (float): The number of seconds between trial calls while the breaker is open.
+            clock (Callable, optional): Returns the current time in seconds.
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.opened = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+
+    @property
+    def state(self):
+        """
+        str: ``closed``, ``open``, or ``half_open`` when the next call is let through as a trial.
+        """
+        if self._opened_at is None:
+            return CLOSED
+        return HALF_OPEN if self.retry_after() == 0 else OPEN
+
+    @property
+    def is_open(self):
+        """
+        bool: Whether calls are refused right now.
+        """
+        return self.state == OPEN
+
+    def retry_after(self):
+        """
+        Return the number of seconds until the next call is let through.
+
+        Returns:
+            float: 0 if calls are let through now.
+        """
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def allow(self):
+        """
+        Decide whether a call may be made now. A call allowed while half-open is the trial call,
+        and the next one is allowed ``reset_timeout`` seconds later at the earliest.
+
+        Returns:
+            bool: Whether to make the call.
+        """
+        state = self.state
+        if state == HALF_OPEN:
+            self._opened_at = self.clock()
+        elif state == OPEN:
+            self.rejected += 1
+            return False
+        return True
+
+    def record_success(self):
+        """
+        Record a successful call, which closes an open breaker.
+        """
+        if self._opened_at is not None:
+            self._opened_at = None
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        """
+        Record a failed call, which opens the breaker if the failure rate reached the threshold.
+        """
+        if self._opened_at is not None:
+            self._opened_at = self.clock()
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+            self._opened_at = self.clock()
+            self.opened += 1
+
+    def stats(self):
+        """
+        Report the state of the breaker.
+
+        Returns:
+            dict: Whether the breaker is open (1) or not (0), how many times it opened and how many
+                  calls it refused.
+        """
+        return {'open': int(self.is_open), 'opened': self.opened, 'rejected': self.rejected}
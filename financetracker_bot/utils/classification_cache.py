@@ -0,0 +1,201 @@
+"""
+This module provides a two-tier cache of expense categories keyed by normalized description.
+
+Users repeat the same descriptions ("coffee", "taxi", "rent") over and over, so the category
+returned by the classification model is remembered. The first tier is an in-process LRU with size
+and TTL eviction; the second tier is the ``classification_cache`` table, which survives restarts.
+A user who re-categorizes an expense gets a personal override that takes precedence over the shared
+entry.
+"""
+import datetime
+import re
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from financetracker_bot.models.database import conflict_insert
+from financetracker_bot.models.finance_model import ClassificationCacheEntry
+
+SHARED_UID = 0
+
+
+def normalize_description(description):
+    """
+    Normalize an expense description so that trivially different spellings share a cache entry.
+
+    Args:
+        description (str): The description typed by the user.
+
+    Returns:
+        str: The lower-cased description without surrounding punctuation and repeated whitespace.
+    """
+    words = re.sub(r'\s+', ' ', description.lower()).strip()
+    return words.strip('.,;:!?"\'()[]{}')
+
+
+class ClassificationCache:
+    """
+    A cache of expense categories with an in-process LRU in front of a database table.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0, clock=time.monotonic):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size (int): The maximum number of entries kept in memory.
+            ttl (float): The number of seconds an entry stays in memory.
+            clock (Callable, optional): The monotonic clock used for expiration.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        category, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return category
+
+    def _put_memory(self, key, category):
+        self._entries[key] = (category, self.clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, db, uid, description):
+        """
+        Look up the category of a description for a user.
+
+        A personal override of the user takes precedence over the shared entry.
+
+        Args:
+            db (AsyncSession): The database session of the current update.
+            uid (int): The ID of the user.
+            description (str): The description of the expense.
+
+        Returns:
+            str: The cached category, or None if the description is unknown.
+        """
+        key = (uid, normalize_description(description))
+        category = self._get_memory(key)
+        if category is None:
+            rows = (await db.execute(
+                select(ClassificationCacheEntry.uid, ClassificationCacheEntry.category).where(
+                    ClassificationCacheEntry.description == key[1],
+                    ClassificationCacheEntry.uid.in_((uid, SHARED_UID)),
+                )
+            )).all()
+            if rows:
+                category = max(rows, key=lambda row: row.uid != SHARED_UID).category
+                self._put_memory(key, category)
+
+        if category is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return category
+
+    async def get_many(self, db, uid, descriptions):
+        """
+        Look up the categories of many descriptions for a user with at most one query.
+
+        Args:
+            db (AsyncSession): The database session of the current update.
+            uid (int): The ID of the user.
+            descriptions (list): The descriptions of the expenses.
+
+        Returns:
+            dict: The cached category of every known description, keyed by the description as
+                  given.
+        """
+        categories = {}
+        missing = {}
+        for description in descriptions:
+            key = normalize_description(description)
+            category = self._get_memory((uid, key))
+            if category is None:
+                missing.setdefault(key, []).append(description)
+            else:
+                categories[description] = category
+
+        if missing:
+            rows = (await db.execute(
+                select(ClassificationCacheEntry.description, ClassificationCacheEntry.uid,
+                       ClassificationCacheEntry.category).where(
+                    ClassificationCacheEntry.description.in_(missing),
+                    ClassificationCacheEntry.uid.in_((uid, SHARED_UID)),
+                ).order_by(ClassificationCacheEntry.uid != SHARED_UID)
+            )).all()
+            # Personal overrides are ordered last, so they replace the shared entries.
+            for key, _, category in rows:
+                self._put_memory((uid, key), category)
+                for description in missing[key]:
+                    categories[description] = category
+
+        self.hits += len(categories)
+        self.misses += len(descriptions) - len(categories)
+        return categories
+
+    async def put(self, db, description, category, uid=SHARED_UID):
+        """
+        Remember the category of a description.
+
+        The row is written in the session's transaction; it becomes persistent when the caller
+        commits. Concurrent writers of the same description do not conflict: the last one wins.
+
+        Args:
+            db (AsyncSession): The database session of the current update.
+            description (str): The description of the expense.
+            category (str): The category of the expense.
+            uid (int, optional): The user overriding the category. By default the entry is shared
+                                 by all users.
+        """
+        key = normalize_description(description)
+        values = {'description': key, 'uid': uid, 'category': category,
+                  'updated_at': datetime.datetime.now()}
+
+        stmt = conflict_insert(db, ClassificationCacheEntry)
+        if stmt is not None:
+            stmt = stmt.values(**values)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=['description', 'uid'],
+                set_={'category': stmt.excluded.category, 'updated_at': stmt.excluded.updated_at},
+            ))
+        else:
+            await db.merge(ClassificationCacheEntry(**values))
+
+        # Shared entries are only written after a miss, so no user has the description in memory
+        # yet; overrides replace what the user resolved before.
+        if uid != SHARED_UID:
+            self._put_memory((uid, key), category)
+
+    def clear(self):
+        """
+        Drop all entries kept in memory. The database table is left untouched.
+        """
+        self._entries.clear()
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+            dict: The number of hits and misses, the hit rate and the number of entries in memory.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+        }
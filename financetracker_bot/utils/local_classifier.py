@@ -0,0 +1,429 @@
+"""
+This module provides a local expense classifier that answers common descriptions without a
+network round-trip to OpenAI.
+
+The classifier combines a keyword trie over the predefined categories with a naive Bayes model
+trained on every user's own categorized history from the ``expenses`` table. Expenses filed as
+'Other' are left out of the history: they are mostly expenses the OpenAI model could not classify
+in time. Callers fall back to the OpenAI model when the confidence of the local answer is below a
+threshold.
+
+The model is trained offline and stored as JSON::
+
+    python -m financetracker_bot.utils.local_classifier train [--output local_classifier.json]
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter, OrderedDict, defaultdict
+
+from financetracker_bot.utils.classification_cache import normalize_description
+from financetracker_bot.utils.translation import _
+
+KEYWORDS = {
+    "Groceries": ["grocer", "supermarket", "market", "milk", "bread", "eggs", "vegetable", "fruit",
+                  "продукт", "супермаркет", "молоко", "хлеб", "овощ", "фрукт", "пятерочк",
+                  "перекрест", "ашан", "магнит"],
+    "Rent": ["rent", "landlord", "lease", "mortgage", "аренд", "квартплат", "ипотек"],
+    "Utilities": ["utilit", "electric", "internet", "phone", "mobile", "коммунал", "электричеств",
+                  "интернет", "связь", "телефон"],
+    "Transportation": ["taxi", "uber", "bus", "metro", "subway", "train", "fuel", "petrol",
+                       "gasoline", "parking", "такси", "метро", "автобус", "бензин", "парковк",
+                       "поезд", "электричк", "проезд"],
+    "Dining": ["lunch", "dinner", "breakfast", "restaurant", "cafe", "coffee", "pizza", "sushi",
+               "burger", "обед", "ужин", "завтрак", "ресторан", "кафе", "кофе", "пицц", "суши",
+               "бургер"],
+    "Entertainment": ["cinema", "movie", "concert", "theater", "theatre", "netflix", "spotify",
+                      "кино", "концерт", "театр", "подписк"],
+    "Health": ["pharmacy", "doctor", "dentist", "medicine", "hospital", "clinic", "vitamin",
+               "аптек", "врач", "стоматолог", "лекарств", "больниц", "клиник"],
+    "Education": ["course", "book", "school", "tuition", "university", "lesson", "tutor", "курс",
+                  "книг", "школ", "университет", "урок", "репетитор", "учеб"],
+    "Clothing": ["clothes", "shirt", "shoes", "jeans", "dress", "jacket", "одежд", "обув",
+                 "футболк", "джинс", "плать", "куртк"],
+}
+
+# Keywords shorter than this only match whole words, so that "bus" does not match "business".
+MIN_PREFIX_LENGTH = 4
+
+# A keyword covering at least this share of a word is an inflection of it ("taxis", "аптека") and
+# votes fully; shorter prefixes ("rent" in "rental", "book" in "booking") only get a vote of this
+# weight, so that a single one of them stays below the classification threshold.
+INFLECTION_COVERAGE = 0.75
+PREFIX_VOTE_WEIGHT = 0.5
+
+# Users need this many categorized expenses in at least this many categories before their own
+# model is consulted.
+MIN_USER_SAMPLES = 5
+MIN_USER_CATEGORIES = 2
+
+
+def tokenize(description):
+    """
+    Split an expense description into normalized word tokens.
+
+    Args:
+        description (str): The description of the expense.
+
+    Returns:
+        list: The tokens of the description.
+    """
+    return re.findall(r'\w+', normalize_description(description))
+
+
+class KeywordTrie:
+    """
+    A character trie of category keywords that matches keywords against word prefixes.
+    """
+
+    def __init__(self, keywords=None):
+        """
+        Build the trie.
+
+        Args:
+            keywords (dict, optional): Keyword lists by category name. Defaults to ``KEYWORDS``.
+        """
+        self._root = {}
+        for category, words in (keywords or KEYWORDS).items():
+            for word in words:
+                node = self._root
+                for char in word:
+                    node = node.setdefault(char, {})
+                node[None] = category
+
+    def match(self, token):
+        """
+        Find the categories of all keywords matching a token.
+
+        Args:
+            token (str): A normalized word of a description.
+
+        Returns:
+            list: The categories of the matching keywords.
+        """
+        return [category for category, _weight in self._votes(token)]
+
+    def _votes(self, token):
+        votes = []
+        node = self._root
+        for depth, char in enumerate(token, start=1):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node and (depth == len(token) or depth >= MIN_PREFIX_LENGTH):
+                weight = 1.0 if depth >= INFLECTION_COVERAGE * len(token) else PREFIX_VOTE_WEIGHT
+                votes.append((node[None], weight))
+        return votes
+
+    def classify(self, tokens):
+        """
+        Classify a tokenized description by keyword votes.
+
+        Whole words and their inflections vote fully; keywords that are only a short prefix of a
+        word vote with ``PREFIX_VOTE_WEIGHT``.
+
+        Args:
+            tokens (list): The tokens of the description.
+
+        Returns:
+            tuple: The winning category and its weighted share of the votes, or (None, 0.0) if no
+                   keyword matched.
+        """
+        votes = [vote for token in tokens for vote in self._votes(token)]
+        if not votes:
+            return None, 0.0
+        weights = Counter()
+        for category, weight in votes:
+            weights[category] += weight
+        category, weight = weights.most_common(1)[0]
+        return category, weight / len(votes)
+
+
+class NaiveBayes:
+    """
+    A multinomial naive Bayes model of one user's categorized descriptions.
+    """
+
+    def __init__(self, docs=None, tokens=None):
+        """
+        Initialize the model from counts.
+
+        Args:
+            docs (dict, optional): The number of expenses by category.
+            tokens (dict, optional): Token counts by category.
+        """
+        self.docs = Counter(docs or {})
+        self.tokens = defaultdict(Counter, {category: Counter(counts) for category, counts in (tokens or {}).items()})
+        self.vocabulary = {token for counts in self.tokens.values() for token in counts}
+
+    def learn(self, tokens, category):
+        """
+        Add a categorized description to the model.
+
+        Args:
+            tokens (list): The tokens of the description.
+            category (str): The category of the expense.
+        """
+        self.docs[category] += 1
+        self.tokens[category].update(tokens)
+        self.vocabulary.update(tokens)
+
+    def classify(self, tokens):
+        """
+        Classify a tokenized description.
+
+        Args:
+            tokens (list): The tokens of the description.
+
+        Returns:
+            tuple: The most probable category and its posterior probability scaled by the share of
+                   known tokens, or (None, 0.0) if the user has too little history, fewer than
+                   ``MIN_USER_CATEGORIES`` categories or none of the tokens was seen before.
+        """
+        known = [token for token in tokens if token in self.vocabulary]
+        total_docs = sum(self.docs.values())
+        if total_docs < MIN_USER_SAMPLES or len(self.docs) < MIN_USER_CATEGORIES or not known:
+            return None, 0.0
+
+        scores = {}
+        for category, count in self.docs.items():
+            counts = self.tokens[category]
+            denominator = sum(counts.values()) + len(self.vocabulary)
+            scores[category] = math.log(count / total_docs) + sum(
+                math.log((counts[token] + 1) / denominator) for token in known)
+
+        best = max(scores, key=scores.get)
+        evidence = sum(math.exp(score - scores[best]) for score in scores.values())
+        # One known word of "uber airport lunch" must not decide the category on its own.
+        return best, len(known) / len(tokens) / evidence
+
+    def to_dict(self):
+        """
+        Serialize the model.
+
+        Returns:
+            dict: The counts of the model.
+        """
+        return {'docs': dict(self.docs), 'tokens': {category: dict(counts) for category, counts in self.tokens.items()}}
+
+
+class LocalClassifier:
+    """
+    Classifies expenses locally by keywords and by the user's own history.
+    """
+
+    def __init__(self, threshold=0.8, models=None, accuracy=None, max_users=10000):
+        """
+        Initialize the classifier.
+
+        Args:
+            threshold (float): The confidence a local answer needs to be used.
+            models (dict, optional): The naive Bayes models by user ID.
+            accuracy (float, optional): The accuracy measured when the model was trained.
+            max_users (int): The number of user models kept; the least recently used ones are
+                             dropped first.
+        """
+        self.threshold = threshold
+        self.trie = KeywordTrie()
+        self.max_users = max_users
+        self.models = OrderedDict()
+        for uid, model in (models or {}).items():
+            self._keep(uid, model)
+        self.accuracy = accuracy
+        self.predictions = 0
+        self.fallbacks = 0
+
+    def predict(self, uid, description):
+        """
+        Classify a description with the local models only.
+
+        Args:
+            uid (int): The ID of the user.
+            description (str): The description of the expense.
+
+        Returns:
+            tuple: The category and the confidence of the more confident of the keyword and
+                   history models, or (None, 0.0) if neither can tell.
+        """
+        tokens = tokenize(description)
+        keyword_answer = self.trie.classify(tokens)
+        if keyword_answer[0] is not None:
+            keyword_answer = (_(keyword_answer[0]), keyword_answer[1])
+        model = self.models.get(uid)
+        history_answer = (None, 0.0)
+        if model is not None:
+            self.models.move_to_end(uid)
+            history_answer = model.classify(tokens)
+        return max(keyword_answer, history_answer, key=lambda answer: answer[1])
+
+    def classify(self, uid, description):
+        """
+        Classify a description if the local models are confident enough.
+
+        Args:
+            uid (int): The ID of the user.
+            description (str): The description of the expense.
+
+        Returns:
+            str: The category, or None if the caller should fall back to the OpenAI model.
+        """
+        category, confidence = self.predict(uid, description)
+        if category is None or confidence < self.threshold:
+            self.fallbacks += 1
+            return None
+        self.predictions += 1
+        return category
+
+    def learn(self, uid, description, category):
+        """
+        Add a categorized expense to the user's model between offline trainings. Expenses filed
+        as 'Other' are ignored.
+
+        Args:
+            uid (int): The ID of the user.
+            description (str): The description of the expense.
+            category (str): The category of the expense.
+        """
+        if category == _("Other"):
+            return
+        model = self.models.get(uid)
+        self._keep(uid, model if model is not None else NaiveBayes())
+        self.models[uid].learn(tokenize(description), category)
+
+    def _keep(self, uid, model):
+        self.models[uid] = model
+        self.models.move_to_end(uid)
+        while len(self.models) > self.max_users:
+            self.models.popitem(last=False)
+
+    def stats(self):
+        """
+        Report how often the local models answered.
+
+        Returns:
+            dict: The number of local answers and fallbacks, the fallback rate and the accuracy
+                  measured on held-out history during training.
+        """
+        total = self.predictions + self.fallbacks
+        return {
+            'predictions': self.predictions,
+            'fallbacks': self.fallbacks,
+            'fallback_rate': self.fallbacks / total if total else 0.0,
+            'accuracy': self.accuracy,
+        }
+
+    def save(self, path):
+        """
+        Store the trained models as JSON.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'accuracy': self.accuracy,
+                'users': {str(uid): model.to_dict() for uid, model in self.models.items()},
+            }, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, threshold=0.8, max_users=10000):
+        """
+        Load trained models stored by :meth:`save`.
+
+        A missing file yields a classifier that only knows the keywords.
+
+        Args:
+            path (str): The file to read.
+            threshold (float): The confidence a local answer needs to be used.
+            max_users (int): The number of user models kept.
+
+        Returns:
+            LocalClassifier: The classifier.
+        """
+        if not os.path.exists(path):
+            return cls(threshold=threshold, max_users=max_users)
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        models = {int(uid): NaiveBayes(**counts) for uid, counts in data['users'].items()}
+        return cls(threshold=threshold, models=models, accuracy=data['accuracy'], max_users=max_users)
+
+
+def train(rows, threshold=0.8, holdout_every=5):
+    """
+    Train a classifier on categorized expenses and measure it on held-out rows.
+
+    Every ``holdout_every``-th expense of each user is held out to measure the accuracy and the
+    fallback rate; the returned classifier is then trained on all rows. Expenses filed as 'Other'
+    are skipped.
+
+    Args:
+        rows (Iterable): ``(uid, description, category)`` tuples.
+        threshold (float): The confidence a local answer needs to be used.
+        holdout_every (int): Hold out one of this many expenses of each user.
+
+    Returns:
+        tuple: The trained classifier and a dict with the held-out ``accuracy``,
+               ``fallback_rate`` and the number of ``samples``.
+    """
+    rows = [row for row in rows if row[2] != _("Other")]
+    seen = Counter()
+    training, holdout = [], []
+    for row in rows:
+        seen[row[0]] += 1
+        (holdout if seen[row[0]] % holdout_every == 0 else training).append(row)
+
+    evaluation = LocalClassifier(threshold=threshold)
+    for uid, description, category in training:
+        evaluation.learn(uid, description, category)
+    correct = sum(evaluation.classify(uid, description) == category for uid, description, category in holdout)
+    answered = evaluation.predictions
+    report = {
+        'accuracy': correct / answered if answered else None,
+        'fallback_rate': evaluation.stats()['fallback_rate'],
+        'samples': len(rows),
+    }
+
+    classifier = LocalClassifier(threshold=threshold, accuracy=report['accuracy'])
+    for uid, description, category in rows:
+        classifier.learn(uid, description, category)
+    return classifier, report
+
+
+def main(argv=None):
+    """
+    Train the local classifier on the expenses in the database and store it.
+
+    Args:
+        argv (list, optional): Command line arguments.
+    """
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import select
+
+    from financetracker_bot.config.config import LOCAL_CLASSIFIER_PATH, LOCAL_CLASSIFIER_THRESHOLD
+    from financetracker_bot.models.finance_model import Expense, engine
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['train'])
+    parser.add_argument('--output', default=LOCAL_CLASSIFIER_PATH, help='Where to store the model.')
+    parser.add_argument('--threshold', type=float, default=LOCAL_CLASSIFIER_THRESHOLD,
+                        help='Confidence needed to answer without OpenAI.')
+    args = parser.parse_args(argv)
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(Expense.uid, Expense.name, Expense.category)
+            .where(Expense.name.is_not(None), Expense.category.is_not(None), Expense.category != _("Other"))
+            .order_by(Expense.eid)
+        )
+        classifier, report = train(rows, threshold=args.threshold)
+
+    classifier.save(args.output)
+    accuracy = 'n/a' if report['accuracy'] is None else f"{report['accuracy']:.1%}"
+    print(f"Trained on {report['samples']} expenses: accuracy {accuracy}, "
+          f"fallback rate {report['fallback_rate']:.1%}. Model saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
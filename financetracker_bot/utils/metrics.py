@@ -0,0 +1,224 @@
+"""
+This module collects the operational metrics of the bot and serves them to Prometheus.
+
+Every command handler registered by the application is wrapped by :func:`instrument_handlers`,
+which records its latency, the exceptions it raised or logged, and the number and duration of the
+database queries it ran. The OpenAI client reports its request latency and outcome through
+:func:`track_openai`, and the chart renderer its render time. The ``stats()`` of the caches,
+queues and pools are exported as gauges by :func:`register_stats`.
+
+The metrics are served in the Prometheus text format by :func:`start_metrics_server`.
+
+Functions:
+    instrument: Wraps a handler callback so that its updates are measured.
+    instrument_handlers: Wraps the callbacks of all handlers of an application.
+    current_handler: Returns the name of the handler processing the current update.
+    track_openai: Context manager measuring an OpenAI request.
+    observe_chart_render: Records the time a chart took to render.
+    register_stats: Exports the ``stats()`` of a component as gauges.
+    instrument_engine: Counts and times the queries of an engine per update.
+    start_metrics_server: Serves the metrics over HTTP.
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+registry = CollectorRegistry()
+
+HANDLER_SECONDS = Histogram('bot_handler_seconds', 'Time spent handling an update.', ['handler'], registry=registry)
+HANDLER_ERRORS = Counter('bot_handler_errors', 'Exceptions raised or logged while handling updates.',
+                         ['handler', 'exception'], registry=registry)
+DB_QUERIES = Histogram('bot_db_queries_per_update', 'Database queries run per update.', ['handler'],
+                       buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89), registry=registry)
+DB_SECONDS = Histogram('bot_db_seconds_per_update', 'Time spent in database queries per update.', ['handler'],
+                       registry=registry)
+OPENAI_SECONDS = Histogram('bot_openai_request_seconds', 'Latency of OpenAI requests.', ['operation', 'outcome'],
+                           buckets=(.05, .1, .25, .5, 1, 2, 5, 10, 30), registry=registry)
+CHART_RENDER_SECONDS = Histogram('bot_chart_render_seconds', 'Time to render an analysis chart, including the wait '
+                                 'for a worker.', buckets=(.05, .1, .25, .5, 1, 2, 5, 10), registry=registry)
+
+# The measurements of the update being handled in the current task.
+_current_update = contextvars.ContextVar('current_update', default=None)
+
+
+class UpdateMeasurement:
+    """
+    The database usage of one update.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+def instrument(callback, name):
+    """
+    Wraps a handler callback so that its updates are measured.
+
+    Args:
+        callback (Callable): The coroutine function handling an update.
+        name (str): The handler label of the metrics, e.g. the command.
+
+    Returns:
+        Callable: The wrapped coroutine function.
+    """
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        measurement = UpdateMeasurement(name)
+        token = _current_update.set(measurement)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context, *args, **kwargs)
+        except Exception as e:  # pylint: disable=invalid-name
+            HANDLER_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            HANDLER_SECONDS.labels(name).observe(time.perf_counter() - started)
+            DB_QUERIES.labels(name).observe(measurement.queries)
+            DB_SECONDS.labels(name).observe(measurement.query_seconds)
+            _current_update.reset(token)
+    return wrapper
+
+
+def current_handler():
+    """
+    Returns the name of the handler processing the update of the current task.
+
+    Returns:
+        str: The handler label, or None outside of an instrumented handler.
+    """
+    measurement = _current_update.get()
+    return measurement.handler if measurement is not None else None
+
+
+def _handler_name(handler):
+    commands = getattr(handler, 'commands', None)
+    if commands:
+        return '/' + sorted(commands)[0]
+    return getattr(handler.callback, '__name__', type(handler).__name__)
+
+
+def instrument_handlers(application):
+    """
+    Wraps the callbacks of all handlers of an application; commands are labelled ``/<command>``.
+
+    From now on the exceptions logged by the loggers of the bot are counted as well.
+
+    Args:
+        application (telegram.ext.Application): The application whose handlers are wrapped.
+    """
+    logging.getLogger('financetracker_bot').addHandler(_error_counter)
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = instrument(handler.callback, _handler_name(handler))
+
+
+@contextlib.contextmanager
+def track_openai(operation):
+    """
+    Measures an OpenAI request. The outcome is ``ok``, ``cancelled`` or the exception type.
+
+    Args:
+        operation (str): The operation label, e.g. ``classify``.
+    """
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException as e:  # pylint: disable=invalid-name
+        outcome = 'cancelled' if type(e).__name__ == 'CancelledError' else type(e).__name__
+        raise
+    finally:
+        OPENAI_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+def observe_chart_render(seconds):
+    """
+    Records the time a chart took to render.
+
+    Args:
+        seconds (float): The render time, including the wait for a worker.
+    """
+    CHART_RENDER_SECONDS.observe(seconds)
+
+
+class _StatsCollector:
+    def __init__(self):
+        self.sources = {}
+
+    def collect(self):
+        """Yields a gauge for every numeric value reported by the registered components."""
+        for component, stats in self.sources.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(f'bot_{component}_{key}', f'{key} of the {component}.', value=value)
+
+
+_stats_collector = _StatsCollector()
+registry.register(_stats_collector)
+
+
+def register_stats(component, stats):
+    """
+    Exports the ``stats()`` of a component as gauges named ``bot_<component>_<key>``.
+
+    Args:
+        component (str): The name of the component, e.g. ``chart_cache``.
+        stats (Callable): Returns a dict of the current values.
+    """
+    _stats_collector.sources[component] = stats
+
+
+class ErrorCountingHandler(logging.Handler):
+    """
+    Counts the exceptions logged with ``logger.exception`` by the handler they were logged in.
+    """
+
+    def emit(self, record):
+        if record.exc_info and record.exc_info[0] is not None:
+            HANDLER_ERRORS.labels(current_handler() or 'background', record.exc_info[0].__name__).inc()
+
+
+_error_counter = ErrorCountingHandler()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+    measurement = _current_update.get()
+    if measurement is not None:
+        measurement.queries += 1
+        measurement.query_seconds += time.perf_counter() - context.metrics_started
+
+
+def instrument_engine(engine):
+    """
+    Counts and times the queries of an engine for the update being handled. Instrumenting an
+    engine again has no effect.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The engine; use ``sync_engine`` of an asyncio engine.
+    """
+    if not event.contains(engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def start_metrics_server(port, addr='127.0.0.1'):
+    """
+    Serves the metrics in the Prometheus text format from a background thread.
+
+    Args:
+        port (int): The port to listen on.
+        addr (str, optional): The address to listen on.
+    """
+    start_http_server(port, addr=addr, registry=registry)
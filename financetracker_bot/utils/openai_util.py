@@ -2,30 +2,123 @@
 This module provides functionality to classify expenses into predefined categories
 using OpenAI's GPT-3.5-turbo model. It utilizes the OpenAI API to analyze
 the description of an expense and determine the appropriate category.
+
+Importing the ``openai`` package takes longer than the rest of the bot together, so it is imported
+and the API clients are created when the first request is made.
+
+A client may be guarded by a :class:`~financetracker_bot.utils.circuit_breaker.CircuitBreaker`. It
+then reports failed requests, and the requests it refuses while the breaker is open, by raising
+:class:`ClassificationUnavailable` instead of answering 'Other', so that callers can classify the
+expense again once the service recovers.
 """
+import contextlib
+import re
 
-from openai import OpenAI as OriginalOpenAI
-from financetracker_bot.config.config import OPENAI_API_KEY
+from financetracker_bot.config.config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_REQUEST_TIMEOUT
 
+from financetracker_bot.utils.metrics import track_openai
 from financetracker_bot.utils.translation import _
 
 
+def get_expense_categories():
+    """
+    Return the predefined expense categories.
+
+    Returns:
+        list: The translated names of the categories, 'Other' being the last one.
+    """
+    return [
+        _("Groceries"),
+        _("Rent"),
+        _("Utilities"),
+        _("Transportation"),
+        _("Dining"),
+        _("Entertainment"),
+        _("Health"),
+        _("Education"),
+        _("Clothing"),
+        _("Other"),
+    ]
+
+
+# One line of a batched answer, e.g. "3: Dining" or "3. Dining".
+BATCH_ANSWER = re.compile(r'^\s*(\d+)\s*[:.)-]\s*(\w+)\s*$', re.MULTILINE)
+
+
+class ClassificationUnavailable(Exception):
+    """
+    Raised by a client guarded by a circuit breaker when the model could not be asked.
+    """
+
+
 class OpenAI:
     """
     A wrapper class for the OpenAI API client to classify expense descriptions
     into predefined categories.
     """
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, base_url=None, breaker=None):
         """
         Initialize the OpenAI client with the provided API key or the default key from config.
 
         Args:
             api_key (str, optional): The API key to use. If not provided, the default key from
                                      the configuration will be used.
+            base_url (str, optional): The URL of the API. If not provided, ``OPENAI_BASE_URL``
+                                      from the configuration or the official API is used.
+            breaker (CircuitBreaker, optional): Records the outcome of the requests and refuses
+                                                them while the API keeps failing.
         """
         self.api_key = api_key or OPENAI_API_KEY
-        self.client = OriginalOpenAI(api_key=self.api_key)
+        self.base_url = base_url or OPENAI_BASE_URL
+        self.breaker = breaker
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        """
+        openai.OpenAI: The synchronous API client, created on first use.
+        """
+        if self._client is None:
+            from openai import OpenAI as OriginalOpenAI  # pylint: disable=import-outside-toplevel
+            self._client = OriginalOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    @property
+    def async_client(self):
+        """
+        openai.AsyncOpenAI: The asynchronous API client, created on first use.
+        """
+        if self._async_client is None:
+            from openai import AsyncOpenAI as AsyncOriginalOpenAI  # pylint: disable=import-outside-toplevel
+            self._async_client = AsyncOriginalOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                                     timeout=OPENAI_REQUEST_TIMEOUT)
+        return self._async_client
+
+    @contextlib.contextmanager
+    def _guard(self, operation):
+        """
+        Measure a request and record its outcome in the circuit breaker, if any.
+
+        Args:
+            operation (str): The operation label of the metrics.
+
+        Raises:
+            ClassificationUnavailable: With a breaker, if it is open or the request failed.
+        """
+        if self.breaker is not None and not self.breaker.allow():
+            raise ClassificationUnavailable(f'{operation}: circuit breaker open')
+        try:
+            with track_openai(operation):
+                yield
+        except Exception as e:  # pylint: disable=invalid-name
+            if self.breaker is None:
+                raise
+            self.breaker.record_failure()
+            raise ClassificationUnavailable(f'{operation}: {e}') from e
+        if self.breaker is not None:
+            self.breaker.record_success()
 
     def classify_expense(self, description):
         """
@@ -37,19 +130,126 @@ class OpenAI:
         Returns:
             str: The name of the category that the expense belongs to. If the category
                  cannot be determined, 'Other' is returned.
+
+        Raises:
+            ClassificationUnavailable: With a circuit breaker, if the model could not be asked.
+        """
+        prompt, expense_categories = self._build_prompt(description)
+
+        try:
+            with self._guard('classify'):
+                response = self.client.completions.create(
+                    model="gpt-3.5-turbo-instruct",
+                    prompt=prompt,
+                    max_tokens=20,
+                )
+
+            resp = response.choices[0].text.strip()
+        except ClassificationUnavailable:
+            raise
+        except Exception:  # pylint: disable=broad-except,invalid-name
+            resp = _("Other")
+
+        return self._parse_category(resp, expense_categories)
+
+    async def aclassify_expense(self, description):
         """
-        expense_categories = [
-            _("Groceries"),
-            _("Rent"),
-            _("Utilities"),
-            _("Transportation"),
-            _("Dining"),
-            _("Entertainment"),
-            _("Health"),
-            _("Education"),
-            _("Clothing"),
-            _("Other"),
-        ]
+        Classify an expense description without blocking the event loop.
+
+        This is the asynchronous counterpart of :meth:`classify_expense`. The request is bounded by
+        ``OPENAI_REQUEST_TIMEOUT``; callers that need a shorter deadline should wrap the call in
+        :func:`asyncio.wait_for`.
+
+        Args:
+            description (str): The description of the expense to classify.
+
+        Returns:
+            str: The name of the category that the expense belongs to. If the category
+                 cannot be determined, 'Other' is returned.
+
+        Raises:
+            ClassificationUnavailable: With a circuit breaker, if the model could not be asked.
+        """
+        prompt, expense_categories = self._build_prompt(description)
+
+        try:
+            with self._guard('classify'):
+                response = await self.async_client.completions.create(
+                    model="gpt-3.5-turbo-instruct",
+                    prompt=prompt,
+                    max_tokens=20,
+                )
+
+            resp = response.choices[0].text.strip()
+        except ClassificationUnavailable:
+            raise
+        except Exception:  # pylint: disable=broad-except,invalid-name
+            resp = _("Other")
+
+        return self._parse_category(resp, expense_categories)
+
+    async def aclassify_expenses(self, descriptions):
+        """
+        Classify several expense descriptions with a single API request.
+
+        The model is asked to answer one ``<number>: <category>`` line per description. Lines that
+        are missing or cannot be parsed yield 'Other' for their description only.
+
+        Args:
+            descriptions (list): The descriptions of the expenses to classify.
+
+        Returns:
+            list: The category of each description, in the same order.
+
+        Raises:
+            ClassificationUnavailable: With a circuit breaker, if the model could not be asked.
+        """
+        if len(descriptions) == 1:
+            return [await self.aclassify_expense(descriptions[0])]
+
+        expense_categories = get_expense_categories()
+        prompt = _(
+            "Classify each of the following numbered expenses into one of the categories: {}.\n"
+            "{}\n"
+            "Expenses may be written in any language. Answer with one line per expense in the form "
+            "<number>: <category>, using the name of the category in English. If you don't know "
+            "answer Other. Please do not add anything else to your response."
+        ).format(', '.join(expense_categories),
+                 '\n'.join(f'{number}. {description}' for number, description in enumerate(descriptions, start=1)))
+
+        try:
+            with self._guard('classify_batch'):
+                response = await self.async_client.completions.create(
+                    model="gpt-3.5-turbo-instruct",
+                    prompt=prompt,
+                    max_tokens=10 * len(descriptions) + 20,
+                )
+
+            resp = response.choices[0].text
+        except ClassificationUnavailable:
+            raise
+        except Exception:  # pylint: disable=broad-except,invalid-name
+            resp = ""
+
+        answers = {}
+        for match in BATCH_ANSWER.finditer(resp):
+            answers.setdefault(int(match.group(1)), match.group(2).strip())
+
+        return [self._parse_category(answers.get(number, ""), expense_categories)
+                for number in range(1, len(descriptions) + 1)]
+
+    @staticmethod
+    def _build_prompt(description):
+        """
+        Build the classification prompt for an expense description.
+
+        Args:
+            description (str): The description of the expense to classify.
+
+        Returns:
+            tuple: The prompt and the list of allowed categories.
+        """
+        expense_categories = get_expense_categories()
 
         prompt = _(
             "Which of the following categories does the expense '{}' belong to? "
@@ -59,17 +259,20 @@ class OpenAI:
             "Please do not add punctuation or any other signs to your response."
         ).format(description, ', '.join(expense_categories))
 
-        try:
-            response = self.client.completions.create(
-                model="gpt-3.5-turbo-instruct",
-                prompt=prompt,
-                max_tokens=20,
-            )
+        return prompt, expense_categories
 
-            resp = response.choices[0].text.strip()
-        except Exception:  # pylint: disable=broad-except,invalid-name
-            resp = _("Other")
+    @staticmethod
+    def _parse_category(resp, expense_categories):
+        """
+        Map a model answer to one of the allowed categories.
+
+        Args:
+            resp (str): The stripped answer of the model.
+            expense_categories (list): The allowed categories.
 
+        Returns:
+            str: The answer if it is an allowed category, 'Other' otherwise.
+        """
         if resp not in expense_categories:
             resp = _("Other")
 
@@ -0,0 +1,181 @@
+"""
+This module profiles the SQL queries issued while handling updates.
+
+The profiler listens to the cursor events of the engines it is attached to. While it is enabled,
+every query is counted and timed under the command whose update issued it, and queries slower than
+the threshold are logged with their parameters and query plan (``EXPLAIN QUERY PLAN`` on SQLite,
+``EXPLAIN`` elsewhere). It can be switched on and off at runtime.
+
+Tests use :meth:`QueryProfiler.capture` to assert how many queries a handler issues, so query
+regressions fail the test suite.
+"""
+import contextlib
+import logging
+import time
+import weakref
+from collections import defaultdict
+
+from sqlalchemy import event
+
+from financetracker_bot.config.config import QUERY_PROFILER, SLOW_QUERY_THRESHOLD
+from financetracker_bot.utils.metrics import current_handler
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCapture:
+    """
+    The queries issued inside a :meth:`QueryProfiler.capture` block.
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.seconds = 0.0
+
+    @property
+    def count(self):
+        """
+        int: The number of captured queries.
+        """
+        return len(self.statements)
+
+
+class QueryProfiler:
+    """
+    Counts, times and explains the queries of the attached engines.
+    """
+
+    def __init__(self, threshold=0.1, enabled=False, explain=True):
+        """
+        Initialize the profiler.
+
+        Args:
+            threshold (float): The number of seconds above which a query is logged as slow.
+            enabled (bool): Whether queries are profiled from the start.
+            explain (bool): Whether the query plan of slow queries is logged.
+        """
+        self.threshold = threshold
+        self.enabled = enabled
+        self.explain = explain
+        self.commands = defaultdict(lambda: {'queries': 0, 'seconds': 0.0, 'slow': 0})
+        self._captures = []
+        self._engines = weakref.WeakSet()
+
+    def attach(self, engine):
+        """
+        Profile the queries of an engine. Attaching an engine again has no effect.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): The engine; use ``sync_engine`` of an asyncio engine.
+        """
+        if engine not in self._engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._engines.add(engine)
+
+    def detach(self, engine):
+        """
+        Stop profiling the queries of an engine. Detaching an engine that is not attached has no
+        effect.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): The engine the profiler was attached to.
+        """
+        if engine in self._engines:
+            event.remove(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.remove(engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._engines.discard(engine)
+
+    def enable(self):
+        """
+        Start profiling queries.
+        """
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop profiling queries. Active captures keep recording.
+        """
+        self.enabled = False
+
+    def toggle(self):
+        """
+        Switch profiling on or off, e.g. from a signal handler.
+
+        Returns:
+            bool: Whether profiling is now enabled.
+        """
+        self.enabled = not self.enabled
+        logger.info("Query profiler %s", "enabled" if self.enabled else "disabled")
+        return self.enabled
+
+    @contextlib.contextmanager
+    def capture(self):
+        """
+        Record the queries issued inside the block, whether profiling is enabled or not.
+
+        Yields:
+            QueryCapture: The captured statements and their total time.
+        """
+        capture = QueryCapture()
+        self._captures.append(capture)
+        try:
+            yield capture
+        finally:
+            self._captures.remove(capture)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+        context.profiler_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+        if not self.enabled and not self._captures:
+            return
+        elapsed = time.perf_counter() - context.profiler_started
+        for capture in self._captures:
+            capture.statements.append(statement)
+            capture.seconds += elapsed
+        if not self.enabled:
+            return
+
+        command = current_handler() or 'other'
+        stats = self.commands[command]
+        stats['queries'] += 1
+        stats['seconds'] += elapsed
+        if elapsed >= self.threshold:
+            stats['slow'] += 1
+            plan = self._explain(conn, statement, parameters) if self.explain and not executemany else None
+            logger.warning("Slow query in %s took %.3f s: %s; parameters: %r; plan: %s",
+                           command, elapsed, statement, parameters, plan)
+
+    @staticmethod
+    def _explain(conn, statement, parameters):
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        # The plan is read on the raw driver connection, so it is not profiled itself.
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return ' | '.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:  # pylint: disable=broad-except,invalid-name
+            return f'unavailable ({e})'
+
+    def stats(self):
+        """
+        Report the queries profiled per command.
+
+        Returns:
+            dict: For every command, the number of queries, their total time in seconds and the
+                  number of slow ones.
+        """
+        return {command: dict(stats) for command, stats in self.commands.items()}
+
+    def reset(self):
+        """
+        Forget the profiled queries.
+        """
+        self.commands.clear()
+
+
+query_profiler = QueryProfiler(threshold=SLOW_QUERY_THRESHOLD, enabled=QUERY_PROFILER)
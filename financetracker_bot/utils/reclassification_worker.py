@@ -0,0 +1,254 @@
+"""
+This module classifies again, in the background, the expenses that /add and /import saved as 'Other'.
+
+When the classification model misses the /add deadline or is unavailable, the expense is saved as
+'Other' and queued in the ``reclassification_queue`` table in the same transaction; /import queues
+the expenses of its chunks the model was unavailable for the same way. The
+:class:`ReclassificationWorker` processes the due entries a few at a time: it classifies the
+description, moves the expense to its category and deletes the entry in one transaction, and then
+lets the bot notify the user. The queue is a table, so the expenses queued before a restart are classified
+after it.
+
+A classification that fails is retried after a delay that doubles with every attempt. While the
+circuit breaker of the model is open, only the entries whose classification is already running are
+processed.
+
+Functions:
+    enqueue: Queues an expense for classification.
+"""
+import asyncio
+import contextlib
+import datetime
+import logging
+
+from sqlalchemy import delete, select, update
+
+from financetracker_bot.models.database import get_session_factory
+from financetracker_bot.models.finance_model import Expense, ReclassificationEntry
+from financetracker_bot.utils.translation import _
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue(db, expense, chat_id=None, message_id=None):
+    """
+    Queues an expense for classification in the transaction of the session.
+
+    Args:
+        db (AsyncSession): The session saving the expense; it is flushed to assign the expense ID.
+        expense (Expense): The expense saved as 'Other'.
+        chat_id (int, optional): The chat the user is notified in once the expense is moved.
+        message_id (int, optional): The message the notification replies to.
+    """
+    await db.flush()
+    db.add(ReclassificationEntry(eid=expense.eid, uid=expense.uid, chat_id=chat_id, message_id=message_id,
+                                 attempts=0, next_attempt=datetime.datetime.now()))
+
+
+class ReclassificationWorker:  # pylint: disable=too-many-instance-attributes
+    """
+    Drains the reclassification queue with bounded concurrency and retries with backoff.
+    """
+
+    def __init__(self, classify, move, on_moved=None, concurrency=4, poll_interval=5.0,  # pylint: disable=too-many-arguments
+                 retry_delay=10.0, max_delay=600.0, breaker=None, session_factory=None):
+        """
+        Initialize the worker.
+
+        Args:
+            classify (Callable): A coroutine function returning the category of a description; it
+                                 raises if the model could not be asked.
+            move (Callable): A coroutine function ``move(db, expense, category)`` staging the move of
+                             an expense from 'Other' to its category.
+            on_moved (Callable, optional): A coroutine function ``on_moved(bot, entry, category)``
+                                           called once the move of an expense was committed, e.g.
+                                           to notify the user.
+            concurrency (int): The number of entries processed at a time.
+            poll_interval (float): The number of seconds between checks of the queue when idle.
+            retry_delay (float): The number of seconds before the first retry of a failed entry.
+            max_delay (float): The maximum number of seconds between retries.
+            breaker (CircuitBreaker, optional): The circuit breaker of the model; no new
+                                                classifications are started while it is open.
+            session_factory (Callable, optional): Creates the sessions of the worker; defaults to
+                                                  the session factory of the bot.
+        """
+        self.classify = classify
+        self.move = move
+        self.on_moved = on_moved
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.session_factory = session_factory
+        self.bot = None
+        self.processed = 0
+        self.moved = 0
+        self.failed = 0
+        self._inflight = {}
+        self._semaphore = None
+        self._wake = None
+        self._task = None
+
+    def submit(self, expense_id, classification=None):
+        """
+        Tell the worker that an expense was queued.
+
+        A running classification is submitted before the transaction queuing the expense commits,
+        so that the worker never finds the entry without it; the worker is woken again once the
+        transaction committed.
+
+        Args:
+            expense_id (int): The ID of the queued expense.
+            classification (asyncio.Future, optional): A classification of the expense that is
+                                                       still running; it is awaited instead of
+                                                       asking the model again.
+        """
+        if classification is not None:
+            self._inflight[expense_id] = classification
+        if self._wake is not None:
+            self._wake.set()
+
+    def discard(self, expense_id):
+        """
+        Forget the running classification submitted for an expense whose queuing was rolled back.
+
+        Args:
+            expense_id (int): The ID the expense had in the rolled back transaction.
+        """
+        self._inflight.pop(expense_id, None)
+
+    def _factory(self):
+        return (self.session_factory or get_session_factory())()
+
+    async def run_once(self, finished_only=False):
+        """
+        Process the entries that are due now.
+
+        Args:
+            finished_only (bool, optional): Whether to process only the entries whose running
+                                            classification has already finished.
+
+        Returns:
+            int: The number of entries processed.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        query = select(ReclassificationEntry)
+        if finished_only:
+            query = query.filter(ReclassificationEntry.eid.in_(
+                [eid for eid, classification in self._inflight.items() if classification.done()]))
+        else:
+            query = (query.filter(ReclassificationEntry.next_attempt <= datetime.datetime.now())
+                     .order_by(ReclassificationEntry.next_attempt).limit(self.concurrency * 4))
+        async with self._factory() as db:
+            entries = (await db.scalars(query)).all()
+        if self.breaker is not None and self.breaker.is_open:
+            entries = [entry for entry in entries if entry.eid in self._inflight]
+        await asyncio.gather(*map(self._process, entries))
+        return len(entries)
+
+    async def _process(self, entry):
+        async with self._semaphore:
+            classification = self._inflight.pop(entry.eid, None)
+            async with self._factory() as db:
+                expense = await db.get(Expense, entry.eid)
+                description = expense.name if expense is not None and expense.category == _("Other") else None
+                if not description:
+                    await self._finish(db, entry)
+                    return
+
+            try:
+                category = await (classification if classification is not None else self.classify(description))
+            except Exception:  # pylint: disable=broad-except
+                self.failed += 1
+                await self._retry(entry)
+                return
+
+            async with self._factory() as db:
+                # The user may have deleted or moved the expense in the meantime.
+                expense = await db.get(Expense, entry.eid)
+                moved = expense is not None and expense.category == _("Other") and category != _("Other")
+                if moved:
+                    await self.move(db, expense, category)
+                await self._finish(db, entry, moved)
+
+        if moved and self.on_moved is not None:
+            try:
+                await self.on_moved(self.bot, entry, category)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to notify about reclassified expense %s", entry.eid)
+
+    async def _finish(self, db, entry, moved=False):
+        await db.execute(delete(ReclassificationEntry).filter_by(eid=entry.eid))
+        await db.commit()
+        self.processed += 1
+        self.moved += int(moved)
+
+    async def _retry(self, entry):
+        delay = min(self.max_delay, self.retry_delay * 2 ** entry.attempts)
+        if self.breaker is not None:
+            delay = max(delay, self.breaker.retry_after())
+        async with self._factory() as db:
+            await db.execute(update(ReclassificationEntry).filter_by(eid=entry.eid).values(
+                attempts=ReclassificationEntry.attempts + 1,
+                next_attempt=datetime.datetime.now() + datetime.timedelta(seconds=delay),
+            ))
+            await db.commit()
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        while True:
+            self._wake.clear()
+            try:
+                if await self.run_once():
+                    continue
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to process the reclassification queue")
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+
+    def start(self, bot=None):
+        """
+        Start processing the queue in the background.
+
+        Args:
+            bot (telegram.Bot, optional): The bot the users are notified with.
+        """
+        self.bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def drain(self, timeout):
+        """
+        Stop processing the queue, and wait for the classifications that are already running to be
+        applied, e.g. before shutting down. The other entries stay queued for the next start.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            int: The number of running classifications that did not finish in time.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self._wake = None
+        if not self._inflight:
+            return 0
+        _, pending = await asyncio.wait(list(self._inflight.values()), timeout=timeout)
+        await self.run_once(finished_only=True)
+        return len(pending)
+
+    def stats(self):
+        """
+        Report the work of the worker.
+
+        Returns:
+            dict: The number of entries processed, expenses moved, failed attempts and running
+                  classifications.
+        """
+        return {'processed': self.processed, 'moved': self.moved, 'failed': self.failed,
+                'inflight': len(self._inflight)}
@@ -1,6 +1,10 @@
 """
 Translation module
+
+The message catalog of the locale is loaded when the first message is translated, not on import.
+Modules import :func:`_` from here; the builtins are left untouched.
 """
+import functools
 import gettext
 import locale
 import os
@@ -15,8 +19,20 @@ def setup_translation():
         lang = lang.split('_')[0]
 
     translation = gettext.translation('messages', localedir, languages=[lang], fallback=True)
-    translation.install()
     return translation.gettext, translation.ngettext
 
 
-_, ngettext = setup_translation()
+@functools.lru_cache(maxsize=None)
+def get_translation():
+    "Return the gettext and ngettext functions of the locale, set up on first use"
+    return setup_translation()
+
+
+def _(message):
+    "Translate a message"
+    return get_translation()[0](message)
+
+
+def ngettext(singular, plural, n):
+    "Translate a message with singular and plural forms"
+    return get_translation()[1](singular, plural, n)
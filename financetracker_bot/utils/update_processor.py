@@ -0,0 +1,111 @@
+"""
+This module provides the update processor that lets the bot serve several users at once.
+
+Updates of different users are processed concurrently by a bounded number of workers, while the
+updates of one user are processed strictly in the order they arrived. A user's ``/add`` followed
+by ``/delete`` therefore never runs out of order or concurrently, and one user's slow analysis
+does not hold up anybody else.
+"""
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+def _user_key(update):
+    """
+    Returns the key the updates are serialized by: the user, or the chat for updates without one.
+    """
+    user = getattr(update, 'effective_user', None)
+    if user is not None:
+        return 'user', user.id
+    chat = getattr(update, 'effective_chat', None)
+    if chat is not None:
+        return 'chat', chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes the updates of different users in parallel and the updates of each user in order.
+    """
+
+    def __init__(self, workers=32, max_pending=1024):
+        """
+        Initialize the processor.
+
+        Args:
+            workers (int): The number of updates processed at the same time.
+            max_pending (int): The number of updates accepted at the same time, including those
+                               waiting for a worker or for an earlier update of the same user.
+        """
+        super().__init__(max_pending)
+        self.workers = workers
+        self.in_flight = 0
+        self.pending = 0
+        self.processed = 0
+        self._worker_slots = asyncio.Semaphore(workers)
+        self._locks = {}
+        self._holders = {}
+
+    async def do_process_update(self, update, coroutine):
+        """
+        Waits for the earlier updates of the same user and for a free worker, then processes the
+        update.
+
+        Args:
+            update (object): The update to be processed.
+            coroutine (Awaitable): The coroutine processing the update.
+        """
+        key = _user_key(update)
+        lock = self._locks.setdefault(key, asyncio.Lock()) if key is not None else None
+        if key is not None:
+            self._holders[key] = self._holders.get(key, 0) + 1
+
+        self.pending += 1
+        try:
+            if lock is not None:
+                await lock.acquire()
+            try:
+                async with self._worker_slots:
+                    self.in_flight += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.in_flight -= 1
+                        self.processed += 1
+            finally:
+                if lock is not None:
+                    lock.release()
+        finally:
+            self.pending -= 1
+            if key is not None:
+                self._holders[key] -= 1
+                if not self._holders[key]:
+                    del self._holders[key]
+                    del self._locks[key]
+
+    async def initialize(self):
+        """
+        Does nothing; the processor needs no resources.
+        """
+
+    async def shutdown(self):
+        """
+        Does nothing; the application waits for the pending updates itself.
+        """
+
+    def stats(self):
+        """
+        Report the processor gauges and counters.
+
+        Returns:
+            dict: The number of updates being processed, waiting for a worker or an earlier update
+                  of their user, the number of users with pending updates and the number of
+                  processed updates.
+        """
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.pending - self.in_flight,
+            'active_users': len(self._holders),
+            'processed': self.processed,
+        }
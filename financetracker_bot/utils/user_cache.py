@@ -0,0 +1,149 @@
+"""
+This module provides an in-process cache of the IDs of registered users.
+
+Almost every command starts by checking that the user has registered with /start, which would cost
+a database round-trip per update. Users are registered once and rarely deleted, so their IDs are
+kept in a bounded LRU that /start fills and :func:`~financetracker_bot.app_context.bootstrap`
+warms. Deleting users, one at a time through the ORM or in bulk with a DELETE statement, removes
+them from the cache.
+
+Functions:
+    registered_only: Decorator that replies "Please register first" to unregistered users.
+"""
+import functools
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from financetracker_bot.config.config import REGISTERED_USER_CACHE_SIZE
+from financetracker_bot.models.finance_model import User
+from financetracker_bot.utils.translation import _
+
+
+class RegisteredUserCache:
+    """
+    A bounded LRU of the IDs of registered users in front of the ``users`` table.
+    """
+
+    def __init__(self, max_size=100000):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): The number of user IDs kept in memory.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._uids = OrderedDict()
+
+    def add(self, uid):
+        """
+        Remember that a user is registered.
+
+        Args:
+            uid (int): The ID of the user.
+        """
+        self._uids[uid] = True
+        self._uids.move_to_end(uid)
+        while len(self._uids) > self.max_size:
+            self._uids.popitem(last=False)
+
+    def discard(self, uid):
+        """
+        Forget a user, e.g. because they were deleted.
+
+        Args:
+            uid (int): The ID of the user.
+        """
+        self._uids.pop(uid, None)
+
+    def clear(self):
+        """
+        Forget all users.
+        """
+        self._uids.clear()
+
+    def __contains__(self, uid):
+        return uid in self._uids
+
+    async def is_registered(self, db, uid):
+        """
+        Check whether a user is registered, reading the database only if the user is not cached.
+
+        Args:
+            db (AsyncSession): The database session of the current update.
+            uid (int): The ID of the user.
+
+        Returns:
+            bool: Whether the user is registered.
+        """
+        if uid in self._uids:
+            self._uids.move_to_end(uid)
+            self.hits += 1
+            return True
+        self.misses += 1
+        if await db.scalar(select(User.uid).filter_by(uid=uid)) is None:
+            return False
+        self.add(uid)
+        return True
+
+    def warm(self, bind):
+        """
+        Load the most recently registered users, up to the size of the cache.
+
+        Args:
+            bind (sqlalchemy.engine.Engine): The synchronous engine of the database.
+        """
+        with bind.connect() as connection:
+            uids = connection.scalars(select(User.uid).order_by(User.uid.desc()).limit(self.max_size)).all()
+        for uid in reversed(uids):
+            self.add(uid)
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+            dict: The number of cached users, hits and misses.
+        """
+        return {'size': len(self._uids), 'hits': self.hits, 'misses': self.misses}
+
+
+registered_users = RegisteredUserCache(max_size=REGISTERED_USER_CACHE_SIZE)
+
+
+@event.listens_for(User, 'after_delete')
+def _forget_deleted_user(mapper, connection, target):  # pylint: disable=unused-argument
+    registered_users.discard(target.uid)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _forget_bulk_deleted_users(orm_execute_state):
+    # A bulk DELETE may match any number of users, so all of them are forgotten.
+    if orm_execute_state.is_delete and orm_execute_state.bind_mapper is not None \
+            and orm_execute_state.bind_mapper.class_ is User:
+        registered_users.clear()
+
+
+def registered_only(handler):
+    """
+    Decorates a handler taking a database session so that it only runs for registered users.
+
+    Unregistered users are asked to register with /start instead. Use it below
+    :func:`~financetracker_bot.models.database.with_session`.
+
+    Args:
+        handler (Callable): The coroutine function handling an update as ``handler(update, context, db)``.
+
+    Returns:
+        Callable: The wrapped coroutine function.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update, context, db, *args, **kwargs):
+        if not await registered_users.is_registered(db, update.effective_user.id):
+            await update.effective_message.reply_text(_('Please register first using the /start command.'))
+            return None
+        return await handler(update, context, db, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,69 @@
+"""
+A local HTTP server imitating the completions endpoint of the OpenAI API.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def answer_other(prompt):
+    numbers = re.findall(r'^(\d+)\. ', prompt, re.MULTILINE)
+    if numbers:
+        return '\n'.join(f'{number}: Other' for number in numbers)
+    return 'Other'
+
+
+class FakeOpenAIServer:
+
+    def __init__(self, responder=answer_other, latency=0.0, status=200):
+        self.responder = responder
+        self.latency = latency
+        # Any other status imitates an outage, e.g. 429 for rate limiting.
+        self.status = status
+        self.prompts = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                server.prompts.append(body['prompt'])
+                time.sleep(server.latency)
+                if server.status != 200:
+                    payload = json.dumps({'error': {'message': 'unavailable', 'type': 'server_error'}}).encode()
+                    self.send_response(server.status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                payload = json.dumps({
+                    'id': 'cmpl-fake',
+                    'object': 'text_completion',
+                    'created': 0,
+                    'model': body['model'],
+                    'choices': [{'text': server.responder(body['prompt']), 'index': 0,
+                                 'logprobs': None, 'finish_reason': 'stop'}],
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
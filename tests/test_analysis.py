@@ -0,0 +1,44 @@
+import datetime
+import unittest
+from financetracker_bot.models.analysis import CategorySummary, get_category_summary
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.finance_model import Expense, User, session
+
+
+class TestAnalysis(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=9, name="Test User"))
+        day = datetime.datetime(2024, 5, 10, 12, 0, 0)
+        session.add_all([
+            Expense(uid=9, category="Dining", amount=10.0, date=day),
+            Expense(uid=9, category="Dining", amount=30.0, date=day + datetime.timedelta(days=1)),
+            Expense(uid=9, category="Rent", amount=500.0, date=day),
+            Expense(uid=9, category="Rent", amount=500.0, date=day - datetime.timedelta(days=30)),
+            Expense(uid=10, category="Dining", amount=99.0, date=day),
+        ])
+        session.commit()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+
+    async def test_get_category_summary(self):
+        async with async_session_factory() as db:
+            summary = await get_category_summary(db, 9, datetime.datetime(2024, 5, 1), datetime.datetime(2024, 5, 31))
+
+        self.assertEqual(summary, [
+            CategorySummary("Rent", 500.0, 1, 500.0, 500.0, 500.0),
+            CategorySummary("Dining", 40.0, 2, 10.0, 30.0, 20.0),
+        ])
+
+    async def test_get_category_summary_of_empty_period(self):
+        async with async_session_factory() as db:
+            summary = await get_category_summary(db, 9, datetime.datetime(2023, 1, 1), datetime.datetime(2023, 1, 31))
+
+        self.assertEqual(summary, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
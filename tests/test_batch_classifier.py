@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+from fake_openai_server import FakeOpenAIServer
+from financetracker_bot.utils.batch_classifier import BatchClassifier
+from financetracker_bot.utils.openai_util import OpenAI
+
+
+class TestBatchClassifier(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_descriptions_share_one_request(self):
+        def responder(prompt):
+            return "1: Dining\n2: Transportation\n3: Rent"
+
+        with FakeOpenAIServer(responder) as server:
+            classifier = BatchClassifier(OpenAI(api_key='test', base_url=server.base_url), window=0.05)
+            results = await asyncio.gather(
+                classifier.classify("Pizza"),
+                classifier.classify("Taxi"),
+                classifier.classify("Flat"),
+            )
+
+        self.assertEqual(results, ["Dining", "Transportation", "Rent"])
+        self.assertEqual(len(server.prompts), 1)
+        self.assertIn("2. Taxi", server.prompts[0])
+        self.assertEqual(classifier.stats()['mean_batch_size'], 3)
+
+    async def test_malformed_answers_fall_back_to_other(self):
+        def responder(prompt):
+            return "1: Dining\nsecond one is probably food\n3: Spaceships"
+
+        with FakeOpenAIServer(responder) as server:
+            classifier = BatchClassifier(OpenAI(api_key='test', base_url=server.base_url), window=0.05)
+            results = await asyncio.gather(*(classifier.classify(d) for d in ("Pizza", "Soup", "Rocket")))
+
+        self.assertEqual(results, ["Dining", "Other", "Other"])
+
+    async def test_full_batch_is_sent_without_waiting(self):
+        with FakeOpenAIServer() as server:
+            classifier = BatchClassifier(OpenAI(api_key='test', base_url=server.base_url), window=10, max_batch=2)
+            results = await asyncio.wait_for(
+                asyncio.gather(classifier.classify("Pizza"), classifier.classify("Taxi")), timeout=5)
+
+        self.assertEqual(results, ["Other", "Other"])
+        self.assertEqual(len(server.prompts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import AsyncMock, patch
 from telegram import Update, User as TelegramUser, Message, Chat
 from telegram.ext import CallbackContext
-from financetracker_bot.models.finance_model import Budget, Expense, User, session
+from financetracker_bot.models.finance_model import Budget, CategoryTotal, Expense, User, session
 from financetracker_bot.handlers.budget_handler import set_budget, delete_budget, show_budgets
 from financetracker_bot.handlers.expense_handler import add_expense
 import datetime
@@ -19,6 +19,7 @@ class TestBudgetHandler(unittest.IsolatedAsyncioTestCase):
 
     def tearDown(self):
         session.query(Budget).delete()
+        session.query(CategoryTotal).delete()
         session.query(Expense).delete()
         session.query(User).delete()
         session.commit()
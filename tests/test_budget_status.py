@@ -0,0 +1,43 @@
+import unittest
+from financetracker_bot.models.budget_status import BudgetStatus, get_budget_status
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.finance_model import Budget, CategoryTotal, User, session
+
+
+class TestBudgetStatus(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=8, name="Test User"))
+        session.add_all([
+            Budget(uid=8, category="Dining", amount=200.0),
+            Budget(uid=8, category="Rent", amount=1000.0),
+            Budget(uid=8, category="Other", amount=float('inf')),
+            CategoryTotal(uid=8, category="Dining", total=50.0, count=2),
+            CategoryTotal(uid=8, category="Other", total=10.0, count=1),
+        ])
+        session.commit()
+
+    def tearDown(self):
+        session.query(Budget).delete()
+        session.query(CategoryTotal).delete()
+        session.query(User).delete()
+        session.commit()
+
+    async def test_get_budget_status(self):
+        async with async_session_factory() as db:
+            statuses = await get_budget_status(db, 8)
+
+        self.assertEqual(statuses, [
+            BudgetStatus("Dining", 200.0, 50.0, 25.0),
+            BudgetStatus("Rent", 1000.0, 0, 0.0),
+            BudgetStatus("Other", float('inf'), 10.0, 0.0),
+        ])
+
+    async def test_get_budget_status_of_category(self):
+        async with async_session_factory() as db:
+            self.assertEqual(await get_budget_status(db, 8, "Rent"), [BudgetStatus("Rent", 1000.0, 0, 0.0)])
+            self.assertEqual(await get_budget_status(db, 8, "Health"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import datetime
+import unittest
+from financetracker_bot.models import category_totals
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.finance_model import CategoryTotal, Expense, User, engine, session
+
+
+class TestCategoryTotals(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=7, name="Test User"))
+        session.commit()
+
+    def tearDown(self):
+        session.query(CategoryTotal).delete()
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+
+    async def test_apply_and_move_expense(self):
+        async with async_session_factory() as db:
+            await category_totals.apply_expense(db, 7, "Dining", 10.0)
+            await category_totals.apply_expense(db, 7, "Dining", 5.0)
+            await category_totals.move_expense(db, 7, "Dining", "Groceries", 5.0)
+            await db.commit()
+
+            self.assertEqual(await category_totals.get_total(db, 7, "Dining"), 10.0)
+            self.assertEqual(await category_totals.get_total(db, 7, "Groceries"), 5.0)
+            self.assertEqual(await category_totals.get_total(db, 7, "Rent"), 0)
+
+    def test_verify_and_rebuild(self):
+        session.add(Expense(uid=7, category="Dining", amount=10.0, date=datetime.datetime.now()))
+        session.add(CategoryTotal(uid=7, category="Rent", total=500.0, count=1))
+        session.commit()
+
+        with engine.begin() as connection:
+            drift = category_totals.verify(connection, uid=7)
+            self.assertEqual({row['category'] for row in drift}, {"Dining", "Rent"})
+
+            category_totals.rebuild(connection, uid=7)
+            self.assertEqual(category_totals.verify(connection, uid=7), [])
+
+        session.expire_all()
+        self.assertEqual(session.get(CategoryTotal, (7, "Dining")).total, 10.0)
+        self.assertIsNone(session.get(CategoryTotal, (7, "Rent")))
+
+
+if __name__ == '__main__':
+    unittest.main()
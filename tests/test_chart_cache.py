@@ -0,0 +1,108 @@
+import datetime
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from telegram import Update, User as TelegramUser, Message, Chat
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers.budget_handler import financial_analysis
+from financetracker_bot.models.finance_model import Expense, User, session
+from financetracker_bot.utils.chart_cache import ChartCache, chart_cache
+
+START = datetime.datetime(2024, 5, 1)
+END = datetime.datetime(2024, 5, 31)
+
+
+class TestChartCache(unittest.TestCase):
+
+    def test_version_bump_invalidates_user_charts(self):
+        cache = ChartCache()
+        cache.put(1, START, END, b'png1')
+        cache.put(2, START, END, b'png2')
+
+        cache.bump_version(1)
+
+        self.assertIsNone(cache.get(1, START, END))
+        self.assertEqual(cache.get(2, START, END).png, b'png2')
+        self.assertEqual(cache.stats()['bytes'], 4)
+
+    def test_eviction_by_entries_and_size(self):
+        cache = ChartCache(max_entries=2, max_bytes=10)
+        cache.put(1, START, END, b'aaaa')
+        cache.put(2, START, END, b'bbbb')
+        cache.put(3, START, END, b'cccc')
+        self.assertIsNone(cache.get(1, START, END))
+
+        cache.put(4, START, END, b'dddddddd')
+        self.assertIsNone(cache.get(3, START, END))
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertEqual(cache.stats()['bytes'], 8)
+
+    def test_chart_outdated_during_render_is_not_cached(self):
+        cache = ChartCache()
+        version = cache.version(1)
+        cache.bump_version(1)
+
+        chart = cache.put(1, START, END, b'stale', version)
+
+        self.assertEqual(chart.png, b'stale')
+        self.assertIsNone(cache.get(1, START, END))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_versions_are_bounded_and_never_reused(self):
+        cache = ChartCache(max_entries=1, max_versions=2)
+        version = cache.version(1)
+        for uid in (1, 2, 3):
+            cache.bump_version(uid)
+
+        self.assertEqual(len(cache._versions), 2)
+        self.assertNotEqual(cache.version(1), version)
+        cache.put(1, START, END, b'stale', version)
+        self.assertIsNone(cache.get(1, START, END))
+
+
+class TestAnalysisChartCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.add(Expense(uid=123, category="Dining", amount=10.0, date=datetime.datetime(2024, 5, 10)))
+        session.commit()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+        chart_cache.bump_version(123)
+
+    def create_context(self, bot):
+        update = Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                text="/analysis 2024-05-01 00:00:00 2024-05-31 00:00:00",
+            ),
+        )
+        application = MagicMock()
+        application.bot = bot
+        context = CallbackContext(application, chat_id=123, user_id=123)
+        context.args = ["2024-05-01", "00:00:00", "2024-05-31", "00:00:00"]
+        return update, context
+
+    @patch('financetracker_bot.handlers.budget_handler.chart_renderer.render_pie', new_callable=AsyncMock)
+    async def test_repeated_analysis_resends_file_id(self, mock_render):
+        mock_render.return_value = b'png'
+        bot = MagicMock()
+        bot.send_photo = AsyncMock(return_value=MagicMock(photo=[MagicMock(file_id='small'), MagicMock(file_id='large')]))
+
+        update, context = self.create_context(bot)
+        await financial_analysis(update, context)
+        await financial_analysis(update, context)
+
+        mock_render.assert_awaited_once()
+        self.assertEqual(bot.send_photo.call_args_list[0].kwargs['photo'], b'png')
+        self.assertEqual(bot.send_photo.call_args_list[1].kwargs['photo'], 'large')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from financetracker_bot.utils.chart_renderer import ChartRenderer, ChartQueueFull
+
+
+def slow_render(labels, values, title):
+    time.sleep(0.1)
+    return b'\x89PNG ' + title.encode()
+
+
+class TestChartRenderer(unittest.IsolatedAsyncioTestCase):
+
+    @patch('financetracker_bot.utils.chart_renderer.render_pie_chart', slow_render)
+    async def test_render_returns_bytes(self):
+        renderer = ChartRenderer(workers=1, executor=ThreadPoolExecutor(1))
+        chart = await renderer.render_pie(["Dining"], [10.0], "Expenses")
+
+        self.assertEqual(chart, b'\x89PNG Expenses')
+        self.assertEqual(renderer.stats()['renders'], 1)
+        self.assertGreater(renderer.stats()['last_render_seconds'], 0)
+        renderer.shutdown()
+
+    @patch('financetracker_bot.utils.chart_renderer.render_pie_chart', slow_render)
+    async def test_full_queue_is_rejected(self):
+        renderer = ChartRenderer(workers=1, max_queue=1, executor=ThreadPoolExecutor(1))
+        results = await asyncio.gather(*(renderer.render_pie(["Dining"], [10.0], "Expenses") for _ in range(3)),
+                                       return_exceptions=True)
+
+        self.assertIsInstance(results[2], ChartQueueFull)
+        self.assertEqual(renderer.stats()['rejected'], 1)
+        self.assertEqual(renderer.stats()['in_flight'], 0)
+        renderer.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
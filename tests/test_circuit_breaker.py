@@ -0,0 +1,58 @@
+import unittest
+from financetracker_bot.utils.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, reset_timeout=10, clock=self.clock)
+
+    def test_opens_once_the_failure_rate_is_reached(self):
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 10)
+        self.assertEqual(self.breaker.stats(), {'open': 1, 'opened': 1, 'rejected': 1})
+
+    def test_too_few_calls_do_not_open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_one_trial_call_per_reset_timeout(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        self.clock.now = 10
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.clock.now = 19
+        self.assertTrue(self.breaker.is_open)
+
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+
+if __name__ == '__main__':
+    unittest.main()
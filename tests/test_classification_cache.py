@@ -0,0 +1,72 @@
+import unittest
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.finance_model import ClassificationCacheEntry, session
+from financetracker_bot.utils.classification_cache import ClassificationCache, normalize_description
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestClassificationCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ClassificationCache(max_size=2, ttl=60, clock=self.clock)
+
+    def tearDown(self):
+        session.query(ClassificationCacheEntry).delete()
+        session.commit()
+
+    def test_normalize_description(self):
+        self.assertEqual(normalize_description("  Coffee   TO go! "), "coffee to go")
+
+    async def test_put_and_get(self):
+        async with async_session_factory() as db:
+            self.assertIsNone(await self.cache.get(db, 1, "Taxi"))
+            await self.cache.put(db, "Taxi", "Transportation")
+            await db.commit()
+
+            self.assertEqual(await self.cache.get(db, 1, "taxi"), "Transportation")
+            self.assertEqual(await self.cache.get(db, 2, "TAXI."), "Transportation")
+
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    async def test_entries_survive_restart(self):
+        async with async_session_factory() as db:
+            await self.cache.put(db, "Rent", "Rent")
+            await db.commit()
+
+        restarted = ClassificationCache()
+        async with async_session_factory() as db:
+            self.assertEqual(await restarted.get(db, 1, "rent"), "Rent")
+
+    async def test_user_override_takes_precedence(self):
+        async with async_session_factory() as db:
+            await self.cache.put(db, "Coffee", "Groceries")
+            await self.cache.put(db, "Coffee", "Dining", uid=1)
+            await db.commit()
+
+            self.assertEqual(await self.cache.get(db, 1, "coffee"), "Dining")
+            self.assertEqual(await self.cache.get(db, 2, "coffee"), "Groceries")
+
+    async def test_lru_and_ttl_eviction(self):
+        async with async_session_factory() as db:
+            for description in ("a", "b", "c"):
+                await self.cache.put(db, description, "Other", uid=1)
+            self.assertEqual(self.cache.stats()['size'], 2)
+            self.assertIsNone(self.cache._get_memory((1, "a")))
+            self.assertEqual(self.cache._get_memory((1, "c")), "Other")
+
+            self.clock.now = 61
+            self.assertIsNone(self.cache._get_memory((1, "c")))
+
+
+if __name__ == '__main__':
+    unittest.main()
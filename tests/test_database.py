@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import text
+from financetracker_bot.models.database import engine_options, make_async_engine, make_engine
+
+
+class TestEngineProfiles(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.url = 'sqlite:///' + os.path.join(self.directory.name, 'profile.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_tuned_sqlite_connection(self):
+        engine = make_engine(self.url, 'tuned')
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+            self.assertEqual(connection.execute(text('PRAGMA synchronous')).scalar(), 1)
+            self.assertEqual(connection.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+        engine.dispose()
+
+    def test_default_sqlite_connection(self):
+        engine = make_engine(self.url, 'default')
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text('PRAGMA journal_mode')).scalar(), 'delete')
+        engine.dispose()
+
+    async def test_tuned_async_connection(self):
+        engine = make_async_engine(self.url, 'tuned')
+        async with engine.connect() as connection:
+            self.assertEqual((await connection.execute(text('PRAGMA journal_mode'))).scalar(), 'wal')
+        await engine.dispose()
+
+    def test_server_pool_options(self):
+        options = engine_options('postgresql://localhost/finance', 'tuned')
+        self.assertEqual(options['pool_size'], 5)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(engine_options('postgresql://localhost/finance', 'default'), {})
+        with self.assertRaises(ValueError):
+            engine_options(self.url, 'fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
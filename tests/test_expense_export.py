@@ -0,0 +1,80 @@
+import csv
+import datetime
+import gzip
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+import pyarrow.parquet as pq
+from telegram import Update, User as TelegramUser, Message, Chat
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers.expense_handler import export_expenses as export_command
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.expense_export import export_expenses
+from financetracker_bot.models.finance_model import Expense, User, session
+
+
+class TestExpenseExport(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.add_all([Expense(uid=123, name=f"Item {i}", category="Dining", amount=i,
+                                 date=datetime.datetime(2024, 5, 1 + i)) for i in range(5)])
+        session.add(Expense(uid=7, name="Rent", category="Rent", amount=100, date=datetime.datetime(2024, 5, 2)))
+        session.commit()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+        self.directory.cleanup()
+
+    async def test_export_csv_in_chunks(self):
+        path = os.path.join(self.directory.name, 'expenses.csv.gz')
+        async with async_session_factory() as db:
+            exported = await export_expenses(db, 123, path, 'csv', datetime.datetime(2024, 5, 2),
+                                             datetime.datetime(2024, 5, 5), chunk_size=2)
+
+        self.assertEqual(exported, 3)
+        with gzip.open(path, 'rt', newline='') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], ['id', 'date', 'amount', 'category', 'description'])
+        self.assertEqual([row[4] for row in rows[1:]], ["Item 1", "Item 2", "Item 3"])
+
+    async def test_export_parquet(self):
+        path = os.path.join(self.directory.name, 'expenses.parquet')
+        async with async_session_factory() as db:
+            exported = await export_expenses(db, 123, path, 'parquet', chunk_size=2)
+
+        self.assertEqual(exported, 5)
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.column('amount').to_pylist(), [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(table.column('date')[0].as_py(), datetime.datetime(2024, 5, 1))
+
+    @patch('telegram.Message.reply_document', new_callable=AsyncMock)
+    async def test_export_command(self, mock_reply_document):
+        update = Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                text="/export 2024-05-01 2024-05-02 parquet",
+            ),
+        )
+        context = CallbackContext.from_update(update, application=None)
+        context.args = ["2024-05-01", "2024-05-02", "parquet"]
+
+        await export_command(update, context)
+
+        mock_reply_document.assert_called_once()
+        self.assertEqual(mock_reply_document.call_args.kwargs['filename'], 'expenses.parquet')
+        self.assertEqual(mock_reply_document.call_args.kwargs['caption'], 'Exported 2 expenses')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
+import asyncio
 import unittest
 from unittest.mock import AsyncMock, patch
-from telegram import Update, User as TelegramUser, Message, Chat
+from telegram import Update, User as TelegramUser, Message, Chat, CallbackQuery
 from telegram.ext import CallbackContext
-from financetracker_bot.models.finance_model import Expense, User, Budget, session
-from financetracker_bot.handlers.expense_handler import add_expense, show_expenses, delete_expense
+from financetracker_bot.models.finance_model import Expense, User, Budget, CategoryTotal, ClassificationCacheEntry, ReclassificationEntry, session
+from financetracker_bot.handlers import expense_handler
+from financetracker_bot.handlers.expense_handler import add_expense, show_expenses, show_expenses_page, delete_expense, recategorize_expense
 import datetime
 
 class TestExpenseHandler(unittest.IsolatedAsyncioTestCase):
@@ -17,8 +19,12 @@ class TestExpenseHandler(unittest.IsolatedAsyncioTestCase):
         session.query(Expense).delete()
         session.query(User).delete()
         session.query(Budget).delete()
+        session.query(CategoryTotal).delete()
+        session.query(ClassificationCacheEntry).delete()
+        session.query(ReclassificationEntry).delete()
         session.commit()
         session.rollback()
+        expense_handler.classification_cache.clear()
 
     def create_update(self, text):
         return Update(
@@ -47,6 +53,68 @@ class TestExpenseHandler(unittest.IsolatedAsyncioTestCase):
 
         mock_reply_text.assert_called()
 
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    @patch('financetracker_bot.handlers.expense_handler.CLASSIFICATION_TIMEOUT', 0.01)
+    async def test_add_expense_classification_timeout(self, mock_reply_text):
+        async def slow_classification(description):
+            await asyncio.sleep(0.1)
+            return "Dining"
+
+        update = self.create_update("/add 100 Team outing")
+        context = CallbackContext.from_update(update, application=None)
+        context.args = ["100", "Team", "outing"]
+        worker = expense_handler.reclassification_worker
+        bot = AsyncMock()
+        inflight_at_commit = []
+
+        with patch.object(expense_handler.openai_client, 'aclassify_expense', side_effect=slow_classification), \
+                patch.object(worker, 'bot', bot), \
+                patch.object(expense_handler.chart_cache, 'bump_version',
+                             side_effect=lambda uid: inflight_at_commit.extend(worker._inflight)):  # pylint: disable=protected-access
+            await add_expense(update, context)
+
+            expense = session.query(Expense).filter_by(uid=123).first()
+            self.assertEqual(expense.category, "Other")
+            # The worker polling right after the commit awaits the running classification.
+            self.assertEqual(inflight_at_commit, [expense.eid])
+            self.assertEqual(session.query(ReclassificationEntry).filter_by(eid=expense.eid).count(), 1)
+
+            self.assertEqual(await worker.run_once(), 1)
+
+        session.expire_all()
+        expense = session.query(Expense).filter_by(uid=123).first()
+        self.assertEqual(expense.category, "Dining")
+        self.assertIsNotNone(session.query(Budget).filter_by(uid=123, category="Dining").first())
+        self.assertEqual(session.query(ReclassificationEntry).count(), 0)
+        bot.send_message.assert_called_with(123, f"Expense with ID {expense.eid} moved to category *Dining*",
+                                            parse_mode='Markdown', reply_to_message_id=1)
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_add_expense_fails_fast_while_breaker_is_open(self, mock_reply_text):
+        update = self.create_update("/add 100 Team outing")
+        context = CallbackContext.from_update(update, application=None)
+        context.args = ["100", "Team", "outing"]
+        classify = AsyncMock(return_value="Dining")
+
+        with patch.object(expense_handler.openai_client, 'aclassify_expense', classify), \
+                patch.object(expense_handler.openai_breaker, '_opened_at', float('inf')):
+            await add_expense(update, context)
+            classify.assert_not_called()
+            # Nothing is asked while the model is unavailable.
+            self.assertEqual(await expense_handler.reclassification_worker.run_once(), 0)
+
+        expense = session.query(Expense).filter_by(uid=123).first()
+        self.assertEqual(expense.category, "Other")
+        self.assertEqual(session.query(ReclassificationEntry).filter_by(eid=expense.eid).count(), 1)
+
+        with patch.object(expense_handler.openai_client, 'aclassify_expense', classify):
+            self.assertEqual(await expense_handler.reclassification_worker.run_once(), 1)
+
+        session.expire_all()
+        self.assertEqual(session.query(Expense).filter_by(uid=123).first().category, "Dining")
+        self.assertEqual(session.query(CategoryTotal).filter_by(uid=123, category="Dining").first().total, 100.0)
+        self.assertEqual(session.query(CategoryTotal).filter_by(uid=123, category="Other").first().total, 0.0)
+
     @patch('telegram.Message.reply_text', new_callable=AsyncMock)
     async def test_show_expenses(self, mock_reply_text):
         cur_date = datetime.datetime.now()
@@ -68,6 +136,35 @@ class TestExpenseHandler(unittest.IsolatedAsyncioTestCase):
 
         mock_reply_text.assert_called_with(f'Your expenses:\n{expected_message}', parse_mode='Markdown')
 
+    @patch('telegram.CallbackQuery.answer', new_callable=AsyncMock)
+    @patch('telegram.CallbackQuery.edit_message_text', new_callable=AsyncMock)
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    @patch('financetracker_bot.handlers.expense_handler.SHOW_PAGE_SIZE', 2)
+    async def test_show_expenses_pages(self, mock_reply_text, mock_edit_message_text, mock_answer):
+        cur_date = datetime.datetime.now()
+        expenses = [Expense(uid=123, category="Dining", amount=i, date=cur_date) for i in range(3)]
+        session.add_all(expenses)
+        session.commit()
+
+        update = self.create_update("/show_expenses")
+        await show_expenses(update, CallbackContext.from_update(update, application=None))
+
+        keyboard = mock_reply_text.call_args.kwargs['reply_markup']
+        self.assertIn(f"ID: *{expenses[2].eid}*", mock_reply_text.call_args.args[0])
+        self.assertNotIn(f"ID: *{expenses[0].eid}*", mock_reply_text.call_args.args[0])
+        (older,), = keyboard.inline_keyboard
+
+        query = CallbackQuery(id="1", from_user=update.effective_user, chat_instance="1", data=older.callback_data)
+        update = Update(update_id=2, callback_query=query)
+        await show_expenses_page(update, CallbackContext.from_update(update, application=None))
+
+        mock_answer.assert_called_once()
+        text = mock_edit_message_text.call_args.args[0]
+        self.assertIn(f"ID: *{expenses[0].eid}*", text)
+        self.assertNotIn(f"ID: *{expenses[1].eid}*", text)
+        (newer,), = mock_edit_message_text.call_args.kwargs['reply_markup'].inline_keyboard
+        self.assertEqual(newer.text, "Newer »")
+
     @patch('telegram.Message.reply_text', new_callable=AsyncMock)
     async def test_delete_expense(self, mock_reply_text):
         cur_date = datetime.datetime.now()
@@ -85,6 +182,63 @@ class TestExpenseHandler(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(deleted_expense)
         mock_reply_text.assert_called_with("Expense with ID 1 successfully deleted!")
 
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_recategorize_expense(self, mock_reply_text):
+        expense = Expense(uid=123, name="Coffee", category="Other", amount=3, date=datetime.datetime.now())
+        session.add(expense)
+        session.commit()
+
+        update = self.create_update(f"/category {expense.eid} Dining")
+        context = CallbackContext.from_update(update, application=None)
+        context.args = [str(expense.eid), "Dining"]
+
+        await recategorize_expense(update, context)
+
+        session.expire_all()
+        self.assertEqual(session.get(Expense, expense.eid).category, "Dining")
+        self.assertEqual(session.get(ClassificationCacheEntry, ("coffee", 123)).category, "Dining")
+        mock_reply_text.assert_called_with(f"Expense with ID {expense.eid} moved to category *Dining*", parse_mode='Markdown')
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_recategorize_expense_validates_category(self, mock_reply_text):
+        expense = Expense(uid=123, name="Coffee", category="Other", amount=3, date=datetime.datetime.now())
+        session.add(expense)
+        session.commit()
+
+        update = self.create_update(f"/category {expense.eid} Dinning")
+        context = CallbackContext.from_update(update, application=None)
+        context.args = [str(expense.eid), "Dinning"]
+        await recategorize_expense(update, context)
+
+        session.expire_all()
+        self.assertEqual(session.get(Expense, expense.eid).category, "Other")
+        self.assertIsNone(session.get(ClassificationCacheEntry, ("coffee", 123)))
+        self.assertIsNone(session.query(Budget).filter_by(uid=123, category="Dinning").first())
+        self.assertIn("Groceries, Rent", mock_reply_text.call_args.args[0])
+
+        context.args = [str(expense.eid), "dining"]
+        await recategorize_expense(update, context)
+
+        session.expire_all()
+        self.assertEqual(session.get(Expense, expense.eid).category, "Dining")
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_add_expense_uses_cached_category(self, mock_reply_text):
+        session.add(ClassificationCacheEntry(description="coffee", uid=123, category="Dining"))
+        session.commit()
+
+        update = self.create_update("/add 3 Coffee")
+        context = CallbackContext.from_update(update, application=None)
+        context.args = ["3", "Coffee"]
+
+        with patch.object(expense_handler.openai_client, 'aclassify_expense', new_callable=AsyncMock) as mock_classify:
+            await add_expense(update, context)
+
+        mock_classify.assert_not_called()
+        expense = session.query(Expense).filter_by(uid=123).first()
+        self.assertEqual(expense.category, "Dining")
+        self.assertEqual(expense.name, "Coffee")
+
 
 if __name__ == 'main':
     unittest.main()
\ No newline at end of file
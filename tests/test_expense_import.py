@@ -0,0 +1,167 @@
+import datetime
+import io
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from telegram import Update, User as TelegramUser, Message, Chat, Document
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers import expense_handler
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.expense_import import import_expenses, read_expenses
+from financetracker_bot.models.finance_model import (Budget, CategoryTotal, ClassificationCacheEntry, Expense,
+                                                   ReclassificationEntry, User, session)
+from financetracker_bot.utils.openai_util import ClassificationUnavailable
+
+CSV = (
+    "Дата;Сумма;Описание\n"
+    "01.05.2024 12:30;-1 250,50;Supermarket\n"
+    "2024-05-02;-300;Team outing\n"
+    "not a date;-10;Broken\n"
+    "\n"
+    "2024-05-03 09:00:00;-40;Supermarket\n"
+)
+
+
+class TestReadExpenses(unittest.TestCase):
+
+    def test_read_statement(self):
+        rows = list(read_expenses(io.StringIO(CSV)))
+
+        self.assertEqual(rows[0], {'date': datetime.datetime(2024, 5, 1, 12, 30), 'amount': 1250.5,
+                                   'name': 'Supermarket', 'category': None})
+        self.assertEqual(rows[1]['date'], datetime.datetime(2024, 5, 2))
+        self.assertIsNone(rows[2])
+        self.assertEqual(len(rows), 4)
+
+    def test_category_column(self):
+        rows = list(read_expenses(io.StringIO(
+            "date,amount,description,category\n"
+            "2024-05-02,3,Coffee,dining\n"
+            "2024-05-02,4,Tea,Restaurants & Cafes\n"
+        ), categories=["Groceries", "Dining"]))
+        self.assertEqual([row['category'] for row in rows], ['Dining', None])
+
+    def test_credits_of_signed_statements_are_skipped(self):
+        rows = list(read_expenses(io.StringIO(
+            "date,amount,description\n"
+            "2024-05-02,500,Refund\n"
+            "2024-05-03,-3,Coffee\n"
+        )))
+        self.assertEqual([(row['name'], row['amount']) for row in rows], [('Coffee', 3.0)])
+        rows = list(read_expenses(io.StringIO("date,amount,description\n2024-05-02,500,Rent\n")))
+        self.assertEqual(rows[0]['amount'], 500.0)
+
+    def test_missing_column(self):
+        with self.assertRaises(ValueError):
+            list(read_expenses(io.StringIO("date,amount\n2024-05-02,3\n")))
+
+
+class TestImportExpenses(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.commit()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.query(Budget).delete()
+        session.query(CategoryTotal).delete()
+        session.query(ClassificationCacheEntry).delete()
+        session.query(ReclassificationEntry).delete()
+        session.commit()
+        expense_handler.classification_cache.clear()
+
+    async def test_import_in_chunks(self):
+        classify = AsyncMock(side_effect=lambda descriptions: ["Groceries"] * len(descriptions))
+        progress = AsyncMock()
+
+        async with async_session_factory() as db:
+            result = await import_expenses(db, 123, read_expenses(io.StringIO(CSV)), classify,
+                                           chunk_size=2, progress=progress)
+
+        self.assertEqual((result.imported, result.skipped, result.categories), (3, 1, {"Groceries"}))
+        self.assertEqual(classify.await_count, 2)
+        progress.assert_awaited_with(3, 1)
+        total = session.query(CategoryTotal).filter_by(uid=123, category="Groceries").one()
+        self.assertEqual((total.total, total.count), (1590.5, 3))
+
+    async def test_failed_import_keeps_budgets_and_totals_of_committed_chunks(self):
+        classify = AsyncMock(side_effect=[["Groceries", "Transportation"], RuntimeError("model down")])
+
+        async with async_session_factory() as db:
+            with self.assertRaises(RuntimeError):
+                await import_expenses(db, 123, read_expenses(io.StringIO(CSV)), classify, chunk_size=2,
+                                      ensure_budget=expense_handler._ensure_budget)  # pylint: disable=protected-access
+
+        budgets = {budget.category for budget in session.query(Budget).filter_by(uid=123)}
+        self.assertEqual(budgets, {"Groceries", "Transportation"})
+        totals = {total.category: total.total for total in session.query(CategoryTotal).filter_by(uid=123)}
+        self.assertEqual(totals, {"Groceries": 1250.5, "Transportation": 300.0})
+
+    async def run_import_command(self, mock_reply_text, content):
+        mock_reply_text.return_value = MagicMock(edit_text=AsyncMock())
+
+        async def download_to_drive(path):
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content)
+
+        bot = MagicMock()
+        bot.get_file = AsyncMock(return_value=MagicMock(download_to_drive=download_to_drive))
+        update = Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                document=Document(file_id="file", file_unique_id="file", file_name="expenses.csv"),
+                caption="/import",
+            ),
+        )
+        application = MagicMock()
+        application.bot = bot
+        context = CallbackContext(application, chat_id=123, user_id=123)
+        await expense_handler.import_expenses(update, context)
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_import_command(self, mock_reply_text):
+        session.add(ClassificationCacheEntry(description="supermarket", uid=0, category="Groceries",
+                                             updated_at=datetime.datetime.now()))
+        session.commit()
+
+        with patch.object(expense_handler.openai_client, 'aclassify_expenses', new_callable=AsyncMock,
+                          return_value=["Transportation"]) as mock_classify:
+            await self.run_import_command(mock_reply_text, CSV)
+
+        mock_classify.assert_awaited_once_with(["Team outing"])
+        mock_reply_text.return_value.edit_text.assert_called_with("Imported 3 expenses, skipped 1 invalid rows.")
+        self.assertEqual(session.query(Expense).filter_by(uid=123, category="Groceries").count(), 2)
+        self.assertIsNotNone(session.query(Budget).filter_by(uid=123, category="Transportation").first())
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_import_command_failure_hides_details(self, mock_reply_text):
+        with self.assertLogs('financetracker_bot.handlers.expense_handler', 'ERROR'):
+            await self.run_import_command(mock_reply_text, "date,amount\n2024-05-02,3\n")
+
+        mock_reply_text.return_value.edit_text.assert_called_with(
+            "The import failed. 0 expenses were imported before the error.")
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_import_command_queues_unavailable_classifications(self, mock_reply_text):
+        with patch.object(expense_handler.openai_client, 'aclassify_expenses', new_callable=AsyncMock,
+                          side_effect=ClassificationUnavailable("open")), \
+                patch.object(expense_handler.local_classifier, 'classify', return_value=None):
+            await self.run_import_command(mock_reply_text, CSV)
+
+        mock_reply_text.return_value.edit_text.assert_called_with(
+            "Imported 3 expenses, skipped 1 invalid rows.\n"
+            "3 expenses are saved as 'Other' until the classification model is available again.")
+        expenses = session.query(Expense).filter_by(uid=123).all()
+        self.assertEqual({expense.category for expense in expenses}, {"Other"})
+        entries = session.query(ReclassificationEntry).filter_by(uid=123).all()
+        self.assertEqual({entry.eid for entry in entries}, {expense.eid for expense in expenses})
+        self.assertEqual(session.query(ClassificationCacheEntry).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
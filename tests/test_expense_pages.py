@@ -0,0 +1,56 @@
+import datetime
+import unittest
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.expense_pages import NEWER, OLDER, decode_cursor, encode_cursor, get_expense_page
+from financetracker_bot.models.finance_model import Expense, User, session
+
+
+class TestExpensePages(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=9, name="Test User"))
+        session.add(User(uid=10, name="Other User"))
+        start = datetime.datetime(2024, 1, 1, 12, 30, 0, 250)
+        # Pairs of expenses share a date, so the pages must break ties by ID.
+        session.add_all([Expense(uid=9, category="Dining", amount=i, date=start + datetime.timedelta(days=i // 2))
+                         for i in range(7)])
+        session.add(Expense(uid=10, category="Rent", amount=100, date=start))
+        session.commit()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+
+    async def test_pages_cover_history_in_order(self):
+        async with async_session_factory() as db:
+            page = await get_expense_page(db, 9, limit=3)
+            self.assertEqual([row.amount for row in page.rows], [4, 5, 6])
+            self.assertTrue(page.has_older)
+            self.assertFalse(page.has_newer)
+
+            page = await get_expense_page(db, 9, decode_cursor(encode_cursor(page.rows[0])), OLDER, limit=3)
+            self.assertEqual([row.amount for row in page.rows], [1, 2, 3])
+            self.assertTrue(page.has_older)
+            self.assertTrue(page.has_newer)
+
+            page = await get_expense_page(db, 9, decode_cursor(encode_cursor(page.rows[0])), OLDER, limit=3)
+            self.assertEqual([row.amount for row in page.rows], [0])
+            self.assertFalse(page.has_older)
+            self.assertTrue(page.has_newer)
+
+            page = await get_expense_page(db, 9, decode_cursor(encode_cursor(page.rows[-1])), NEWER, limit=3)
+            self.assertEqual([row.amount for row in page.rows], [1, 2, 3])
+            self.assertTrue(page.has_older)
+            self.assertTrue(page.has_newer)
+
+    async def test_empty_history(self):
+        async with async_session_factory() as db:
+            page = await get_expense_page(db, 11)
+        self.assertEqual(page.rows, [])
+        self.assertFalse(page.has_older)
+        self.assertFalse(page.has_newer)
+
+
+if __name__ == '__main__':
+    unittest.main()
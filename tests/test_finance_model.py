@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
-from financetracker_bot.models.finance_model import User, Expense, Budget, session
+from sqlalchemy import create_engine, inspect, text
+from financetracker_bot.models.finance_model import Base, User, Expense, Budget, session, upgrade_schema
 import datetime
 
 class TestFinanceModel(unittest.TestCase):
@@ -43,5 +46,33 @@ class TestFinanceModel(unittest.TestCase):
         self.assertEqual(stored_budget.category, "Dining")
         self.assertEqual(stored_budget.amount, 200.0)
 
+    def test_upgrade_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            old_engine = create_engine('sqlite:///' + os.path.join(directory, 'old.db'))
+            Base.metadata.create_all(old_engine)
+            with old_engine.begin() as connection:
+                for index in ('ix_expenses_uid_category', 'ix_expenses_uid_date', 'uq_budgets_uid_category'):
+                    connection.execute(text(f'DROP INDEX {index}'))
+                connection.execute(text("INSERT INTO budgets (uid, category, amount) VALUES (1, 'Dining', 100), (1, 'Dining', 200)"))
+                connection.execute(text('DROP TABLE category_totals'))
+                connection.execute(text('CREATE TABLE category_totals (uid INTEGER NOT NULL, category VARCHAR NOT NULL, '
+                                        'period VARCHAR NOT NULL, total FLOAT NOT NULL, count INTEGER NOT NULL, '
+                                        'PRIMARY KEY (uid, category, period))'))
+                connection.execute(text("INSERT INTO category_totals VALUES (1, 'Dining', 'all', 1, 1)"))
+                connection.execute(text("INSERT INTO expenses (uid, name, category, amount, date) "
+                                        "VALUES (1, 'Lunch', 'Dining', 15, '2024-05-01 12:00:00.000000')"))
+
+            upgrade_schema(old_engine)
+            upgrade_schema(old_engine)
+
+            inspector = inspect(old_engine)
+            self.assertEqual({index['name'] for index in inspector.get_indexes('expenses')},
+                             {'ix_expenses_uid_category', 'ix_expenses_uid_date'})
+            self.assertTrue(inspector.get_indexes('budgets')[0]['unique'])
+            with old_engine.connect() as connection:
+                self.assertEqual(connection.execute(text('SELECT amount FROM budgets')).scalars().all(), [200])
+                self.assertEqual(connection.execute(text('SELECT * FROM category_totals')).all(), [(1, 'Dining', 15.0, 1)])
+            old_engine.dispose()
+
 if __name__ == '__main__':
     unittest.main()
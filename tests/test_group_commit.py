@@ -0,0 +1,94 @@
+import asyncio
+import datetime
+import unittest
+from unittest.mock import AsyncMock, patch
+from telegram import Update, User as TelegramUser, Message, Chat
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers import expense_handler
+from financetracker_bot.handlers.expense_handler import add_expense
+from financetracker_bot.models.finance_model import Budget, CategoryTotal, Expense, User, session
+from financetracker_bot.models.group_commit import GroupCommitWriter
+
+
+class TestGroupCommitWriter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.commit()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(Budget).delete()
+        session.query(CategoryTotal).delete()
+        session.query(User).delete()
+        session.commit()
+
+    def create_update(self, text, update_id):
+        return Update(
+            update_id=update_id,
+            message=Message(
+                message_id=update_id,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                text=text,
+            ),
+        )
+
+    async def test_concurrent_writes_share_a_commit(self):
+        writer = GroupCommitWriter(window=0.05)
+
+        def expense(amount):
+            async def write(db):
+                db.add(Expense(uid=123, name="coffee", category="Dining", amount=amount, date=datetime.datetime.now()))
+                return amount
+            return write
+
+        results = await asyncio.gather(*(writer.submit(expense(amount)) for amount in range(1, 6)))
+
+        self.assertEqual(results, [1, 2, 3, 4, 5])
+        self.assertEqual(writer.stats()['batches'], 1)
+        self.assertEqual(writer.stats()['writes'], 5)
+        self.assertEqual(session.query(Expense).filter_by(uid=123).count(), 5)
+
+    async def test_failed_write_is_isolated(self):
+        writer = GroupCommitWriter(window=0.05)
+
+        async def good(db):
+            db.add(Expense(uid=123, name="coffee", category="Dining", amount=1.0, date=datetime.datetime.now()))
+
+        async def bad(db):
+            raise ValueError("invalid expense")
+
+        results = await asyncio.gather(writer.submit(good), writer.submit(bad), writer.submit(good),
+                                       return_exceptions=True)
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIsNone(results[2])
+        self.assertEqual(writer.stats()['retried'], 3)
+        self.assertEqual(session.query(Expense).filter_by(uid=123).count(), 2)
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_add_expense_with_write_buffer(self, mock_reply_text):
+        writer = GroupCommitWriter(window=0.05)
+        updates = [self.create_update(f"/add {amount} Lunch", amount) for amount in (10, 20, 30)]
+        contexts = []
+        for update in updates:
+            context = CallbackContext.from_update(update, application=None)
+            context.args = update.message.text.split()[1:]
+            contexts.append(context)
+
+        with patch.object(expense_handler, 'expense_writer', writer), \
+                patch.object(expense_handler.local_classifier, 'classify', return_value="Dining"):
+            await asyncio.gather(*(add_expense(update, context) for update, context in zip(updates, contexts)))
+
+        self.assertEqual(writer.stats()['batches'], 1)
+        self.assertEqual(sorted(expense.amount for expense in session.query(Expense).filter_by(uid=123)), [10, 20, 30])
+        self.assertEqual(session.query(CategoryTotal).filter_by(uid=123, category="Dining").one().total, 60)
+        self.assertEqual(session.query(Budget).filter_by(uid=123, category="Dining").count(), 1)
+        self.assertEqual(mock_reply_text.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from financetracker_bot.utils.local_classifier import KeywordTrie, LocalClassifier, tokenize, train
+
+
+class TestLocalClassifier(unittest.TestCase):
+
+    def test_keyword_trie_matches_prefixes(self):
+        trie = KeywordTrie()
+        self.assertEqual(trie.match("taxis"), ["Transportation"])
+        self.assertEqual(trie.match("bus"), ["Transportation"])
+        self.assertEqual(trie.match("business"), [])
+        self.assertEqual(trie.classify(tokenize("Pizza for lunch")), ("Dining", 1.0))
+
+    def test_classify_by_keywords(self):
+        classifier = LocalClassifier(threshold=0.8)
+        self.assertEqual(classifier.classify(1, "Taxi to the airport"), "Transportation")
+        self.assertIsNone(classifier.classify(1, "Gift for mom"))
+        self.assertEqual(classifier.stats()['fallback_rate'], 0.5)
+
+    def test_short_prefixes_do_not_classify_on_their_own(self):
+        classifier = LocalClassifier(threshold=0.8)
+        for description in ["booking.com hotel", "rental car deposit", "rentgen"]:
+            self.assertLess(classifier.predict(1, description)[1], 0.8)
+            self.assertIsNone(classifier.classify(1, description))
+        self.assertEqual(classifier.classify(1, "аптека"), "Health")
+        self.assertEqual(classifier.classify(1, "vegetables"), "Groceries")
+
+    def test_classify_by_user_history(self):
+        classifier = LocalClassifier(threshold=0.8)
+        for _ in range(5):
+            classifier.learn(1, "Gift for mom", "Gifts")
+        classifier.learn(1, "Tennis club", "Sport")
+
+        self.assertEqual(classifier.classify(1, "gift"), "Gifts")
+        self.assertIsNone(classifier.classify(2, "gift"))
+
+    def test_history_needs_categories_and_coverage(self):
+        classifier = LocalClassifier(threshold=0.8)
+        for _ in range(5):
+            classifier.learn(1, "Team outing", "Leisure")
+        self.assertIsNone(classifier.classify(1, "outing"))
+
+        for _ in range(5):
+            classifier.learn(1, "Birthday gift", "Other")
+            classifier.learn(1, "Gift for mom", "Gifts")
+        self.assertNotIn("Other", classifier.models[1].docs)
+        self.assertEqual(classifier.classify(1, "gift"), "Gifts")
+        self.assertEqual(classifier.classify(1, "outing"), "Leisure")
+        self.assertIsNone(classifier.classify(1, "outing airport transfer"))
+
+    def test_user_models_are_bounded(self):
+        classifier = LocalClassifier(max_users=2)
+        for uid in (1, 2):
+            classifier.learn(uid, "Gift for mom", "Gifts")
+        classifier.predict(1, "gift")
+        classifier.learn(3, "Gift for mom", "Gifts")
+        self.assertEqual(list(classifier.models), [1, 3])
+
+    def test_train_skips_other(self):
+        rows = [(1, "Birthday gift", "Other"), (1, "Yoga class", "Sport"), (1, "Flowers for mom", "Gifts")] * 10
+        classifier, report = train(rows, threshold=0.8)
+
+        self.assertEqual(report['samples'], 20)
+        self.assertIsNone(classifier.classify(1, "birthday gift"))
+
+    def test_train_and_load(self):
+        rows = [(1, "Yoga class", "Sport"), (1, "Flowers for mom", "Gifts")] * 10
+        classifier, report = train(rows, threshold=0.8)
+        self.assertEqual(report['samples'], 20)
+        self.assertEqual(report['accuracy'], 1.0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.json')
+            classifier.save(path)
+            loaded = LocalClassifier.load(path)
+
+        self.assertEqual(loaded.classify(1, "yoga"), "Sport")
+        self.assertEqual(loaded.stats()['accuracy'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
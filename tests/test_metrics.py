@@ -0,0 +1,100 @@
+import asyncio
+import datetime
+import socket
+import unittest
+from unittest.mock import AsyncMock, patch
+import httpx
+from telegram import Update, User as TelegramUser, Message, Chat
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers.budget_handler import show_budgets
+from financetracker_bot.models.database import async_engine
+from financetracker_bot.models.finance_model import Budget, User, session
+from financetracker_bot.utils import metrics
+
+
+def sample(name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.add(Budget(uid=123, category="Dining", amount=100.0))
+        session.commit()
+        metrics.instrument_engine(async_engine.sync_engine)
+
+    def tearDown(self):
+        session.query(Budget).delete()
+        session.query(User).delete()
+        session.commit()
+
+    def create_update(self, text):
+        return Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                text=text,
+            ),
+        )
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_handler_latency_and_queries(self, mock_reply_text):
+        handler = metrics.instrument(show_budgets, '/show_budgets')
+        update = self.create_update("/show_budgets")
+        calls = sample('bot_handler_seconds_count', handler='/show_budgets')
+        before = sample('bot_db_queries_per_update_sum', handler='/show_budgets')
+
+        await handler(update, CallbackContext.from_update(update, application=None))
+
+        self.assertEqual(sample('bot_handler_seconds_count', handler='/show_budgets') - calls, 1)
+        self.assertGreaterEqual(sample('bot_db_queries_per_update_sum', handler='/show_budgets') - before, 1)
+        mock_reply_text.assert_called()
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_logged_and_raised_errors(self, mock_reply_text):
+        mock_reply_text.side_effect = [KeyError('first reply'), None]
+        metrics.logging.getLogger('financetracker_bot').addHandler(metrics._error_counter)
+        handler = metrics.instrument(show_budgets, '/failing')
+        update = self.create_update("/show_budgets")
+
+        await handler(update, CallbackContext.from_update(update, application=None))
+        self.assertEqual(sample('bot_handler_errors_total', handler='/failing', exception='KeyError'), 1)
+
+        async def broken(update, context):
+            raise ValueError('broken')
+
+        with self.assertRaises(ValueError):
+            await metrics.instrument(broken, '/broken')(update, None)
+        self.assertEqual(sample('bot_handler_errors_total', handler='/broken', exception='ValueError'), 1)
+
+    async def test_openai_outcomes(self):
+        with metrics.track_openai('test'):
+            pass
+        with self.assertRaises(asyncio.TimeoutError):
+            with metrics.track_openai('test'):
+                raise asyncio.TimeoutError()
+
+        self.assertEqual(sample('bot_openai_request_seconds_count', operation='test', outcome='ok'), 1)
+        self.assertEqual(sample('bot_openai_request_seconds_count', operation='test', outcome='TimeoutError'), 1)
+
+    async def test_metrics_endpoint(self):
+        metrics.register_stats('test_component', lambda: {'size': 3, 'name': 'ignored'})
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        metrics.start_metrics_server(port)
+
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f'http://127.0.0.1:{port}/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('bot_test_component_size 3.0', response.text)
+        self.assertIn('bot_handler_seconds_bucket', response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
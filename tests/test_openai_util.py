@@ -1,10 +1,11 @@
 import unittest
-from unittest.mock import patch, MagicMock
-from financetracker_bot.utils.openai_util import OpenAI
+from unittest.mock import patch, MagicMock, AsyncMock
+from financetracker_bot.utils.circuit_breaker import CircuitBreaker
+from financetracker_bot.utils.openai_util import ClassificationUnavailable, OpenAI
 
 class TestClassifyExpense(unittest.TestCase):
 
-    @patch('financetracker_bot.utils.openai_util.OriginalOpenAI')
+    @patch('openai.OpenAI')
     def test_classify_expense_groceries(self, MockOpenAI):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(text='Groceries')]
@@ -15,7 +16,7 @@ class TestClassifyExpense(unittest.TestCase):
         result = openai.classify_expense(description)
         self.assertEqual(result, "Groceries")
 
-    @patch('financetracker_bot.utils.openai_util.OriginalOpenAI')
+    @patch('openai.OpenAI')
     def test_classify_expense_other(self, MockOpenAI):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(text='Something')]
@@ -26,5 +27,45 @@ class TestClassifyExpense(unittest.TestCase):
         result = openai.classify_expense(description)
         self.assertEqual(result, "Other")
 
+
+class TestAsyncClassifyExpense(unittest.IsolatedAsyncioTestCase):
+
+    @patch('openai.AsyncOpenAI')
+    @patch('openai.OpenAI')
+    async def test_aclassify_expense_dining(self, MockOpenAI, MockAsyncOpenAI):
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock(text=' Dining\n')]
+        MockAsyncOpenAI.return_value.completions.create = AsyncMock(return_value=mock_response)
+
+        openai = OpenAI()
+        result = await openai.aclassify_expense("Lunch with colleagues")
+        self.assertEqual(result, "Dining")
+
+    @patch('openai.AsyncOpenAI')
+    @patch('openai.OpenAI')
+    async def test_aclassify_expense_error(self, MockOpenAI, MockAsyncOpenAI):
+        MockAsyncOpenAI.return_value.completions.create = AsyncMock(side_effect=TimeoutError())
+
+        openai = OpenAI()
+        result = await openai.aclassify_expense("Lunch with colleagues")
+        self.assertEqual(result, "Other")
+
+    @patch('openai.AsyncOpenAI')
+    @patch('openai.OpenAI')
+    async def test_guarded_client_reports_outages(self, MockOpenAI, MockAsyncOpenAI):
+        create = AsyncMock(side_effect=TimeoutError())
+        MockAsyncOpenAI.return_value.completions.create = create
+        breaker = CircuitBreaker(min_calls=2)
+
+        openai = OpenAI(breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(ClassificationUnavailable):
+                await openai.aclassify_expense("Lunch with colleagues")
+        self.assertTrue(breaker.is_open)
+
+        with self.assertRaises(ClassificationUnavailable):
+            await openai.aclassify_expenses(["Lunch", "Taxi"])
+        self.assertEqual(create.await_count, 2)
+
 if __name__ == 'main':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import datetime
+import unittest
+from unittest.mock import AsyncMock, patch
+from telegram import Update, User as TelegramUser, Message, Chat
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers.budget_handler import show_budgets
+from financetracker_bot.models.database import async_engine
+from financetracker_bot.models.finance_model import Budget, User, session
+from financetracker_bot.utils.metrics import instrument
+from financetracker_bot.utils.query_profiler import QueryProfiler
+
+
+class TestQueryProfiler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.add(Budget(uid=123, category="Dining", amount=100.0))
+        session.commit()
+        self.profiler = QueryProfiler(threshold=0)
+        self.profiler.attach(async_engine.sync_engine)
+        self.profiler.attach(async_engine.sync_engine)
+
+    def tearDown(self):
+        self.profiler.disable()
+        self.profiler.detach(async_engine.sync_engine)
+        session.query(Budget).delete()
+        session.query(User).delete()
+        session.commit()
+
+    def create_update(self, text):
+        return Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                text=text,
+            ),
+        )
+
+    async def run_show_budgets(self):
+        update = self.create_update("/show_budgets")
+        await instrument(show_budgets, '/show_budgets')(update, CallbackContext.from_update(update, application=None))
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_query_count_does_not_grow_with_budgets(self, mock_reply_text):
+        with self.profiler.capture() as one_budget:
+            await self.run_show_budgets()
+        for category in ("Rent", "Health", "Clothing"):
+            session.add(Budget(uid=123, category=category, amount=100.0))
+        session.commit()
+        with self.profiler.capture() as four_budgets:
+            await self.run_show_budgets()
+
+        self.assertGreaterEqual(one_budget.count, 1)
+        self.assertEqual(four_budgets.count, one_budget.count)
+        self.assertEqual(mock_reply_text.call_count, 2)
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_attribution_and_runtime_switch(self, mock_reply_text):
+        await self.run_show_budgets()
+        self.assertEqual(self.profiler.stats(), {})
+
+        self.assertTrue(self.profiler.toggle())
+        with self.assertLogs('financetracker_bot.utils.query_profiler', level='WARNING') as logs:
+            await self.run_show_budgets()
+
+        stats = self.profiler.stats()['/show_budgets']
+        self.assertGreaterEqual(stats['queries'], 1)
+        self.assertEqual(stats['slow'], stats['queries'])
+        self.assertEqual(len(logs.output), stats['queries'])
+        self.assertIn('Slow query in /show_budgets', logs.output[0])
+        self.assertRegex(logs.output[0], r'parameters: \(.*123\)')
+        self.assertRegex(logs.output[0], r'plan: .*(SCAN|SEARCH)')
+
+        self.profiler.disable()
+        self.profiler.reset()
+        await self.run_show_budgets()
+        self.assertEqual(self.profiler.stats(), {})
+        mock_reply_text.assert_called()
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_detach(self, mock_reply_text):
+        self.profiler.detach(async_engine.sync_engine)
+        with self.profiler.capture() as capture:
+            await self.run_show_budgets()
+
+        self.assertEqual(capture.count, 0)
+        mock_reply_text.assert_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import unittest
+from unittest.mock import AsyncMock
+from financetracker_bot.models.database import get_session_factory
+from financetracker_bot.models.finance_model import Expense, ReclassificationEntry, User, session
+from financetracker_bot.utils.circuit_breaker import CircuitBreaker
+from financetracker_bot.utils.reclassification_worker import ReclassificationWorker, enqueue
+
+
+async def move(db, expense, category):
+    expense.category = category
+
+
+class TestReclassificationWorker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=123, name="Test User"))
+        session.commit()
+
+    def tearDown(self):
+        session.query(ReclassificationEntry).delete()
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+
+    async def add_queued_expense(self, name="Team outing"):
+        async with get_session_factory()() as db:
+            expense = Expense(uid=123, name=name, category="Other", amount=10.0, date=datetime.datetime.now())
+            db.add(expense)
+            await enqueue(db, expense, chat_id=123, message_id=7)
+            await db.commit()
+            return expense.eid
+
+    async def test_failed_classification_is_retried_with_backoff(self):
+        eid = await self.add_queued_expense()
+        classify = AsyncMock(side_effect=[RuntimeError("rate limited"), RuntimeError("rate limited"), "Dining"])
+        on_moved = AsyncMock()
+        worker = ReclassificationWorker(classify, move, on_moved, retry_delay=10, max_delay=15)
+
+        self.assertEqual(await worker.run_once(), 1)
+        entry = session.get(ReclassificationEntry, eid)
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.next_attempt, datetime.datetime.now() + datetime.timedelta(seconds=9))
+        # Not due yet.
+        self.assertEqual(await worker.run_once(), 0)
+
+        for attempts, delay in ((1, 15), (2, None)):
+            session.query(ReclassificationEntry).update({'next_attempt': datetime.datetime.now()})
+            session.commit()
+            self.assertEqual(await worker.run_once(), 1)
+            session.expire_all()
+            entry = session.get(ReclassificationEntry, eid)
+            if delay is not None:
+                self.assertEqual(entry.attempts, attempts + 1)
+                self.assertLess(entry.next_attempt, datetime.datetime.now() + datetime.timedelta(seconds=delay + 1))
+
+        self.assertIsNone(entry)
+        self.assertEqual(session.get(Expense, eid).category, "Dining")
+        self.assertEqual(on_moved.await_args.args[2], "Dining")
+        self.assertEqual(worker.stats(), {'processed': 1, 'moved': 1, 'failed': 2, 'inflight': 0})
+
+    async def test_open_breaker_only_lets_running_classifications_through(self):
+        waiting = await self.add_queued_expense("Taxi")
+        running = await self.add_queued_expense("Pizza")
+        breaker = CircuitBreaker(min_calls=1)
+        breaker.record_failure()
+        classify = AsyncMock(return_value="Transportation")
+        worker = ReclassificationWorker(classify, move, breaker=breaker)
+        classification = asyncio.get_running_loop().create_future()
+        classification.set_result("Dining")
+        worker.submit(running, classification)
+
+        self.assertEqual(await worker.run_once(), 1)
+        classify.assert_not_called()
+        session.expire_all()
+        self.assertEqual(session.get(Expense, running).category, "Dining")
+        self.assertEqual(session.get(Expense, waiting).category, "Other")
+        self.assertIsNotNone(session.get(ReclassificationEntry, waiting))
+
+    async def test_drain_applies_finished_classifications_and_keeps_the_rest(self):
+        fast_eid = await self.add_queued_expense("Pizza")
+        slow_eid = await self.add_queued_expense("Taxi")
+        worker = ReclassificationWorker(AsyncMock(return_value="Other"), move)
+        fast = asyncio.ensure_future(asyncio.sleep(0, result="Dining"))
+        slow = asyncio.ensure_future(asyncio.sleep(10, result="Transportation"))
+        worker.submit(fast_eid, fast)
+        worker.submit(slow_eid, slow)
+        try:
+            self.assertEqual(await worker.drain(0.05), 1)
+        finally:
+            slow.cancel()
+
+        session.expire_all()
+        self.assertEqual(session.get(Expense, fast_eid).category, "Dining")
+        self.assertIsNone(session.get(ReclassificationEntry, fast_eid))
+        self.assertIsNotNone(session.get(ReclassificationEntry, slow_eid))
+
+    async def test_deleted_expense_is_dropped(self):
+        eid = await self.add_queued_expense()
+        session.query(Expense).filter_by(eid=eid).delete()
+        session.commit()
+        classify = AsyncMock()
+        worker = ReclassificationWorker(classify, move)
+
+        self.assertEqual(await worker.run_once(), 1)
+        classify.assert_not_called()
+        self.assertIsNone(session.get(ReclassificationEntry, eid))
+
+
+if __name__ == '__main__':
+    unittest.main()
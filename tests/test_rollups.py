@@ -0,0 +1,118 @@
+import datetime
+import random
+import unittest
+from financetracker_bot.models import rollups
+from financetracker_bot.models.analysis import get_category_summary, get_raw_category_summary
+from financetracker_bot.models.database import async_session_factory
+from financetracker_bot.models.finance_model import Expense, ExpenseRollup, User, engine, session
+from financetracker_bot.models.rollups import DAY, MONTH, RAW, Segment
+
+
+class TestRollups(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        session.add(User(uid=11, name="Test User"))
+        rng = random.Random(11)
+        first = datetime.datetime(2021, 1, 1)
+        session.add_all([
+            Expense(uid=11, name="test", category=rng.choice(["Dining", "Rent", "Health"]),
+                    amount=round(rng.uniform(1, 100), 2),
+                    date=first + datetime.timedelta(seconds=rng.randint(0, 3 * 365 * 24 * 3600)))
+            for _ in range(300)
+        ])
+        session.commit()
+
+    def tearDown(self):
+        session.query(Expense).delete()
+        session.query(User).delete()
+        session.commit()
+
+    def test_plan(self):
+        segments = rollups.plan(datetime.datetime(2024, 1, 15, 12, 0), datetime.datetime(2024, 4, 3, 23, 59, 59))
+
+        self.assertEqual(segments, [
+            Segment(RAW, datetime.datetime(2024, 1, 15, 12, 0), datetime.datetime(2024, 1, 16), False),
+            Segment(DAY, datetime.datetime(2024, 1, 16), datetime.datetime(2024, 2, 1), False),
+            Segment(MONTH, datetime.datetime(2024, 2, 1), datetime.datetime(2024, 4, 1), False),
+            Segment(DAY, datetime.datetime(2024, 4, 1), datetime.datetime(2024, 4, 3), False),
+            Segment(RAW, datetime.datetime(2024, 4, 3), datetime.datetime(2024, 4, 3, 23, 59, 59), True),
+        ])
+        self.assertEqual(rollups.plan(datetime.datetime(2024, 1, 15, 8), datetime.datetime(2024, 1, 15, 20)),
+                         [Segment(RAW, datetime.datetime(2024, 1, 15, 8), datetime.datetime(2024, 1, 15, 20), True)])
+
+    async def test_summary_matches_raw_expenses(self):
+        expenses = session.query(Expense).filter_by(uid=11).order_by(Expense.eid).all()
+        expenses[0].category = "Clothing"
+        expenses[1].amount = 1000.0
+        expenses[2].date = datetime.datetime(2019, 6, 1)
+        session.delete(expenses[3])
+        session.commit()
+
+        rng = random.Random(5)
+        ranges = [(datetime.datetime(2019, 1, 1), datetime.datetime(2024, 12, 31, 23, 59, 59))]
+        for _ in range(20):
+            start = datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=rng.randint(0, 3 * 365 * 24 * 3600))
+            ranges.append((start, start + datetime.timedelta(seconds=rng.randint(0, 2 * 365 * 24 * 3600))))
+
+        async with async_session_factory() as db:
+            for start, end in ranges:
+                summary = await get_category_summary(db, 11, start, end)
+                raw = await get_raw_category_summary(db, 11, start, end)
+                self.assertEqual([row.category for row in summary], [row.category for row in raw])
+                for row, expected in zip(summary, raw):
+                    self.assertEqual(row.count, expected.count)
+                    self.assertEqual((row.minimum, row.maximum), (expected.minimum, expected.maximum))
+                    self.assertAlmostEqual(row.total, expected.total, places=6)
+                    self.assertAlmostEqual(row.average, expected.average, places=6)
+
+        with engine.connect() as connection:
+            self.assertEqual(rollups.verify(connection, uid=11), [])
+
+    def test_verify_and_rebuild(self):
+        months = {(expense.date.year, expense.date.month, expense.category) for expense in session.query(Expense)}
+        session.query(ExpenseRollup).filter_by(uid=11, grain=MONTH).delete()
+        session.commit()
+
+        with engine.begin() as connection:
+            drift = rollups.verify(connection, uid=11)
+            self.assertEqual(len(drift), len(months))
+            self.assertEqual({row['grain'] for row in drift}, {MONTH})
+
+            rollups.rebuild(connection, uid=11)
+            self.assertEqual(rollups.verify(connection, uid=11), [])
+
+    def test_bulk_changes_rebuild_only_their_users(self):
+        session.add(User(uid=12, name="Other User"))
+        session.add_all([Expense(uid=12, name="test", category="Rent", amount=10.0, date=datetime.datetime(2022, 5, day))
+                         for day in range(1, 4)])
+        session.commit()
+        # Drifted rollups of the other user show whether a bulk statement rebuilt them.
+        session.query(ExpenseRollup).filter_by(uid=12, grain=MONTH).delete()
+        session.commit()
+
+        session.query(Expense).filter(Expense.uid == 11, Expense.category == "Rent").delete()
+        session.query(Expense).filter_by(uid=11, category="Health").update({'amount': 1.0})
+        session.commit()
+
+        with engine.connect() as connection:
+            self.assertEqual(rollups.verify(connection, uid=11), [])
+            self.assertEqual(len(rollups.verify(connection, uid=12)), 1)
+
+        session.query(Expense).filter_by(uid=11, category="Dining").update({'uid': 12})
+        session.commit()
+
+        with engine.connect() as connection:
+            self.assertEqual(rollups.verify(connection), [])
+
+    def test_expenses_without_amount_are_left_out(self):
+        session.add(Expense(uid=11, name="test", category="Dining", amount=None, date=datetime.datetime(2021, 3, 1)))
+        session.commit()
+
+        with engine.begin() as connection:
+            self.assertEqual(rollups.verify(connection, uid=11), [])
+            rollups.rebuild(connection, uid=11)
+            self.assertEqual(rollups.verify(connection, uid=11), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
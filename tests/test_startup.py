@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def run_python(code, database):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database, OPENAI_API_KEY='sk-test')
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'startup.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_import_is_lazy(self):
+        result = run_python(
+            "import builtins, sys\n"
+            "import financetracker_bot.main\n"
+            "from financetracker_bot.utils.translation import get_translation\n"
+            "print(sorted({name.split('.')[0] for name in sys.modules} & {'openai', 'plotly', 'pandas', 'pyarrow'}))\n"
+            "print(get_translation.cache_info().currsize, hasattr(builtins, '_'))\n",
+            self.database)
+
+        self.assertEqual(result.stdout.split('\n')[:2], ['[]', '0 False'])
+        self.assertFalse(os.path.exists(self.database))
+
+    def test_bootstrap_injected_database(self):
+        injected = os.path.join(self.directory.name, 'injected.db')
+        result = run_python(
+            "from financetracker_bot.app_context import bootstrap\n"
+            "from financetracker_bot.models import database\n"
+            f"bootstrap('sqlite:///' + {injected!r})\n"
+            "try:\n"
+            "    database.configure('sqlite://')\n"
+            "except RuntimeError:\n"
+            "    print('locked')\n",
+            self.database)
+
+        with sqlite3.connect(injected) as connection:
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertTrue({'users', 'expenses', 'budgets', 'category_totals'} <= tables)
+        self.assertEqual(result.stdout.strip(), 'locked')
+        self.assertFalse(os.path.exists(self.database))
+
+
+if __name__ == '__main__':
+    unittest.main()
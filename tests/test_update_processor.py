@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from financetracker_bot.utils.update_processor import PerUserUpdateProcessor
+
+
+def user_update(uid):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=uid), effective_chat=None)
+
+
+class TestPerUserUpdateProcessor(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.processor = PerUserUpdateProcessor(workers=2)
+        self.log = []
+
+    async def handle(self, name, delay):
+        self.log.append(('start', name))
+        await asyncio.sleep(delay)
+        self.log.append(('end', name))
+
+    def process(self, uid, name, delay):
+        return asyncio.create_task(self.processor.process_update(user_update(uid), self.handle(name, delay)))
+
+    async def test_user_updates_are_ordered(self):
+        tasks = [self.process(1, 'add', 0.05), self.process(1, 'delete', 0), self.process(2, 'show', 0)]
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(self.processor.stats()['in_flight'], 1)
+        self.assertEqual(self.processor.stats()['queued'], 1)
+        self.assertEqual(self.processor.stats()['active_users'], 1)
+        await asyncio.gather(*tasks)
+
+        self.assertLess(self.log.index(('end', 'show')), self.log.index(('end', 'add')))
+        self.assertLess(self.log.index(('end', 'add')), self.log.index(('start', 'delete')))
+        self.assertEqual(self.processor.stats(), {'in_flight': 0, 'queued': 0, 'active_users': 0, 'processed': 3})
+
+    async def test_workers_are_bounded(self):
+        tasks = [self.process(uid, uid, 0.02) for uid in range(3)]
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(self.processor.stats()['in_flight'], 2)
+        self.assertEqual(self.processor.stats()['queued'], 1)
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.log[-1], ('end', 2))
+
+    async def test_failed_update_releases_user(self):
+        async def fail():
+            raise RuntimeError('handler failed')
+
+        with self.assertRaises(RuntimeError):
+            await self.processor.process_update(user_update(1), fail())
+        await self.processor.process_update(user_update(1), self.handle('add', 0))
+        self.assertEqual(self.log, [('start', 'add'), ('end', 'add')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import datetime
+import unittest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import delete
+from telegram import Update, User as TelegramUser, Message, Chat
+from telegram.ext import CallbackContext
+from financetracker_bot.handlers.budget_handler import set_budget
+from financetracker_bot.handlers.user_handler import start
+from financetracker_bot.models.database import async_engine
+from financetracker_bot.models.finance_model import Budget, User, engine, session
+from financetracker_bot.utils.query_profiler import QueryProfiler
+from financetracker_bot.utils.user_cache import RegisteredUserCache, registered_users
+
+
+class TestRegisteredUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        registered_users.clear()
+        self.profiler = QueryProfiler()
+        self.profiler.attach(async_engine.sync_engine)
+
+    def tearDown(self):
+        self.profiler.detach(async_engine.sync_engine)
+        session.query(Budget).delete()
+        session.query(User).delete()
+        session.commit()
+
+    def create_update(self, text):
+        return Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=123, type="private"),
+                from_user=TelegramUser(id=123, first_name="Test", is_bot=False),
+                text=text,
+            ),
+        )
+
+    async def set_budget(self):
+        update = self.create_update("/set_budget Dining 500")
+        context = CallbackContext.from_update(update, application=None)
+        context.args = ["Dining", "500"]
+        with self.profiler.capture() as capture:
+            await set_budget(update, context)
+        return capture.count
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_unregistered_user(self, mock_reply_text):
+        await self.set_budget()
+
+        mock_reply_text.assert_called_once_with('Please register first using the /start command.')
+        self.assertNotIn(123, registered_users)
+        self.assertIsNone(session.query(Budget).filter_by(uid=123).first())
+
+    @patch('telegram.Message.reply_text', new_callable=AsyncMock)
+    async def test_start_saves_a_query_per_command(self, mock_reply_text):
+        session.add(User(uid=123, name="Test User"))
+        session.commit()
+        await self.set_budget()
+        registered_users.clear()
+        uncached = await self.set_budget()
+
+        registered_users.clear()
+        update = self.create_update("/start")
+        await start(update, CallbackContext.from_update(update, application=None))
+        self.assertIn(123, registered_users)
+        cached = await self.set_budget()
+
+        self.assertEqual(cached, uncached - 1)
+        mock_reply_text.assert_called_with('Budget set: 500.0 for category Dining')
+
+    def test_deleted_users_are_forgotten(self):
+        session.add_all([User(uid=1, name="One"), User(uid=2, name="Two"), User(uid=3, name="Three")])
+        session.commit()
+        registered_users.warm(engine)
+        self.assertTrue(all(uid in registered_users for uid in (1, 2, 3)))
+
+        session.delete(session.get(User, 1))
+        session.commit()
+        self.assertNotIn(1, registered_users)
+        self.assertIn(2, registered_users)
+
+        session.execute(delete(User).where(User.uid == 2))
+        session.commit()
+        self.assertNotIn(3, registered_users)
+
+    def test_lru_bound(self):
+        cache = RegisteredUserCache(max_size=2)
+        for uid in (1, 2, 3):
+            cache.add(uid)
+
+        self.assertNotIn(1, cache)
+        self.assertEqual(cache.stats()['size'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
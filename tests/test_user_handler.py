@@ -51,6 +51,9 @@ class TestUserHandler(unittest.IsolatedAsyncioTestCase):
             '/show_budgets - Show all set budgets\n'
             '/show - Show all added expenses\n'
             '/delete <id> - Delete an expense by ID\n'
+            '/category <id> <category> - Move an expense to another category\n'
+            '/import - Import expenses from a CSV file sent with this caption\n'
+            '/export [from] [to] [csv|parquet] - Export expenses. Date format: YYYY-MM-DD\n'
             '/analysis <start_date> <start_time> <end_date> <end_time>. '
             'Date and time format: YYYY-MM-DD HH:MM:SS\n'
             '/help - Show this message\n'
@@ -79,6 +82,9 @@ class TestUserHandler(unittest.IsolatedAsyncioTestCase):
             '/show_budgets - Show all set budgets\n'
             '/show - Show all added expenses\n'
             '/delete <id> - Delete an expense by ID\n'
+            '/category <id> <category> - Move an expense to another category\n'
+            '/import - Import expenses from a CSV file sent with this caption\n'
+            '/export [from] [to] [csv|parquet] - Export expenses. Date format: YYYY-MM-DD\n'
             '/analysis <start_date> <start_time> <end_date> <end_time>. '
             'Date and time format: YYYY-MM-DD HH:MM:SS\n'
             '/help - Show this message\n'
@@ -101,6 +107,9 @@ class TestUserHandler(unittest.IsolatedAsyncioTestCase):
             "/show_budgets - Show all set budgets\n"
             "/show - Show all added expenses\n"
             "/delete <id> - Delete an expense by ID\n"
+            "/category <id> <category> - Move an expense to another category\n"
+            "/import - Import expenses from a CSV file sent with this caption\n"
+            "/export [from] [to] [csv|parquet] - Export expenses. Date format: YYYY-MM-DD\n"
             "/analysis <start_date> <start_time> <end_date> <end_time>. "
             "Date and time format: YYYY-MM-DD HH:MM:SS\n"
             "/help - Show this message\n"
@@ -0,0 +1,86 @@
+import asyncio
+import socket
+import unittest
+from unittest.mock import AsyncMock, patch
+import httpx
+from telegram import User as TelegramUser
+from telegram.ext import ExtBot
+from financetracker_bot.handlers.user_handler import help_text
+from financetracker_bot.main import build_application, webhook_options
+
+# An update as Telegram POSTs it to the webhook.
+HELP_UPDATE = {
+    "update_id": 10000,
+    "message": {
+        "message_id": 1,
+        "date": 1715000000,
+        "chat": {"id": 123, "type": "private", "first_name": "Test"},
+        "from": {"id": 123, "is_bot": False, "first_name": "Test"},
+        "text": "/help",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 5}],
+    },
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestWebhook(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/telegram"
+        bot_user = TelegramUser(id=1, first_name="Bot", is_bot=True, username="finance_bot")
+
+        async def get_me(bot, *args, **kwargs):
+            bot._bot_user = bot_user  # pylint: disable=protected-access
+            return bot_user
+
+        patches = [
+            patch.object(ExtBot, 'get_me', autospec=True, side_effect=get_me),
+            patch.object(ExtBot, 'set_webhook', new_callable=AsyncMock, return_value=True),
+            patch.object(ExtBot, 'delete_webhook', new_callable=AsyncMock, return_value=True),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        reply_text = patch('telegram.Message.reply_text', new_callable=AsyncMock)
+        self.mock_reply_text = reply_text.start()
+        self.addCleanup(reply_text.stop)
+
+        self.application = build_application(token="1:TEST")
+        await self.application.initialize()
+        options = dict(webhook_options(), listen='127.0.0.1', port=self.port, url_path='telegram',
+                       secret_token='s3cret', webhook_url=self.url)
+        await self.application.updater.start_webhook(**options)
+        await self.application.start()
+
+    async def asyncTearDown(self):
+        await self.application.updater.stop()
+        await self.application.stop()
+        await self.application.shutdown()
+
+    async def test_post_update(self):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(self.url, json=HELP_UPDATE,
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': 's3cret'})
+        self.assertEqual(response.status_code, 200)
+
+        for _ in range(100):
+            if self.mock_reply_text.await_count:
+                break
+            await asyncio.sleep(0.01)
+        self.mock_reply_text.assert_awaited_once_with(help_text())
+
+    async def test_wrong_secret_token(self):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(self.url, json=HELP_UPDATE,
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()